@@ -3,65 +3,67 @@ import time
 import gspread
 import pandas as pd
 from oauth2client.service_account import ServiceAccountCredentials
-from SmartApi.smartConnect import SmartConnect
 from datetime import datetime
+from strategy import LTP_EMA_STRATEGY, evaluate_row
+from sheet_writer import SheetWriter
 
-# Load credentials
-with open("credentials.json") as f:
-    creds = json.load(f)
+def main():
+    # Load credentials
+    with open("credentials.json") as f:
+        creds = json.load(f)
 
-api_key = creds["api_key"]
-client_id = creds["client_id"]
-password = creds["password"]
-totp = creds["totp"]
+    api_key = creds["api_key"]
+    client_id = creds["client_id"]
+    password = creds["password"]
+    totp = creds["totp"]
 
-# Angel One login
-obj = SmartConnect(api_key=api_key)
-data = obj.generateSession(client_id, password, totp)
-feed_token = obj.getfeedToken()
-refresh_token = data['data']['refreshToken']
+    # Angel One login (SmartApi looks up the public IP when imported, so it loads here)
+    from SmartApi.smartConnect import SmartConnect
+    obj = SmartConnect(api_key=api_key)
+    data = obj.generateSession(client_id, password, totp)
+    feed_token = obj.getfeedToken()
+    refresh_token = data['data']['refreshToken']
 
-# Google Sheets Auth
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-credentials = ServiceAccountCredentials.from_json_keyfile_name("gspread-credentials.json", scope)
-client = gspread.authorize(credentials)
+    # Google Sheets Auth
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    credentials = ServiceAccountCredentials.from_json_keyfile_name("gspread-credentials.json", scope)
+    client = gspread.authorize(credentials)
 
-sheet = client.open_by_url("<YOUR GOOGLE SHEET URL>").sheet1
+    sheet = client.open_by_url("<YOUR GOOGLE SHEET URL>").sheet1
 
-# Read Sheet into DataFrame
-data = sheet.get_all_records()
-df = pd.DataFrame(data)
+    # Read Sheet into DataFrame
+    data = sheet.get_all_records()
+    df = pd.DataFrame(data)
 
-# Process each row
-for index, row in df.iterrows():
-    symbol = row['Symbol']
-    segment = row['Segment'].upper()
+    # Process each row
+    writer = SheetWriter(client, value_input_option="USER_ENTERED")
+    writer.adopt(sheet.spreadsheet)
+    for index, row in df.iterrows():
+        symbol = row['Symbol']
+        segment = row['Segment'].upper()
 
-    try:
-        ltp_data = obj.ltpData(exchange=segment, tradingsymbol=symbol, symboltoken="")
-        ltp = float(ltp_data['data']['ltp'])
-        
-        # Dummy logic for indicators
-        rsi = round((ltp % 70) + 20, 2)  # just mock RSI
-        ema = round(ltp * 0.98, 2)       # mock EMA
-        oi = round(ltp * 1.5, 2)         # mock OI
+        try:
+            ltp_data = obj.ltpData(exchange=segment, tradingsymbol=symbol, symboltoken="")
+            ltp = float(ltp_data['data']['ltp'])
 
-        # Price Action and Final Signal
-        if ltp > ema and rsi > 60:
-            signal = "BUY"
-        elif ltp < ema and rsi < 40:
-            signal = "SELL"
-        else:
-            signal = "HOLD"
+            # Dummy logic for indicators
+            rsi = round((ltp % 70) + 20, 2)  # just mock RSI
+            ema = round(ltp * 0.98, 2)       # mock EMA
+            oi = round(ltp * 1.5, 2)         # mock OI
 
-        # Update back to sheet
-        sheet.update_cell(index+2, 4, ltp)      # LTP
-        sheet.update_cell(index+2, 5, rsi)      # RSI
-        sheet.update_cell(index+2, 6, ema)      # EMA
-        sheet.update_cell(index+2, 7, oi)       # OI
-        sheet.update_cell(index+2, 9, signal)   # Final Signal
+            # Price Action and Final Signal
+            signal = evaluate_row(LTP_EMA_STRATEGY, {"LTP": ltp, "EMA": ema, "RSI": rsi})
 
-    except Exception as e:
-        print(f"Error with {symbol}: {e}")
+            # Update back to sheet (sent in one batch below)
+            writer.queue(sheet.spreadsheet.id, sheet.title, f"D{index+2}:G{index+2}", [[ltp, rsi, ema, oi]])  # LTP, RSI, EMA, OI
+            writer.queue(sheet.spreadsheet.id, sheet.title, f"I{index+2}", signal)                           # Final Signal
 
-print("Sheet updated successfully.")
+        except Exception as e:
+            print(f"Error with {symbol}: {e}")
+
+    if writer.flush():
+        print("Sheet updated successfully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore
+from indicator_engine import calculate_indicator_frame
+from strategy import DEFAULT_STRATEGY, column_arrays, compile_strategy
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
+
+
+@dataclass
+class CostModel:
+    """Per-order costs: adverse slippage plus brokerage and statutory fees."""
+    slippage_bps: float = 5.0
+    fee_bps: float = 3.0
+    brokerage_per_order: float = 20.0
+
+
+@dataclass
+class BacktestResult:
+    orders: pd.DataFrame
+    symbol_pnl: pd.Series
+    equity: pd.Series
+    metrics: dict = field(default_factory=dict)
+
+
+def signal_sides(df, strategy=DEFAULT_STRATEGY):
+    """+1 (BUY), -1 (SELL) or 0 for every bar, using the live strategy rules."""
+    strat = compile_strategy(strategy)
+    buy, sell = strat.masks(column_arrays(df, strat.columns), len(df))
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+def simulate(df, sides, quantity=1, costs=None):
+    """
+    Vectorized order/position simulation with main.place_orders semantics: a
+    signal only becomes an order when its side differs from the last order
+    placed for that symbol, and each order trades `quantity` at the bar close
+    adjusted for slippage. Returns (orders, per-bar equity per row).
+    """
+    costs = costs or CostModel()
+    symbols = df["SYMBOL"]
+    groups = pd.Series(pd.factorize(symbols)[0], index=df.index)
+    close = df["close"].to_numpy(dtype=np.float64)
+
+    side = pd.Series(np.where(sides != 0, sides, np.nan), index=df.index)
+    last_side = side.groupby(groups, sort=False).ffill()
+    prev_side = last_side.groupby(groups, sort=False).shift(1)
+    is_order = (sides != 0) & (side != prev_side).to_numpy()
+
+    qty = np.where(is_order, sides * quantity, 0).astype(np.float64)
+    fill = close * (1 + np.sign(qty) * costs.slippage_bps / 1e4)
+    notional = np.abs(qty) * fill
+    order_cost = np.where(is_order, notional * costs.fee_bps / 1e4 + costs.brokerage_per_order, 0.0)
+    cash_flow = -qty * fill - order_cost
+
+    position = pd.Series(qty, index=df.index).groupby(groups, sort=False).cumsum().to_numpy()
+    cash = pd.Series(cash_flow, index=df.index).groupby(groups, sort=False).cumsum().to_numpy()
+    equity = cash + position * close
+
+    orders = pd.DataFrame({
+        "SYMBOL": symbols.astype(str).to_numpy()[is_order],
+        "date": df["date"].to_numpy()[is_order] if "date" in df.columns else df.index.to_numpy()[is_order],
+        "SIDE": np.where(qty[is_order] > 0, "BUY", "SELL"),
+        "QUANTITY": np.abs(qty[is_order]),
+        "close": close[is_order],
+        "fill_price": fill[is_order],
+        "cost": order_cost[is_order],
+    })
+    return orders, pd.Series(equity, index=df.index)
+
+
+def _portfolio_equity(df, equity):
+    """Sums per-symbol equity curves on a common timeline (last value carried forward)."""
+    wide = pd.DataFrame({"date": df["date"].to_numpy(), "SYMBOL": df["SYMBOL"].to_numpy(), "equity": equity.to_numpy()})
+    wide = wide.pivot_table(index="date", columns="SYMBOL", values="equity", aggfunc="last", observed=True)
+    return wide.sort_index().ffill().fillna(0.0).sum(axis=1)
+
+
+def _combine_equity(a, b):
+    if a is None:
+        return b
+    joined = pd.concat([a.rename("a"), b.rename("b")], axis=1).sort_index().ffill().fillna(0.0)
+    return joined["a"] + joined["b"]
+
+
+def compute_metrics(orders, equity):
+    drawdown = equity - equity.cummax() if len(equity) else equity
+    return {
+        "total_pnl": round(float(equity.iloc[-1]), 2) if len(equity) else 0.0,
+        "max_drawdown": round(float(drawdown.min()), 2) if len(equity) else 0.0,
+        "orders": int(len(orders)),
+        "costs": round(float(orders["cost"].sum()), 2) if len(orders) else 0.0,
+        "symbols_traded": int(orders["SYMBOL"].nunique()) if len(orders) else 0,
+    }
+
+
+def prepare_frame(df):
+    """Numeric closes, rows ordered by (SYMBOL, date), PCR column present."""
+    df = df.copy()
+    df["SYMBOL"] = df["SYMBOL"].astype("category")  # cheap grouping on large frames
+    df["close"] = pd.to_numeric(df["close"], errors="coerce")
+    df = df.dropna(subset=["close"]).sort_values(["SYMBOL", "date"], kind="stable").reset_index(drop=True)
+    if "PCR" not in df.columns:
+        df["PCR"] = np.nan
+    return df
+
+
+def evaluate_frame(df, strategy=DEFAULT_STRATEGY, quantity=1, costs=None):
+    """Signals, orders and metrics for a prepared frame that already has its indicator columns."""
+    orders, equity = simulate(df, signal_sides(df, strategy), quantity, costs)
+    symbol_pnl = equity.groupby(df["SYMBOL"], sort=False, observed=True).last()
+    symbol_pnl.index = symbol_pnl.index.astype(str)
+    portfolio = _portfolio_equity(df, equity)
+    return BacktestResult(orders, symbol_pnl, portfolio, compute_metrics(orders, portfolio))
+
+
+def backtest_frame(df, strategy=DEFAULT_STRATEGY, quantity=1, costs=None, indicator_params=None):
+    """
+    Runs indicators, signals and the position simulation over a candle frame
+    holding several symbols (SYMBOL, date, close, ...).
+    """
+    df = calculate_indicator_frame(prepare_frame(df), **(indicator_params or {}))
+    return evaluate_frame(df, strategy, quantity, costs)
+
+
+def iter_store_frames(store, keys, interval, chunk_size, since=None):
+    """Yields candle frames of at most `chunk_size` symbols from the candle store."""
+    for start in range(0, len(keys), chunk_size):
+        parts = []
+        for exchange, token in keys[start:start + chunk_size]:
+            candles = store.load(exchange, token, interval, since=since)
+            if not candles.empty:
+                parts.append(candles.assign(SYMBOL=f"{exchange}:{token}"))
+        if parts:
+            yield pd.concat(parts, ignore_index=True)
+
+
+def backtest_chunked(frames, strategy=DEFAULT_STRATEGY, quantity=1, costs=None, indicator_params=None):
+    """
+    Streams symbol chunks through backtest_frame so memory is bounded by the
+    chunk, not the universe. Symbols are independent, so results combine exactly.
+    """
+    orders, symbol_pnl, equity = [], [], None
+    for frame in frames:
+        part = backtest_frame(frame, strategy, quantity, costs, indicator_params)
+        orders.append(part.orders)
+        symbol_pnl.append(part.symbol_pnl)
+        equity = _combine_equity(equity, part.equity)
+
+    orders = pd.concat(orders, ignore_index=True) if orders else pd.DataFrame()
+    symbol_pnl = pd.concat(symbol_pnl) if symbol_pnl else pd.Series(dtype=float)
+    equity = equity if equity is not None else pd.Series(dtype=float)
+    return BacktestResult(orders, symbol_pnl, equity, compute_metrics(orders, equity))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the live strategy over the local candle store.")
+    parser.add_argument("keys", nargs="+", help="EXCHANGE:TOKEN pairs present in the candle store")
+    parser.add_argument("--interval", default="ONE_DAY")
+    parser.add_argument("--since", default=None, help="first date to include, e.g. 2022-01-01")
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--slippage-bps", type=float, default=CostModel.slippage_bps)
+    parser.add_argument("--fee-bps", type=float, default=CostModel.fee_bps)
+    parser.add_argument("--brokerage", type=float, default=CostModel.brokerage_per_order)
+    args = parser.parse_args()
+
+    keys = [tuple(k.split(":", 1)) for k in args.keys]
+    costs = CostModel(args.slippage_bps, args.fee_bps, args.brokerage)
+    frames = iter_store_frames(CandleStore(), keys, args.interval, args.chunk_size, since=args.since)
+    result = backtest_chunked(frames, quantity=args.quantity, costs=costs)
+    logging.info(f"Backtest metrics: {result.metrics}")
+    print(result.symbol_pnl.sort_values().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import numpy as np
+import pandas as pd
+
+from market_calendar import MARKET_TZ, session_close_ms, session_open_ms
+
+# Bar length in ms; None is the whole session (1D).
+TIMEFRAMES = {"1m": 60_000, "5m": 300_000, "15m": 900_000, "1h": 3_600_000, "1D": None}
+DEFAULT_TIMEFRAMES = ("1m", "5m", "15m", "1h", "1D")
+BAR_COLUMNS = ["SYMBOL", "timeframe", "date", "open", "high", "low", "close", "volume", "vwap"]
+
+_OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _PV = range(6)
+
+
+class BarAggregator:
+    """
+    Builds bars for several timeframes in one pass over ticks or 1-minute
+    candles. State is one row of NumPy accumulators per (instrument,
+    timeframe). Intraday bars are anchored at the exchange session open and
+    cut at the close (the last 1h NSE bar is 15:15-15:30); 1D is the session.
+    Updates outside the session, or stamped before the instrument's open or
+    last emitted bar, are ignored (a bar is never emitted twice). on_bar(bar)
+    gets a dict per completed bar.
+    """
+
+    def __init__(self, symbols, exchanges, timeframes=DEFAULT_TIMEFRAMES, on_bar=None):
+        self.symbols = list(symbols)
+        self.exchanges = list(exchanges)
+        self.timeframes = list(timeframes)
+        self.lengths = [TIMEFRAMES[tf] for tf in self.timeframes]
+        self.on_bar = on_bar
+        n, k = len(self.symbols), len(self.timeframes)
+        self.start = np.full((n, k), -1, dtype=np.int64)
+        self.end = np.zeros((n, k), dtype=np.int64)
+        self.emitted_end = np.zeros((n, k), dtype=np.int64)
+        self.acc = np.zeros((n, k, 6))
+        self.ignored = 0
+        # Per slot (latest start, earliest end) while every timeframe has an open bar:
+        # updates inside that window cannot roll any bar over.
+        self._window = [(0, 0)] * n
+
+    def _bounds(self, slot, ts_ms):
+        exchange = self.exchanges[slot]
+        open_ms = session_open_ms(exchange, ts_ms)
+        if open_ms < 0:
+            return None
+        close_ms = session_close_ms(exchange, open_ms)
+        starts, ends = [], []
+        for length in self.lengths:
+            if length is None:
+                starts.append(open_ms)
+                ends.append(close_ms)
+            else:
+                start = open_ms + (ts_ms - open_ms) // length * length
+                starts.append(start)
+                ends.append(min(start + length, close_ms))
+        return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+    def update(self, slot, ts_ms, open_, high, low, close, volume=0.0, typical=None):
+        """
+        Adds one tick (open == high == low == close) or candle. `volume` is
+        the traded quantity within this update; `typical` the price used for
+        VWAP (defaults to close for ticks, (h+l+c)/3 for candles).
+        """
+        ts_ms = int(ts_ms)
+        if typical is None:
+            typical = close if high == low else (high + low + close) / 3
+        volume = 0.0 if volume is None or volume != volume else float(volume)
+
+        acc = self.acc[slot]
+        lo, hi = self._window[slot]
+        if not lo <= ts_ms < hi:
+            # A late tick (e.g. after the feed clock closed its bar) must not reopen or restart a bar.
+            late = ts_ms < max(self.emitted_end[slot].max(), self.start[slot].max())
+            bounds = None if late else self._bounds(slot, ts_ms)
+            if bounds is None:
+                self.ignored += 1
+                return
+            starts, ends = bounds
+            rolled = (self.start[slot] >= 0) & (starts > self.start[slot])
+            for j in np.flatnonzero(rolled):
+                self._emit(slot, j)
+
+            fresh = self.start[slot] < 0
+            if fresh.any():
+                self.start[slot, fresh] = starts[fresh]
+                self.end[slot, fresh] = ends[fresh]
+                acc[fresh] = (open_, high, low, close, 0.0, 0.0)
+            self._window[slot] = (int(starts.max()), int(ends.min()))
+        acc[:, _HIGH] = np.maximum(acc[:, _HIGH], high)
+        acc[:, _LOW] = np.minimum(acc[:, _LOW], low)
+        acc[:, _CLOSE] = close
+        acc[:, _VOLUME] += volume
+        acc[:, _PV] += typical * volume
+
+    def flush(self, now_ms=None):
+        """Emits every open bar whose end is at or before `now_ms` (all bars if None)."""
+        open_ = self.start >= 0
+        due = open_ if now_ms is None else open_ & (self.end <= now_ms)
+        for slot, j in zip(*np.nonzero(due)):
+            self._emit(slot, j)
+
+    def _emit(self, slot, j):
+        o, h, l, c, v, pv = self.acc[slot, j]
+        bar = {
+            "SYMBOL": self.symbols[slot],
+            "timeframe": self.timeframes[j],
+            "start": int(self.start[slot, j]),
+            "open": o, "high": h, "low": l, "close": c, "volume": v,
+            "vwap": pv / v if v else np.nan,
+        }
+        self.start[slot, j] = -1
+        self.emitted_end[slot, j] = self.end[slot, j]
+        self._window[slot] = (0, 0)
+        if self.on_bar:
+            self.on_bar(bar)
+
+
+def bars_to_frame(bars):
+    """Emitted bar dicts as a frame with exchange-local `date` (BAR_COLUMNS)."""
+    if not bars:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    df = pd.DataFrame(bars)
+    df["date"] = pd.to_datetime(df.pop("start"), unit="ms", utc=True).dt.tz_convert(MARKET_TZ)
+    return df[BAR_COLUMNS]
+
+
+def aggregate_candles(df, exchange_of, timeframes=DEFAULT_TIMEFRAMES):
+    """
+    Higher-timeframe bars from 1-minute candles (SYMBOL, date, open, high,
+    low, close, volume), so the indicator engine can run on 5m/15m/1h/1D
+    without extra getCandleData traffic. `exchange_of` maps SYMBOL to exch_seg.
+    Returns {timeframe: frame}.
+    """
+    df = df.sort_values(["SYMBOL", "date"], kind="stable")
+    symbols = df["SYMBOL"].unique().tolist()
+    slots = {s: i for i, s in enumerate(symbols)}
+    bars = []
+    agg = BarAggregator(symbols, [exchange_of(s) for s in symbols], timeframes, on_bar=bars.append)
+
+    ts = ((pd.to_datetime(df["date"], utc=True) - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)).to_numpy()
+    cols = [df[c].to_numpy(dtype=float) for c in ("open", "high", "low", "close", "volume")]
+    for symbol, t, o, h, l, c, v in zip(df["SYMBOL"].to_numpy(), ts, *cols):
+        agg.update(slots[symbol], t, o, h, l, c, v, typical=(h + l + c) / 3)
+    agg.flush()
+
+    frame = bars_to_frame(bars)
+    return {tf: frame[frame["timeframe"] == tf].drop(columns="timeframe").reset_index(drop=True) for tf in timeframes}
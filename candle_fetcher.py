@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+from rate_limiter import MultiLimiter, TokenBucket
+
+# Angel One historical API limits: 3 requests/second, 180 requests/minute.
+HIST_RATE_PER_SEC = float(os.getenv("HIST_RATE_PER_SEC", "3"))
+HIST_RATE_PER_MIN = float(os.getenv("HIST_RATE_PER_MIN", "180"))
+HIST_MAX_WORKERS = int(os.getenv("HIST_MAX_WORKERS", "8"))
+HIST_MAX_RETRIES = int(os.getenv("HIST_MAX_RETRIES", "4"))
+CANDLE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+_hist_limiter = MultiLimiter(
+    TokenBucket(HIST_RATE_PER_MIN, per=60.0),
+    TokenBucket(HIST_RATE_PER_SEC),
+)
+
+
+class ThrottledError(Exception):
+    """Raised when the broker rejects a request for exceeding its access rate."""
+
+
+@dataclass
+class CandleRequest:
+    symbol: str
+    exchange: str
+    token: str
+    interval: str
+    fromdate: datetime
+    todate: datetime
+
+
+@dataclass
+class FetchStat:
+    symbol: str
+    rows: int = 0
+    latency: float = 0.0
+    attempts: int = 0
+    throttled: int = 0
+    limiter_wait: float = 0.0
+    error: str = ""
+
+
+def _is_throttled(obj):
+    text = str(obj).lower()
+    return "access rate" in text or "too many requests" in text
+
+
+def fetch_candles(api, req):
+    """
+    Single getCandleData call for `req`. Returns a DataFrame with
+    CANDLE_COLUMNS (empty when the broker has no data) and raises
+    ThrottledError when the request was rate limited.
+    """
+    params = {
+        "exchange": req.exchange,
+        "symboltoken": req.token,
+        "interval": req.interval,
+        "fromdate": req.fromdate.strftime("%Y-%m-%d %H:%M"),
+        "todate": req.todate.strftime("%Y-%m-%d %H:%M"),
+    }
+    try:
+        resp = api.getCandleData(params)
+    except Exception as e:
+        if _is_throttled(e):
+            raise ThrottledError(str(e)) from e
+        raise
+
+    if not resp or not resp.get('data'):
+        if resp and _is_throttled(resp.get('message', '')):
+            raise ThrottledError(resp.get('message'))
+        logging.warning(f"No historical data found for {req.symbol}. Raw response: {resp}")
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+
+    df = pd.DataFrame(resp['data'], columns=CANDLE_COLUMNS)
+    df['close'] = pd.to_numeric(df['close'])
+    return df
+
+
+def _fetch_with_retry(api, req, limiter, max_retries):
+    stat = FetchStat(symbol=req.symbol)
+    start = time.perf_counter()
+    df = None
+    while stat.attempts <= max_retries:
+        stat.attempts += 1
+        stat.limiter_wait += limiter.acquire()
+        try:
+            df = fetch_candles(api, req)
+            break
+        except ThrottledError as e:
+            stat.throttled += 1
+            stat.error = str(e)
+            backoff = min(30.0, 0.5 * 2 ** (stat.attempts - 1)) + random.uniform(0, 0.25)
+            logging.warning(f"Throttled fetching {req.symbol}, retrying in {backoff:.2f}s.")
+            time.sleep(backoff)
+        except Exception as e:
+            stat.error = str(e)
+            logging.error(f"Failed to fetch historical data for {req.symbol}: {e}")
+            break
+    stat.latency = time.perf_counter() - start
+    if df is not None:
+        stat.rows = len(df)
+        stat.error = ""
+    return df, stat
+
+
+def summarize_stats(stats, wall_time):
+    latencies = sorted(s.latency for s in stats)
+    return {
+        "requests": len(stats),
+        "failed": sum(1 for s in stats if s.error),
+        "attempts": sum(s.attempts for s in stats),
+        "throttled": sum(s.throttled for s in stats),
+        "limiter_wait_s": round(sum(s.limiter_wait for s in stats), 3),
+        "latency_p50_s": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+        "latency_max_s": round(latencies[-1], 3) if latencies else 0.0,
+        "wall_time_s": round(wall_time, 3),
+    }
+
+
+def fetch_candles_concurrent(api, candle_requests, max_workers=HIST_MAX_WORKERS, limiter=None, max_retries=HIST_MAX_RETRIES):
+    """
+    Fetches candles for every CandleRequest on a bounded thread pool, sharing
+    one rate limiter, and concatenates the results once.
+    Returns (DataFrame with a SYMBOL column, list of FetchStat).
+    """
+    limiter = limiter or _hist_limiter
+    candle_requests = list(candle_requests)
+    if not api or not candle_requests:
+        return pd.DataFrame(), []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(candle_requests)))) as pool:
+        results = list(pool.map(lambda req: _fetch_with_retry(api, req, limiter, max_retries), candle_requests))
+    wall_time = time.perf_counter() - start
+
+    parts = []
+    for req, (df, _) in zip(candle_requests, results):
+        if df is not None and not df.empty:
+            parts.append(df.assign(SYMBOL=req.symbol))
+    full_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    stats = [stat for _, stat in results]
+    logging.info(f"Historical fetch stats: {summarize_stats(stats, wall_time)}")
+    return full_df, stats
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from candle_fetcher import CANDLE_COLUMNS, CandleRequest, fetch_candles_concurrent
+
+CANDLE_CACHE_DIR = os.getenv("CANDLE_CACHE_DIR", "data/candles")
+MARKET_TZ = "Asia/Kolkata"
+
+# One fixed-width record per candle; dates are stored as UTC epoch nanoseconds.
+CANDLE_DTYPE = np.dtype([
+    ("date", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+# Largest date range getCandleData accepts per request, by interval.
+MAX_DAYS_PER_REQUEST = {
+    "ONE_MINUTE": 30,
+    "THREE_MINUTE": 60,
+    "FIVE_MINUTE": 100,
+    "TEN_MINUTE": 100,
+    "FIFTEEN_MINUTE": 200,
+    "THIRTY_MINUTE": 200,
+    "ONE_HOUR": 400,
+    "ONE_DAY": 2000,
+}
+
+
+def frame_to_records(df):
+    """Converts a getCandleData-style frame into a sorted CANDLE_DTYPE array."""
+    records = np.empty(len(df), dtype=CANDLE_DTYPE)
+    if len(df):
+        dates = pd.to_datetime(df['date'], utc=True).to_numpy(dtype="datetime64[ns]")
+        records['date'] = dates.view("i8")
+        for col in CANDLE_COLUMNS[1:]:
+            records[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+    return np.sort(records, order="date")
+
+
+def records_to_frame(records):
+    df = pd.DataFrame({col: np.asarray(records[col]) for col in CANDLE_COLUMNS[1:]})
+    df.insert(0, "date", pd.to_datetime(np.asarray(records['date']), utc=True).tz_convert(MARKET_TZ))
+    return df
+
+
+class CandleStore:
+    """
+    On-disk candle cache with one memory-mapped .npy file per
+    (exchange, token, interval). Writes merge new candles into the cached
+    ones, de-duplicating on date (the newest copy of a candle wins).
+    """
+
+    def __init__(self, root=CANDLE_CACHE_DIR):
+        self.root = Path(root)
+
+    def path(self, exchange, token, interval):
+        return self.root / interval / f"{exchange}_{token}.npy"
+
+    def load_records(self, exchange, token, interval):
+        path = self.path(exchange, token, interval)
+        if not path.exists():
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        try:
+            return np.load(path, mmap_mode="r")
+        except Exception as e:
+            logging.error(f"Corrupt candle cache {path}, ignoring it: {e}")
+            return np.empty(0, dtype=CANDLE_DTYPE)
+
+    def first_timestamp(self, exchange, token, interval):
+        records = self.load_records(exchange, token, interval)
+        return pd.Timestamp(int(records['date'][0]), tz="UTC").tz_convert(MARKET_TZ) if len(records) else None
+
+    def last_timestamp(self, exchange, token, interval):
+        records = self.load_records(exchange, token, interval)
+        return pd.Timestamp(int(records['date'][-1]), tz="UTC").tz_convert(MARKET_TZ) if len(records) else None
+
+    def load(self, exchange, token, interval, since=None):
+        records = self.load_records(exchange, token, interval)
+        if since is not None and len(records):
+            cutoff = pd.Timestamp(since)
+            if cutoff.tzinfo is None:
+                cutoff = cutoff.tz_localize(MARKET_TZ)
+            start = np.searchsorted(records['date'], cutoff.tz_convert("UTC").value, side="left")
+            records = records[start:]
+        return records_to_frame(records)
+
+    def merge(self, exchange, token, interval, df):
+        """Merges new candles into the cache. Returns the number of cached candles."""
+        new = frame_to_records(df)
+        old = self.load_records(exchange, token, interval)
+        if not len(new):
+            return len(old)
+
+        # Stable sort keeps old-before-new for equal dates; keep the last copy of each date.
+        merged = np.concatenate([np.asarray(old), new])
+        merged = merged[np.argsort(merged['date'], kind="stable")]
+        keep = np.append(merged['date'][1:] != merged['date'][:-1], True)
+        merged = merged[keep]
+
+        path = self.path(exchange, token, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, merged)
+        os.replace(tmp, path)
+        return len(merged)
+
+
+def market_now():
+    """Current exchange-local time as a naive datetime, the format getCandleData expects."""
+    return pd.Timestamp.now(tz=MARKET_TZ).tz_localize(None).to_pydatetime()
+
+
+def _token_pairs(symbols, tokens):
+    for symbol in symbols:
+        token_info = tokens.get(symbol)
+        if token_info and token_info.get('token') and token_info.get('exch_seg'):
+            yield symbol, token_info['exch_seg'], str(token_info['token'])
+
+
+def _merge_results(store, interval, fetched, keys):
+    if fetched.empty:
+        return
+    for symbol, group in fetched.groupby("SYMBOL", sort=False):
+        exchange, token = keys[symbol]
+        store.merge(exchange, token, interval, group)
+
+
+def fetch_history_cached(api, symbols, tokens, days=30, interval="ONE_DAY", store=None):
+    """
+    Returns the last `days` of candles for every symbol, asking the API only
+    for candles after the newest cached one (that candle is re-fetched since
+    it may still be forming). Output matches fetch_candles_concurrent.
+    """
+    store = store or CandleStore()
+    now = market_now()
+    window_start = now - timedelta(days=days)
+
+    keys = {}
+    candle_requests = []
+    for symbol, exchange, token in _token_pairs(symbols, tokens):
+        keys[symbol] = (exchange, token)
+        last = store.last_timestamp(exchange, token, interval)
+        fromdate = window_start
+        if last is not None:
+            fromdate = max(window_start, last.tz_localize(None).to_pydatetime())
+        candle_requests.append(CandleRequest(symbol, exchange, token, interval, fromdate, now))
+
+    if api:
+        fetched, _ = fetch_candles_concurrent(api, candle_requests)
+        _merge_results(store, interval, fetched, keys)
+    else:
+        logging.warning("API is not logged in. Serving historical data from the local cache only.")
+
+    parts = []
+    for symbol, (exchange, token) in keys.items():
+        cached = store.load(exchange, token, interval, since=window_start)
+        if not cached.empty:
+            parts.append(cached.assign(SYMBOL=symbol))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def backfill_history(api, symbols, tokens, days, interval="ONE_DAY", store=None):
+    """
+    One-off load of a long history (e.g. several years) into the cache. The
+    range before the oldest cached candle is split into chunks the API
+    accepts for `interval`.
+    """
+    store = store or CandleStore()
+    now = market_now()
+    start = now - timedelta(days=days)
+    step = timedelta(days=MAX_DAYS_PER_REQUEST.get(interval, 30))
+
+    keys = {}
+    candle_requests = []
+    for symbol, exchange, token in _token_pairs(symbols, tokens):
+        keys[symbol] = (exchange, token)
+        first = store.first_timestamp(exchange, token, interval)
+        end = first.tz_localize(None).to_pydatetime() if first is not None else now
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + step, end)
+            candle_requests.append(CandleRequest(symbol, exchange, token, interval, chunk_start, chunk_end))
+            chunk_start = chunk_end
+
+    logging.info(f"Backfilling {len(keys)} symbols with {len(candle_requests)} requests ({interval}, {days} days).")
+    fetched, _ = fetch_candles_concurrent(api, candle_requests)
+    _merge_results(store, interval, fetched, keys)
+    return len(fetched)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill the local candle cache once.")
+    parser.add_argument("--days", type=int, default=365 * 5)
+    parser.add_argument("--interval", default="ONE_DAY", choices=sorted(MAX_DAYS_PER_REQUEST))
+    parser.add_argument("symbols", nargs="*", help="defaults to every symbol on the LIVE DATA sheet")
+    args = parser.parse_args()
+
+    import main
+
+    main.init()
+    api = main.angel_login()
+    if not api:
+        logging.error("❌ Backfill needs a live Angel One session (set LIVE_TRADING=true).")
+        sys.exit(1)
+    tokens = main.get_tokens()
+    symbols = args.symbols
+    if not symbols:
+        df_sheet = main.read_google_sheet_data(main.get_google_sheet_client(), main.GSHEET_ID, main.SHEET_NAME)
+        symbols = df_sheet['SYMBOL'].astype(str).str.strip().str.upper().unique() if not df_sheet.empty else []
+    rows = backfill_history(api, symbols, tokens, args.days, interval=args.interval)
+    logging.info(f"✅ Backfill complete: {rows} candles fetched.")
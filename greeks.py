@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+import math
+import os
+from datetime import datetime, time as dt_time
+
+import numpy as np
+
+from market_calendar import MARKET_TZ
+
+try:
+    from scipy.special import ndtr as _ndtr
+except ImportError:  # scipy is optional; fall back to a NumPy erfc approximation
+    _ndtr = None
+
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.065"))
+DIVIDEND_YIELD = float(os.getenv("DIVIDEND_YIELD", "0"))
+GREEKS_BUCKET_BPS = float(os.getenv("GREEKS_BUCKET_BPS", "5"))  # underlying move that invalidates cached Greeks
+EXPIRY_TIME = dt_time(15, 30)
+YEAR_SECONDS = 365 * 86_400
+IV_LOW, IV_HIGH = 1e-4, 5.0
+GREEK_FIELDS = ("iv", "price", "delta", "gamma", "vega", "theta")
+
+_SQRT2 = math.sqrt(2.0)
+_INV_SQRT_2PI = 1.0 / math.sqrt(2.0 * math.pi)
+
+
+def _erfc(x):
+    # Chebyshev fit (Numerical Recipes erfcc), relative error < 1.2e-7 everywhere.
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (-0.18628806 + t * (
+        0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277))))))))
+    ans = t * np.exp(-z * z + poly)
+    return np.where(x >= 0, ans, 2.0 - ans)
+
+
+def norm_cdf(x):
+    if _ndtr is not None:
+        return _ndtr(x)
+    return 0.5 * _erfc(-np.asarray(x, dtype=float) / _SQRT2)
+
+
+def norm_pdf(x):
+    return _INV_SQRT_2PI * np.exp(-0.5 * np.square(x))
+
+
+def time_to_expiry(expiry, now=None):
+    """Years until 15:30 IST on the expiry date (0 once it has passed)."""
+    now = now or datetime.now(MARKET_TZ)
+    close = datetime.combine(expiry, EXPIRY_TIME, MARKET_TZ)
+    return max((close - now).total_seconds(), 0.0) / YEAR_SECONDS
+
+
+def _d1_d2(S, K, T, sigma, r, q):
+    vol_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / vol_t
+    return d1, d1 - vol_t
+
+
+def bs_price(S, K, T, sigma, is_call, r=RISK_FREE_RATE, q=DIVIDEND_YIELD):
+    """Black-Scholes price; every argument may be an array (broadcast)."""
+    S, K, T, sigma = (np.asarray(a, dtype=float) for a in (S, K, T, sigma))
+    d1, d2 = _d1_d2(S, K, T, sigma, r, q)
+    fwd_s, fwd_k = S * np.exp(-q * T), K * np.exp(-r * T)
+    call = fwd_s * norm_cdf(d1) - fwd_k * norm_cdf(d2)
+    return np.where(is_call, call, call - fwd_s + fwd_k)  # put-call parity
+
+
+def bs_greeks(S, K, T, sigma, is_call, r=RISK_FREE_RATE, q=DIVIDEND_YIELD):
+    """
+    Price, delta, gamma, vega (per 1 vol point) and theta (per calendar day)
+    as a dict of arrays.
+    """
+    S, K, T, sigma = (np.asarray(a, dtype=float) for a in (S, K, T, sigma))
+    is_call = np.asarray(is_call, dtype=bool)
+    d1, d2 = _d1_d2(S, K, T, sigma, r, q)
+    disc_q, disc_r = np.exp(-q * T), np.exp(-r * T)
+    nd1, nd2, pdf = norm_cdf(d1), norm_cdf(d2), norm_pdf(d1)
+    sqrt_t = np.sqrt(T)
+
+    call = S * disc_q * nd1 - K * disc_r * nd2
+    price = np.where(is_call, call, call - S * disc_q + K * disc_r)
+    delta = np.where(is_call, disc_q * nd1, disc_q * (nd1 - 1.0))
+    gamma = disc_q * pdf / (S * sigma * sqrt_t)
+    vega = S * disc_q * pdf * sqrt_t
+    decay = -S * disc_q * pdf * sigma / (2.0 * sqrt_t)
+    theta = np.where(
+        is_call,
+        decay - r * K * disc_r * nd2 + q * S * disc_q * nd1,
+        decay + r * K * disc_r * (1.0 - nd2) - q * S * disc_q * (1.0 - nd1),
+    )
+    return {"price": price, "delta": delta, "gamma": gamma, "vega": vega / 100.0, "theta": theta / 365.0}
+
+
+def implied_vol(price, S, K, T, is_call, r=RISK_FREE_RATE, q=DIVIDEND_YIELD, tol=1e-6, max_iter=100):
+    """
+    Implied volatility for arrays of option prices. Newton steps are taken
+    while they stay inside a per-contract [low, high] bracket that tightens
+    every iteration; otherwise the step is a bisection. Prices outside the
+    no-arbitrage bounds (or expired contracts) give NaN. `tol` is the
+    absolute price error accepted.
+    """
+    price, S, K, T = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, S, K, T)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    price, S, K, T, is_call = (a.ravel() for a in (price, S, K, T, is_call))
+    n = price.size
+
+    fwd_s, fwd_k = S * np.exp(-q * T), K * np.exp(-r * T)
+    intrinsic = np.where(is_call, np.maximum(fwd_s - fwd_k, 0.0), np.maximum(fwd_k - fwd_s, 0.0))
+    upper = np.where(is_call, fwd_s, fwd_k)
+    with np.errstate(invalid="ignore"):
+        valid = (T > 0) & (S > 0) & (K > 0) & (price > intrinsic) & (price < upper)
+
+    sigma = np.full(n, np.nan)
+    low = np.full(n, IV_LOW)
+    high = np.full(n, IV_HIGH)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Brenner-Subrahmanyam start, good near the money.
+        guess = np.sqrt(2.0 * np.pi / T) * price / S
+    sigma[valid] = np.clip(guess[valid], 0.05, 2.0)
+
+    active = np.flatnonzero(valid)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        s = sigma[active]
+        Sa, Ka, Ta, qa = S[active], K[active], T[active], is_call[active]
+        d1, d2 = _d1_d2(Sa, Ka, Ta, s, r, q)
+        fs, fk = fwd_s[active], fwd_k[active]
+        call = fs * norm_cdf(d1) - fk * norm_cdf(d2)
+        diff = np.where(qa, call, call - fs + fk) - price[active]
+        vega = fs * norm_pdf(d1) * np.sqrt(Ta)
+
+        lo = np.where(diff < 0, s, low[active])
+        hi = np.where(diff > 0, s, high[active])
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = s - diff / vega
+        bisect = ~((step > lo) & (step < hi))
+        new = np.where(bisect, 0.5 * (lo + hi), step)
+
+        sigma[active], low[active], high[active] = new, lo, hi
+        done = (np.abs(diff) < tol) | (hi - lo < 1e-10)
+        sigma[active[done]] = s[done]
+        active = active[~done]
+    return sigma
+
+
+def price_bucket(spot, bucket_bps=GREEKS_BUCKET_BPS):
+    """Integer bucket of the underlying price on a log scale of `bucket_bps` steps."""
+    return int(math.floor(math.log(spot) / math.log1p(bucket_bps / 1e4)))
+
+
+class GreeksCache:
+    """
+    IV and Greeks per (token, underlying price bucket) for one cycle. Each
+    bucket keeps its tokens in a sorted array, so lookups and the single
+    array call for the misses stay vectorized. Call clear() at the start of
+    every cycle.
+    """
+
+    def __init__(self, bucket_bps=GREEKS_BUCKET_BPS, r=RISK_FREE_RATE, q=DIVIDEND_YIELD):
+        self.bucket_bps = bucket_bps
+        self.r = r
+        self.q = q
+        self._tables = {}  # bucket -> (sorted tokens, values rows)
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._tables.clear()
+
+    def compute(self, tokens, spot, strikes, T, prices, is_call):
+        """
+        Greeks for a set of contracts on one underlying at `spot`: a dict of
+        arrays (GREEK_FIELDS) aligned to `tokens`.
+        """
+        tokens = np.asarray(tokens).astype(str)
+        n = len(tokens)
+        bucket = price_bucket(spot, self.bucket_bps)
+        known, table = self._tables.get(bucket, (np.array([], dtype=tokens.dtype), np.empty((0, len(GREEK_FIELDS)))))
+
+        pos = np.searchsorted(known, tokens)
+        found = pos < len(known)
+        found[found] = known[pos[found]] == tokens[found]
+        miss = ~found
+        self.hits += int(found.sum())
+        self.misses += int(miss.sum())
+
+        out = np.empty((n, len(GREEK_FIELDS)))
+        out[found] = table[pos[found]]
+        if miss.any():
+            strikes, T, prices, is_call = (np.broadcast_to(np.asarray(a), (n,))[miss] for a in (strikes, T, prices, is_call))
+            iv = implied_vol(prices, spot, strikes, T, is_call, self.r, self.q)
+            greeks = bs_greeks(spot, strikes, T, iv, is_call, self.r, self.q)
+            out[miss] = np.column_stack([iv] + [greeks[f] for f in GREEK_FIELDS[1:]])
+
+            new_tokens, first = np.unique(tokens[miss], return_index=True)
+            merged = np.concatenate([known, new_tokens])
+            order = np.argsort(merged, kind="stable")
+            self._tables[bucket] = (merged[order], np.concatenate([table, out[miss][first]])[order])
+        return {f: out[:, i] for i, f in enumerate(GREEK_FIELDS)}
+
+
+greeks_cache = GreeksCache()
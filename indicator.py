@@ -3,9 +3,10 @@ import numpy as np
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime, timedelta
-from smartapi import SmartConnect
 import time
 import os
+from signals import evaluate_mcx_signals
+from sheet_writer import SheetWriter
 
 # --- Load credentials from environment ---
 API_KEY = os.getenv("ANGEL_API_KEY")
@@ -14,31 +15,36 @@ CLIENT_CODE = os.getenv("CLIENT_CODE")
 TOTP = os.getenv("TOTP")
 SHEET_ID = os.getenv("SHEET_ID_CRUDEOIL")
 
-# --- Authenticate Google Sheets ---
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
-client = gspread.authorize(creds)
-sheet = client.open_by_key(SHEET_ID).sheet1
-
-# --- Authenticate Angel One ---
-smart = SmartConnect(api_key=API_KEY)
-# ✅ FIX: Use a more robust login method with a try-except block
-try:
-    data = smart.generateSession(client_code=CLIENT_CODE, password=API_SECRET, totp=TOTP)
-    feed_token = smart.getfeedToken()
-    print("Angel One login successful.")
-except Exception as e:
-    print(f"Error during Angel One login: {e}")
-    exit()
-
 # --- Settings ---
 symbols = ["CRUDEOIL", "NATURALGAS"]
 exchange = "MCX"
 interval = "FifteenMinute"
 lookback_minutes = 120
 
+# --- Authenticate Google Sheets ---
+def open_sheet():
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    creds = ServiceAccountCredentials.from_json_keyfile_name("credentials.json", scope)
+    client = gspread.authorize(creds)
+    return client, client.open_by_key(SHEET_ID).sheet1
+
+# --- Authenticate Angel One ---
+def angel_login():
+    # SmartApi looks up the public IP when imported, so it loads with the login.
+    from SmartApi import SmartConnect
+
+    smart = SmartConnect(api_key=API_KEY)
+    # ✅ FIX: Use a more robust login method with a try-except block
+    try:
+        smart.generateSession(client_code=CLIENT_CODE, password=API_SECRET, totp=TOTP)
+        print("Angel One login successful.")
+        return smart
+    except Exception as e:
+        print(f"Error during Angel One login: {e}")
+        return None
+
 # --- Fetch historical data ---
-def fetch_data(symbol):
+def fetch_data(smart, symbol):
     end_time = datetime.now()
     start_time = end_time - timedelta(minutes=lookback_minutes)
 
@@ -98,27 +104,17 @@ def calculate_indicators(df):
     df['VWAP'] = df['vwap_numerator'].cumsum() / df['vwap_denominator'].cumsum()
 
     # Final Signal
-    def get_signal(row):
-        # ✅ FIX: Check for NaN values before comparison
-        if pd.isna(row['RSI']) or pd.isna(row['EMA']) or pd.isna(row['VWAP']):
-            return 'HOLD'
-
-        if row['RSI'] > 60 and row['close'] > row['EMA'] and row['close'] > row['VWAP']:
-            return 'BUY'
-        elif row['RSI'] < 40 and row['close'] < row['EMA'] and row['close'] < row['VWAP']:
-            return 'SELL'
-        else:
-            return 'HOLD'
-
-    df['Signal'] = df.apply(get_signal, axis=1)
+    df['Signal'] = evaluate_mcx_signals(df)
 
     return df
 
 # --- Update Google Sheet ---
-def update_sheet():
+def update_sheet(smart, client, sheet):
+    writer = SheetWriter(client)
+    writer.adopt(sheet.spreadsheet)
     for i, symbol in enumerate(symbols, start=2):
         try:
-            df = fetch_data(symbol)
+            df = fetch_data(smart, symbol)
             if df is None:
                 print(f"Skipping update for {symbol} due to data fetch error.")
                 continue
@@ -130,15 +126,28 @@ def update_sheet():
             
             last = df.iloc[-1]
 
-            sheet.update(f"A{i}", symbol)
-            sheet.update(f"B{i}", round(last["close"], 2))
-            sheet.update(f"C{i}", round(last["RSI"], 2))
-            sheet.update(f"D{i}", round(last["EMA"], 2))
-            sheet.update(f"E{i}", round(last["VWAP"], 2))
-            sheet.update(f"F{i}", last["Signal"])
+            writer.queue(SHEET_ID, sheet.title, f"A{i}:F{i}", [[
+                symbol,
+                round(float(last["close"]), 2),
+                round(float(last["RSI"]), 2),
+                round(float(last["EMA"]), 2),
+                round(float(last["VWAP"]), 2),
+                last["Signal"],
+            ]])
 
-            print(f"{symbol} updated successfully.")
+            print(f"{symbol} queued for update.")
         except Exception as e:
             print(f"Error updating sheet for {symbol}: {e}")
 
-update_sheet()
+    if writer.flush():
+        print("Sheet updated successfully.")
+
+def main():
+    client, sheet = open_sheet()
+    smart = angel_login()
+    if smart is None:
+        return
+    update_sheet(smart, client, sheet)
+
+if __name__ == "__main__":
+    main()
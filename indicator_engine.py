@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# Column names and parameters match main.calculate_indicators (SMA/RSI/MACD)
+# and indicator.calculate_indicators (EMA-21, session VWAP).
+SMA_FAST = 5
+SMA_SLOW = 20
+RSI_WINDOW = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+EMA_SPAN = 21
+
+INDICATOR_COLUMNS = ["SMA_5", "SMA_20", "RSI", "MACD", "SIGNAL_LINE", "EMA", "VWAP"]
+INDICATOR_STATE_FILE = os.getenv("INDICATOR_STATE_FILE", "data/indicator_state.json")
+
+NAN = float("nan")
+
+
+def symbol_groups(df):
+    """Integer group codes per row; factorizing SYMBOL once instead of per groupby."""
+    codes = pd.factorize(df["SYMBOL"])[0] if "SYMBOL" in df.columns else np.zeros(len(df), dtype=np.intp)
+    return pd.Series(codes, index=df.index)
+
+
+def _per_symbol(series, groups, fn):
+    return series.groupby(groups, sort=False).transform(fn)
+
+
+def rolling_sma(close, groups, window):
+    return _per_symbol(close, groups, lambda s: s.rolling(window=window, min_periods=1).mean())
+
+
+def rolling_rsi(close, groups, window):
+    delta = close.groupby(groups, sort=False).diff()
+    gain = _per_symbol(delta.where(delta > 0, 0), groups, lambda s: s.rolling(window).mean())
+    loss = _per_symbol(-delta.where(delta < 0, 0), groups, lambda s: s.rolling(window).mean())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.where(loss == 0, np.inf, gain / loss)
+    return pd.Series(100 - (100 / (1 + rs)), index=close.index)
+
+
+def ewm_macd(close, groups, fast, slow, signal):
+    """(MACD, SIGNAL_LINE) from adjust=False EWMs."""
+    exp1 = _per_symbol(close, groups, lambda s: s.ewm(span=fast, adjust=False).mean())
+    exp2 = _per_symbol(close, groups, lambda s: s.ewm(span=slow, adjust=False).mean())
+    macd = exp1 - exp2
+    return macd, _per_symbol(macd, groups, lambda s: s.ewm(span=signal, adjust=False).mean())
+
+
+def calculate_indicator_frame(df, sma_fast=SMA_FAST, sma_slow=SMA_SLOW, rsi_window=RSI_WINDOW,
+                              macd_fast=MACD_FAST, macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL):
+    """
+    Batch (pandas) SMA/RSI/MACD over a frame sorted by bar within each
+    SYMBOL; windows never cross symbols. Adds SMA_<fast>, SMA_<slow>, RSI,
+    MACD and SIGNAL_LINE in place and returns df. Shared by the live bot
+    (main.calculate_indicators) and the backtester.
+    """
+    close = df["close"]
+    groups = symbol_groups(df)
+    df[f"SMA_{sma_fast}"] = rolling_sma(close, groups, sma_fast)
+    df[f"SMA_{sma_slow}"] = rolling_sma(close, groups, sma_slow)
+    df["RSI"] = rolling_rsi(close, groups, rsi_window)
+    df["MACD"], df["SIGNAL_LINE"] = ewm_macd(close, groups, macd_fast, macd_slow, macd_signal)
+    return df
+
+
+class RingBuffer:
+    """Fixed-size window of floats; push() is O(1)."""
+
+    __slots__ = ("size", "values", "pos", "count")
+
+    def __init__(self, size, values=None):
+        self.size = size
+        self.values = [0.0] * size
+        self.pos = 0
+        self.count = 0
+        for v in values or []:
+            self.push(v)
+
+    def push(self, value):
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def last(self, n):
+        """The newest min(n, count) values, oldest first."""
+        n = min(n, self.count)
+        start = (self.pos - n) % self.size
+        if start + n <= self.size:
+            return self.values[start:start + n]
+        return self.values[start:] + self.values[:(start + n) - self.size]
+
+    def mean(self, n=None):
+        # fsum over the window is exact, so long streams never drift from the
+        # batch result and the cost stays O(window), independent of history.
+        window = self.last(n or self.size)
+        return math.fsum(window) / len(window) if window else NAN
+
+    def to_list(self):
+        return self.last(self.size)
+
+
+def _ema_step(prev, value, span):
+    # Same arithmetic as pandas' ewm(span=..., adjust=False).mean().
+    if prev is None:
+        return value
+    alpha = 2.0 / (span + 1.0)
+    old_wt = 1.0 - alpha
+    return (old_wt * prev + alpha * value) / (old_wt + alpha)
+
+
+class SymbolIndicators:
+    """Running indicator state for one symbol."""
+
+    def __init__(self):
+        self.closes = RingBuffer(SMA_SLOW)
+        self.gains = RingBuffer(RSI_WINDOW)
+        self.losses = RingBuffer(RSI_WINDOW)
+        self.prev_close = None
+        self.ema_fast = None
+        self.ema_slow = None
+        self.signal = None
+        self.ema = None
+        self.pv_sum = 0.0
+        self.vol_sum = 0.0
+        self.bars = 0
+
+    def update(self, close, high=None, low=None, volume=None):
+        self.bars += 1
+        self.closes.push(close)
+
+        # The first bar has no delta; pandas' where() turns that NaN into a 0 gain/loss.
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        self.prev_close = close
+
+        self.ema_fast = _ema_step(self.ema_fast, close, MACD_FAST)
+        self.ema_slow = _ema_step(self.ema_slow, close, MACD_SLOW)
+        macd = self.ema_fast - self.ema_slow
+        self.signal = _ema_step(self.signal, macd, MACD_SIGNAL)
+        self.ema = _ema_step(self.ema, close, EMA_SPAN)
+
+        if high is not None and low is not None and volume is not None:
+            tp = (high + low + close) / 3
+            self.pv_sum += tp * volume
+            self.vol_sum += volume
+        return self.values(macd)
+
+    def values(self, macd=None):
+        if self.bars == 0:
+            return dict.fromkeys(INDICATOR_COLUMNS, NAN)
+        if macd is None:
+            macd = self.ema_fast - self.ema_slow
+
+        rsi = NAN
+        if self.gains.count == RSI_WINDOW:
+            avg_gain = self.gains.mean()
+            avg_loss = self.losses.mean()
+            rsi = 100.0 if avg_loss == 0 else 100 - (100 / (1 + avg_gain / avg_loss))
+
+        return {
+            "SMA_5": self.closes.mean(SMA_FAST),
+            "SMA_20": self.closes.mean(SMA_SLOW),
+            "RSI": rsi,
+            "MACD": macd,
+            "SIGNAL_LINE": self.signal,
+            "EMA": self.ema,
+            "VWAP": self.pv_sum / self.vol_sum if self.vol_sum else NAN,
+        }
+
+    def to_dict(self):
+        return {
+            "closes": self.closes.to_list(),
+            "gains": self.gains.to_list(),
+            "losses": self.losses.to_list(),
+            "prev_close": self.prev_close,
+            "ema_fast": self.ema_fast,
+            "ema_slow": self.ema_slow,
+            "signal": self.signal,
+            "ema": self.ema,
+            "pv_sum": self.pv_sum,
+            "vol_sum": self.vol_sum,
+            "bars": self.bars,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        state.closes = RingBuffer(SMA_SLOW, d["closes"])
+        state.gains = RingBuffer(RSI_WINDOW, d["gains"])
+        state.losses = RingBuffer(RSI_WINDOW, d["losses"])
+        for key in ("prev_close", "ema_fast", "ema_slow", "signal", "ema", "pv_sum", "vol_sum", "bars"):
+            setattr(state, key, d[key])
+        return state
+
+
+class IndicatorEngine:
+    """
+    Per-symbol streaming indicators: update() appends one bar in O(1) and
+    returns the latest SMA_5, SMA_20, RSI, MACD, SIGNAL_LINE, EMA and VWAP.
+    """
+
+    def __init__(self):
+        self.symbols = {}
+
+    def update(self, symbol, close, high=None, low=None, volume=None):
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = SymbolIndicators()
+        if close is None or math.isnan(close):
+            return state.values()
+        return state.update(float(close), high, low, volume)
+
+    def warm_up(self, df):
+        """Feeds a historical frame (SYMBOL, close[, high, low, volume]) bar by bar."""
+        has_ohlv = all(c in df.columns for c in ("high", "low", "volume"))
+        for symbol, group in df.groupby("SYMBOL", sort=False):
+            closes = pd.to_numeric(group["close"], errors="coerce").to_numpy()
+            if has_ohlv:
+                highs = group["high"].to_numpy(dtype=float)
+                lows = group["low"].to_numpy(dtype=float)
+                vols = group["volume"].to_numpy(dtype=float)
+                for c, h, l, v in zip(closes, highs, lows, vols):
+                    self.update(symbol, c, h, l, v)
+            else:
+                for c in closes:
+                    self.update(symbol, c)
+
+    def snapshot(self):
+        """Latest values, one row per symbol."""
+        rows = []
+        for symbol, state in self.symbols.items():
+            row = {"SYMBOL": symbol, "close": state.prev_close}
+            row.update(state.values())
+            rows.append(row)
+        return pd.DataFrame(rows, columns=["SYMBOL", "close"] + INDICATOR_COLUMNS)
+
+    def to_dict(self):
+        return {symbol: state.to_dict() for symbol, state in self.symbols.items()}
+
+    @classmethod
+    def from_dict(cls, d):
+        engine = cls()
+        engine.symbols = {symbol: SymbolIndicators.from_dict(s) for symbol, s in d.items()}
+        return engine
+
+    def save(self, path=INDICATOR_STATE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDICATOR_STATE_FILE):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
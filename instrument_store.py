@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+import codecs
+import json
+import logging
+import os
+import re
+import resource
+import shutil
+from datetime import datetime, time as dt_time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import requests
+
+MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+INSTRUMENT_STORE_DIR = os.getenv("INSTRUMENT_STORE_DIR", "data/instruments")
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+# Angel One republishes the scrip master before the session; refresh after this.
+MASTER_REFRESH_TIME = dt_time(8, 0)
+
+STRING_COLUMNS = ["token", "symbol", "name", "expiry", "instrumenttype", "exch_seg", "option_type"]
+FLOAT_COLUMNS = ["strike", "lotsize", "tick_size"]
+
+EXCHANGES = {"NFO", "BSE", "NSE"}
+INSTRUMENT_TYPES = {"OPTCOM", "FUTCOM", "FUTIDX", "EQ"}
+INDICES = ['NIFTY', 'BANKNIFTY', 'FINNIFTY', 'MIDCPNIFTY', 'SENSEX']
+INDICES_PATTERN = re.compile('|'.join(
+    [re.escape(i) for i in INDICES] + ['NIFTY 50', 'NIFTY BANK', 'NIFTY FINANCIAL SERVICES', 'NIFTY MIDCAP 100']
+))
+
+# Sheet symbol -> index names as they appear in the master (first match wins).
+INDEX_ALIASES = {
+    "NIFTY": ["NIFTY 50"],
+    "BANKNIFTY": ["NIFTY BANK"],
+    "FINNIFTY": ["NIFTY FIN SERVICE", "NIFTY FINANCIAL SERVICES"],
+    "MIDCPNIFTY": ["NIFTY MID SELECT", "NIFTY MIDCAP 100"],
+    "SENSEX": ["SENSEX"],
+}
+
+
+def keep_record(rec):
+    """
+    NSE/BSE/NFO instruments on the tracked indices, commodity/index futures
+    and options, and cash equities (listed with an empty instrumenttype and a
+    '-EQ' symbol suffix in the master).
+    """
+    if rec.get("exch_seg") not in EXCHANGES:
+        return False
+    name = str(rec.get("name") or "").upper()
+    symbol = str(rec.get("symbol") or "").upper()
+    return (bool(INDICES_PATTERN.search(name))
+            or rec.get("instrumenttype") in INSTRUMENT_TYPES
+            or symbol.endswith("-EQ"))
+
+
+def _option_type(instrumenttype, symbol):
+    if instrumenttype.startswith("OPT") and symbol[-2:] in ("CE", "PE"):
+        return symbol[-2:]
+    if instrumenttype.startswith("FUT"):
+        return "FUT"
+    return ""
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class RecordBuilder:
+    """Accumulates filtered master records column by column."""
+
+    def __init__(self):
+        self.columns = {c: [] for c in STRING_COLUMNS + FLOAT_COLUMNS}
+
+    def add(self, rec):
+        symbol = str(rec.get("symbol") or "").upper()
+        instrumenttype = str(rec.get("instrumenttype") or "")
+        strike = _to_float(rec.get("strike"))
+        cols = self.columns
+        cols["token"].append(str(rec.get("token") or ""))
+        cols["symbol"].append(symbol)
+        cols["name"].append(str(rec.get("name") or "").upper())
+        cols["expiry"].append(str(rec.get("expiry") or "").upper())
+        cols["instrumenttype"].append(instrumenttype)
+        cols["exch_seg"].append(str(rec.get("exch_seg") or ""))
+        cols["option_type"].append(_option_type(instrumenttype, symbol))
+        # The master quotes strikes in paise.
+        cols["strike"].append(strike / 100 if strike > 0 else 0.0)
+        cols["lotsize"].append(_to_float(rec.get("lotsize")))
+        cols["tick_size"].append(_to_float(rec.get("tick_size")))
+
+    def __len__(self):
+        return len(self.columns["token"])
+
+    def arrays(self):
+        out = {}
+        for c in STRING_COLUMNS:
+            out[c] = np.array(self.columns[c], dtype=str) if self.columns[c] else np.array([], dtype="<U1")
+        for c in FLOAT_COLUMNS:
+            out[c] = np.array(self.columns[c], dtype=np.float64)
+        return out
+
+
+def _contract_keys(arrays):
+    strikes = np.char.mod("%g", arrays["strike"])
+    return np.char.add(np.char.add(np.char.add(np.char.add(np.char.add(
+        arrays["name"], "|"), arrays["expiry"]), "|"), strikes), np.char.add("|", arrays["option_type"]))
+
+
+def contract_key(name, expiry, strike, option_type):
+    return f"{str(name).upper()}|{str(expiry).upper()}|{float(strike):g}|{str(option_type).upper()}"
+
+
+def _resolve_aliases(arrays):
+    aliases = {}
+    is_index = arrays["instrumenttype"] == "AMXIDX"
+    for alias, names in INDEX_ALIASES.items():
+        for candidate in names:
+            hits = np.flatnonzero(is_index & ((arrays["symbol"] == candidate) | (arrays["name"] == candidate)))
+            if len(hits):
+                aliases[alias] = int(hits[0])
+                break
+    return aliases
+
+
+def write_store(builder, path=INSTRUMENT_STORE_DIR, fetched_at=None):
+    """Writes columns, sorted lookup indexes and metadata, replacing the old store atomically."""
+    arrays = builder.arrays()
+    indexes = {
+        "tradingsymbol": arrays["symbol"],
+        "token": arrays["token"],
+        "contract": _contract_keys(arrays),
+    }
+
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, values in arrays.items():
+        np.save(tmp / f"{name}.npy", values)
+    for name, keys in indexes.items():
+        order = np.argsort(keys, kind="stable")
+        np.save(tmp / f"idx_{name}_keys.npy", keys[order])
+        np.save(tmp / f"idx_{name}_rows.npy", order.astype(np.int64))
+
+    meta = {
+        "fetched_at": (fetched_at or datetime.now(MARKET_TZ)).isoformat(),
+        "rows": len(builder),
+        "aliases": _resolve_aliases(arrays),
+    }
+    with open(tmp / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return InstrumentStore(path)
+
+
+class InstrumentStore:
+    """
+    Read-only instrument master backed by memory-mapped .npy columns. Columns
+    and indexes are mapped on first use; lookups binary-search persisted
+    sorted indexes, so opening the store costs only the meta.json read.
+    get() mirrors the old tokens.json dict: store.get("SBIN-EQ")["token"].
+    """
+
+    def __init__(self, path=INSTRUMENT_STORE_DIR):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.fetched_at = datetime.fromisoformat(self.meta["fetched_at"])
+        self._arrays = {}
+
+    def column(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._arrays[name]
+
+    def __len__(self):
+        return int(self.meta["rows"])
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __contains__(self, symbol):
+        return self.find("tradingsymbol", symbol) is not None or str(symbol).upper() in self.meta["aliases"]
+
+    def is_stale(self, now=None):
+        """True once the master has been republished since the last download."""
+        now = now or datetime.now(MARKET_TZ)
+        boundary = datetime.combine(now.date(), MASTER_REFRESH_TIME, MARKET_TZ)
+        if now < boundary:
+            boundary -= timedelta(days=1)
+        return self.fetched_at < boundary
+
+    def _find_all(self, index, key):
+        keys = self.column(f"idx_{index}_keys")
+        lo = np.searchsorted(keys, key, side="left")
+        hi = np.searchsorted(keys, key, side="right")
+        return self.column(f"idx_{index}_rows")[lo:hi]
+
+    def find(self, index, key):
+        rows = self._find_all(index, key)
+        return int(rows[0]) if len(rows) else None
+
+    def row(self, i):
+        rec = {c: str(self.column(c)[i]) for c in STRING_COLUMNS}
+        rec.update({c: float(self.column(c)[i]) for c in FLOAT_COLUMNS})
+        rec["tradingsymbol"] = rec["symbol"]
+        return rec
+
+    def get(self, symbol, default=None):
+        """Instrument dict by trading symbol or index alias (NIFTY, BANKNIFTY, ...)."""
+        if symbol is None:
+            return default
+        key = str(symbol).upper()
+        i = self.meta["aliases"].get(key)
+        if i is None:
+            i = self.find("tradingsymbol", key)
+        return self.row(i) if i is not None else default
+
+    def by_token(self, token, exch_seg=None):
+        for i in self._find_all("token", str(token)):
+            if exch_seg is None or self.column("exch_seg")[i] == exch_seg:
+                return self.row(int(i))
+        return None
+
+    def contract(self, name, expiry, strike, option_type):
+        i = self.find("contract", contract_key(name, expiry, strike, option_type))
+        return self.row(i) if i is not None else None
+
+
+MASTER_CHUNK_SIZE = 1 << 16
+_DATA_ARRAY = re.compile(r'"data"\s*:\s*\[')
+
+
+def _iter_master_chunks(source, chunk_size=MASTER_CHUNK_SIZE):
+    """Raw byte chunks from the master URL (streamed) or a recorded local file."""
+    if str(source).startswith(("http://", "https://")):
+        with requests.get(source, timeout=60, stream=True) as r:
+            r.raise_for_status()
+            yield from r.iter_content(chunk_size=chunk_size)
+    else:
+        with open(source, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+
+def iter_json_array(chunks):
+    """
+    Yields the objects of a top-level JSON array (or of a {"data": [...]}
+    wrapper) while the bytes arrive, so only one chunk plus one partial
+    record is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, started = "", 0, False
+
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] == "[":
+                    started, pos = True, pos + 1
+                    continue
+                match = _DATA_ARRAY.search(buf, pos)
+                if buf[pos] != "{" or not match:
+                    break  # wait for the wrapper's "data" key
+                started, pos = True, match.end()
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # record continues in the next chunk
+            yield obj
+    if not started:
+        raise ValueError("Unexpected master JSON structure.")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def refresh_store(url=MASTER_URL, path=INSTRUMENT_STORE_DIR):
+    """
+    Streams the master (URL or recorded file), filters records as they are
+    parsed and writes the instrument store directly.
+    """
+    logging.info(f"🔄 Downloading master scrip from {url} ...")
+    builder = RecordBuilder()
+    seen = 0
+    for rec in iter_json_array(_iter_master_chunks(url)):
+        seen += 1
+        if keep_record(rec):
+            builder.add(rec)
+    if not len(builder):
+        raise ValueError("Filtered master is empty. No tokens found.")
+    store = write_store(builder, path)
+    logging.info(f"✅ Instrument store refreshed with {len(store)} of {seen} instruments "
+                 f"(peak RSS {peak_rss_mb():.0f} MB).")
+    return store
+
+
+def load_store(url=MASTER_URL, path=INSTRUMENT_STORE_DIR):
+    """
+    Opens the local store, refreshing it once per trading day. A failed
+    refresh falls back to the previous store; returns None if there is none.
+    """
+    store = None
+    try:
+        store = InstrumentStore(path)
+        if not store.is_stale():
+            return store
+        logging.info(f"Instrument store from {store.fetched_at:%Y-%m-%d %H:%M} is stale.")
+    except FileNotFoundError:
+        logging.warning(f"⚠️ Instrument store not found at {path}. Fetching from API...")
+    except Exception as e:
+        logging.error(f"❌ Error reading instrument store: {e}")
+
+    try:
+        return refresh_store(url, path)
+    except Exception as e:
+        logging.error(f"❌ Error fetching or saving tokens: {e}")
+        return store
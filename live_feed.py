@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import websocket
+
+from bar_aggregator import BarAggregator
+from indicator_engine import IndicatorEngine
+from strategy import DEFAULT_STRATEGY, compile_strategy, evaluate_row
+
+FEED_URL = os.getenv("LIVE_FEED_URL", "wss://smartapisocket.angelone.in/smart-stream")
+LIVE_FEED_MAX_TOKENS = int(os.getenv("LIVE_FEED_MAX_TOKENS", "1000"))  # SmartAPI per-session subscription limit
+LIVE_TIMEFRAMES = [tf.strip() for tf in os.getenv("LIVE_TIMEFRAMES", "1m").split(",")]  # first one drives signals
+TICK_BUFFER_SIZE = int(os.getenv("TICK_BUFFER_SIZE", "1024"))
+LATENCY_SAMPLES = int(os.getenv("LATENCY_SAMPLES", "10000"))  # recent signals kept for latency percentiles
+HEARTBEAT_SECONDS = 10
+SUBSCRIBE_CHUNK = 500
+
+MODE_LTP = 1
+MODE_QUOTE = 2
+EXCHANGE_TYPES = {"NSE": 1, "NFO": 2, "BSE": 3, "BFO": 4, "MCX": 5, "NCDEX": 7, "CDS": 13}
+EXCHANGE_NAMES = {v: k for k, v in EXCHANGE_TYPES.items()}
+
+# SmartAPI v2 binary packets (little endian). Prices are in paise.
+LTP_DTYPE = np.dtype([
+    ("mode", "u1"), ("exchange_type", "u1"), ("token", "S25"),
+    ("sequence", "<i8"), ("exchange_ts", "<i8"), ("ltp", "<i8"),
+])
+QUOTE_DTYPE = np.dtype(LTP_DTYPE.descr + [
+    ("last_traded_qty", "<i8"), ("avg_price", "<i8"), ("volume", "<i8"),
+    ("total_buy_qty", "<f8"), ("total_sell_qty", "<f8"),
+    ("open", "<i8"), ("high", "<i8"), ("low", "<i8"), ("close", "<i8"),
+])
+
+
+def decode_packet(data):
+    """One binary tick as a structured NumPy record (LTP or quote layout)."""
+    dtype = QUOTE_DTYPE if data[0] >= MODE_QUOTE and len(data) >= QUOTE_DTYPE.itemsize else LTP_DTYPE
+    return np.frombuffer(data, dtype=dtype, count=1)[0]
+
+
+def encode_packet(token, exchange_type, exchange_ts, ltp, sequence=0, volume=None):
+    """Builds a packet in the feed's layout; a `volume` makes it a quote packet."""
+    dtype = LTP_DTYPE if volume is None else QUOTE_DTYPE
+    rec = np.zeros(1, dtype=dtype)
+    rec["mode"] = MODE_LTP if volume is None else MODE_QUOTE
+    rec["exchange_type"] = exchange_type
+    rec["token"] = str(token).encode()
+    rec["sequence"] = sequence
+    rec["exchange_ts"] = exchange_ts
+    rec["ltp"] = round(ltp * 100)
+    if volume is not None:
+        rec["volume"] = volume
+    return rec.tobytes()
+
+
+def feed_instruments(store, symbols, limit=LIVE_FEED_MAX_TOKENS):
+    """[(token, exchange_type, symbol)] for the symbols found in the instrument store."""
+    instruments = []
+    for symbol in symbols:
+        info = store.get(symbol)
+        if not info or info.get("exch_seg") not in EXCHANGE_TYPES:
+            continue
+        instruments.append((str(info["token"]), EXCHANGE_TYPES[info["exch_seg"]], info["tradingsymbol"]))
+    if len(instruments) > limit:
+        logging.warning(f"Live feed limited to {limit} of {len(instruments)} instruments.")
+        instruments = instruments[:limit]
+    return instruments
+
+
+class TickBuffer:
+    """
+    Preallocated per-instrument ring buffers of the latest ticks
+    (exchange time in ms, price, cumulative day volume).
+    """
+
+    def __init__(self, n, size=TICK_BUFFER_SIZE):
+        self.size = size
+        self.ts = np.zeros((n, size), dtype=np.int64)
+        self.price = np.full((n, size), np.nan)
+        self.volume = np.full((n, size), np.nan)
+        self.count = np.zeros(n, dtype=np.int64)
+
+    def push(self, slot, ts, price, volume):
+        i = self.count[slot] % self.size
+        self.ts[slot, i] = ts
+        self.price[slot, i] = price
+        self.volume[slot, i] = volume
+        self.count[slot] += 1
+
+    def last(self, slot, n=1):
+        """The latest `n` prices of one instrument, oldest first."""
+        count = self.count[slot]
+        n = min(n, count, self.size)
+        idx = (np.arange(count - n, count)) % self.size
+        return self.price[slot, idx]
+
+
+class LiveFeed:
+    """
+    SmartAPI WebSocket v2 client: subscribes the instruments, decodes binary
+    ticks into a TickBuffer and feeds a BarAggregator for every timeframe in
+    `timeframes`. When a bar closes (first tick of the next bar, or a timer
+    once the feed clock has passed the boundary) it is pushed into that
+    timeframe's IndicatorEngine; bars of the first timeframe also run the
+    trading strategies for the symbol, calling on_signal(symbol, side,
+    reason, bar) at most once per symbol and bar (none when they disagree).
+    """
+
+    def __init__(self, instruments, auth_token, api_key, client_code, feed_token, engines=None,
+                 strategies=None, on_signal=None, on_bar=None, mode=MODE_LTP, timeframes=None,
+                 url=FEED_URL, record_path=None):
+        self.instruments = list(instruments)
+        self.slots = {(tok, ex): i for i, (tok, ex, _) in enumerate(self.instruments)}
+        self.symbols = [sym for _, _, sym in self.instruments]
+        self.headers = {
+            "Authorization": auth_token,
+            "x-api-key": api_key,
+            "x-client-code": client_code,
+            "x-feed-token": feed_token,
+        }
+        self.timeframes = list(timeframes or LIVE_TIMEFRAMES)
+        self.engines = {tf: (engines or {}).get(tf) or IndicatorEngine() for tf in self.timeframes}
+        self.engine = self.engines[self.timeframes[0]]
+        self.strategies = [s for s in (strategies or [DEFAULT_STRATEGY]) if compile_strategy(s).trade]
+        self.on_signal = on_signal
+        self.on_bar = on_bar
+        self.mode = mode
+        self.url = url
+        self.record_path = record_path
+        self._record = None
+
+        n = len(self.instruments)
+        self.ticks = TickBuffer(n)
+        self.bars = BarAggregator(
+            self.symbols, [EXCHANGE_NAMES.get(ex, "NSE") for _, ex, _ in self.instruments],
+            self.timeframes, on_bar=self._bar_closed,
+        )
+        self.last_volume = np.full(n, np.nan)
+        self._lock = threading.Lock()
+        self._clock = (0, 0.0)  # (latest exchange ts, monotonic time it arrived)
+        self._triggered = 0.0
+        self._stop = threading.Event()
+        self.ws = None
+        self.stats = {"ticks": 0, "bars": 0, "signals": 0, "unknown_tokens": 0}
+        self.signal_latency = deque(maxlen=LATENCY_SAMPLES)  # seconds from the bar-closing event to the signal
+
+    # --- WebSocket plumbing ---
+    def _subscribe_requests(self):
+        by_exchange = {}
+        for tok, ex, _ in self.instruments:
+            by_exchange.setdefault(ex, []).append(tok)
+        requests_ = []
+        for ex, tokens in by_exchange.items():
+            for i in range(0, len(tokens), SUBSCRIBE_CHUNK):
+                requests_.append({
+                    "correlationID": f"algo{len(requests_):06d}",
+                    "action": 1,
+                    "params": {"mode": self.mode, "tokenList": [{"exchangeType": ex, "tokens": tokens[i:i + SUBSCRIBE_CHUNK]}]},
+                })
+        return requests_
+
+    def _on_open(self, ws):
+        for req in self._subscribe_requests():
+            ws.send(json.dumps(req))
+        logging.info(f"Live feed subscribed to {len(self.instruments)} instruments.")
+
+    def _on_data(self, ws, data, data_type, cont):
+        if data_type == websocket.ABNF.OPCODE_BINARY:
+            if self._record:
+                self._record.write(len(data).to_bytes(2, "little") + data)
+            self.handle_packet(data)
+
+    def _on_error(self, ws, error):
+        if isinstance(error, websocket.WebSocketConnectionClosedException):
+            logging.info(f"Live feed closed: {error}")
+        else:
+            logging.error(f"Live feed error: {error}")
+
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                self.ws.send("ping")
+            except Exception:
+                pass
+
+    def _bar_timer(self):
+        while not self._stop.wait(1.0):
+            self.close_due()
+
+    def run(self, reconnect=True):
+        """Blocks until stop(); reconnects with backoff when the socket drops."""
+        if self.record_path:
+            self._record = open(self.record_path, "ab")
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+        threading.Thread(target=self._bar_timer, daemon=True).start()
+        backoff = 1.0
+        try:
+            while not self._stop.is_set():
+                self.ws = websocket.WebSocketApp(
+                    self.url, header=self.headers, on_open=self._on_open, on_data=self._on_data, on_error=self._on_error
+                )
+                self.ws.run_forever()
+                if not reconnect or self._stop.is_set():
+                    break
+                logging.warning(f"Live feed disconnected, reconnecting in {backoff:.0f}s.")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+        finally:
+            self._stop.set()
+            if self._record:
+                self._record.close()
+                self._record = None
+
+    def stop(self):
+        self._stop.set()
+        if self.ws:
+            self.ws.close()
+
+    # --- Ticks and bars ---
+    def handle_packet(self, data):
+        received = time.perf_counter()
+        rec = decode_packet(data)
+        slot = self.slots.get((rec["token"].decode(), int(rec["exchange_type"])))
+        if slot is None:
+            self.stats["unknown_tokens"] += 1
+            return
+        ts = int(rec["exchange_ts"])
+        price = rec["ltp"] / 100.0
+        volume = float(rec["volume"]) if "volume" in rec.dtype.names else np.nan
+
+        with self._lock:
+            self.stats["ticks"] += 1
+            self._triggered = received
+            self.ticks.push(slot, ts, price, volume)
+            if ts > self._clock[0]:
+                self._clock = (ts, time.monotonic())
+            # Day volume is cumulative; each tick adds the increase since the previous one.
+            prev = self.last_volume[slot]
+            traded = 0.0 if np.isnan(prev) or np.isnan(volume) else max(volume - prev, 0.0)
+            self.last_volume[slot] = volume
+            self.bars.update(slot, ts, price, price, price, price, traded)
+
+    def feed_now(self):
+        """Feed clock: latest exchange timestamp advanced by the wall time since it arrived."""
+        ts, at = self._clock
+        return ts + int((time.monotonic() - at) * 1000) if ts else 0
+
+    def close_due(self, now_ms=None):
+        """Closes every open bar whose interval has ended on the feed clock."""
+        now_ms = self.feed_now() if now_ms is None else now_ms
+        if not now_ms:
+            return
+        with self._lock:
+            self._triggered = time.perf_counter()
+            self.bars.flush(now_ms)
+
+    def _bar_closed(self, bar):
+        self.stats["bars"] += 1
+        tf = bar["timeframe"]
+        # Without volume (LTP mode) the engine leaves VWAP as NaN.
+        if self.mode >= MODE_QUOTE:
+            values = self.engines[tf].update(bar["SYMBOL"], bar["close"], bar["high"], bar["low"], bar["volume"])
+        else:
+            values = self.engines[tf].update(bar["SYMBOL"], bar["close"])
+        if self.on_bar:
+            self.on_bar(bar, values)
+        if tf != self.timeframes[0]:
+            return
+
+        # Same rule as evaluate_signals: one signal per symbol, none when strategies disagree.
+        row = dict(values, close=bar["close"])
+        sides = {}
+        for strat in self.strategies:
+            side = evaluate_row(strat, row)
+            if side in ("BUY", "SELL"):
+                sides.setdefault(side, compile_strategy(strat))
+        if len(sides) > 1:
+            details = ", ".join(f"{side}: {strat.name}" for side, strat in sides.items())
+            logging.warning(f"Conflicting strategy signals, no order for: {bar['SYMBOL']} ({details})")
+            return
+        for side, strat in sides.items():
+            self.stats["signals"] += 1
+            self.signal_latency.append(time.perf_counter() - self._triggered)
+            if self.on_signal:
+                self.on_signal(bar["SYMBOL"], side, strat.reason, bar)
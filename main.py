@@ -1,20 +1,35 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import requests
 import pandas as pd
 import numpy as np
 import gspread
 import json
-from oauth2client.service_account import ServiceAccountCredentials
-from SmartApi import SmartConnect
-import pyotp
 import logging
 from pathlib import Path
 import sys
 from gspread.exceptions import WorksheetNotFound, APIError
 import time
+import queue
+import threading
 from datetime import datetime, timedelta
 import re
+import profiling
+from quote_fetcher import fetch_ltp_series
+from sheet_writer import sheet_writer_for
+from sheet_snapshot import check_snapshots_for_edits, get_snapshot, mark_snapshots_synced
+from instrument_store import load_store, refresh_store
+from trade_journal import JOURNAL_DRAIN_TIMEOUT, TradeJournal
+from position_store import PositionStore
+from order_executor import OrderExecutor, OrderIntent
+from session_manager import SessionManager
+from candle_store import fetch_history_cached
+from option_chain import option_chain_pcr
+from greeks import greeks_cache
+from signals import evaluate_signals, format_signals
+from scheduler import BarScheduler
+from strategy import compile_strategy, evaluate_strategies, load_strategies
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
@@ -28,27 +43,49 @@ LIVE_TRADING = os.getenv("LIVE_TRADING", "false").strip().lower() in ("1", "true
 ORDER_QTY = int(os.getenv("ORDER_QTY", "1"))
 PRODUCT_TYPE = os.getenv("PRODUCT_TYPE", "MIS")
 MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
-SLEEP_SECONDS = 900  # Run every 15 minutes
+BAR_INTERVAL_SECONDS = int(os.getenv("BAR_INTERVAL_SECONDS", "900"))  # Run on every 15-minute bar close
+SHEET_COLUMNS = ["SYMBOL", "CLOSE", "QUANTITY", "PUT_VOLUME", "CALL_VOLUME", "PUT_OI", "CALL_OI"]  # Only these are read from LIVE DATA
+STRATEGIES = []  # set by init(): STRATEGY_FILE (JSON/YAML) or the built-in multi-indicator rules
 
 ANGEL_API_KEY = os.getenv("ANGEL_API_KEY")
 ANGEL_CLIENT_CODE = os.getenv("ANGEL_CLIENT_CODE")
 ANGEL_CLIENT_PWD = os.getenv("ANGEL_CLIENT_PWD")
 ANGEL_TOTP_SECRET = os.getenv("ANGEL_TOTP_SECRET", "").strip().replace(" ", "")
 
-if not all([ANGEL_API_KEY, ANGEL_CLIENT_CODE, ANGEL_CLIENT_PWD, ANGEL_TOTP_SECRET, GSHEET_ID, GSHEET_CREDS_JSON]):
-    logging.error("❌ ERROR: Required environment variables are missing.")
-    sys.exit(1)
+# Set up by init(), so importing this module reads no strategy file and opens no stores or connections.
+creds_dict = None
+current_positions = None  # To prevent duplicate orders; persisted and reconciled with the broker once per process
+journal = None
+order_executor = None
+session_manager = None
+
+def init():
+    """
+    Checks the credentials, loads the strategies and opens the position,
+    journal and session stores.
+    Called once per process before the bot runs (the CLI does this).
+    """
+    global creds_dict, current_positions, journal, order_executor, session_manager, STRATEGIES
+    if session_manager is not None:
+        return
+    if not all([ANGEL_API_KEY, ANGEL_CLIENT_CODE, ANGEL_CLIENT_PWD, ANGEL_TOTP_SECRET, GSHEET_ID, GSHEET_CREDS_JSON]):
+        logging.error("❌ ERROR: Required environment variables are missing.")
+        sys.exit(1)
 
-try:
-    creds_dict = json.loads(GSHEET_CREDS_JSON)
-except json.JSONDecodeError as e:
-    logging.error(f"❌ GSHEET_CREDS_JSON is invalid: {e}")
-    sys.exit(1)
+    try:
+        creds_dict = json.loads(GSHEET_CREDS_JSON)
+    except json.JSONDecodeError as e:
+        logging.error(f"❌ GSHEET_CREDS_JSON is invalid: {e}")
+        sys.exit(1)
 
-# To prevent duplicate orders
-current_positions = {}
+    STRATEGIES = load_strategies()
+    current_positions = PositionStore()
+    journal = TradeJournal(GSHEET_ID, sheet_name=TRADE_JOURNAL_SHEET)
+    order_executor = OrderExecutor()
+    session_manager = SessionManager(ANGEL_API_KEY, ANGEL_CLIENT_CODE, ANGEL_CLIENT_PWD, ANGEL_TOTP_SECRET)
 
 # --- UTILITY FUNCTIONS ---
+@profiling.timed("alerts")
 def send_telegram_message(msg, gs_client=None):
     tok = os.getenv("TELEGRAM_BOT_TOKEN")
     chat = os.getenv("TELEGRAM_CHAT_ID")
@@ -66,109 +103,68 @@ def send_telegram_message(msg, gs_client=None):
     except Exception as e:
         logging.error(f"Telegram message failed: {e}")
         if gs_client:
-            try:
-                ws = gs_client.open_by_key(GSHEET_ID).worksheet(SHEET_NAME)
-                ws.update("H2", "⚠️ Telegram Failed")
-            except Exception as ee:
-                logging.error(f"Sheet update failed for Telegram error: {ee}")
+            sheet_writer_for(gs_client).queue(GSHEET_ID, SHEET_NAME, "H2", "⚠️ Telegram Failed")
         return False
 
 def get_google_sheet_client():
     try:
         scope = ['https://spreadsheets.google.com/feeds','https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
+        # google-auth service account credentials, already loaded with gspread (oauth2client is not imported).
+        return gspread.service_account_from_dict(creds_dict, scopes=scope)
     except Exception as e:
         logging.error(f"Failed to authorize Google Sheet client: {e}")
         return None
 
-def read_google_sheet_data(client, sheet_id, sheet_name):
+@profiling.timed("sheet_read")
+def read_sheet_snapshot(client, sheet_id, sheet_name, columns=None):
     try:
-        sheet = client.open_by_key(sheet_id).worksheet(sheet_name)
-        data = sheet.get_all_records()
-        if not data:
+        snapshot = get_snapshot(client, sheet_id, sheet_name, columns)
+        if snapshot.frame.empty:
             logging.info(f"Google Sheet '{sheet_name}' is empty or has no data rows.")
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(data)
-        df.columns = df.columns.str.upper()
-        
-        if 'SYMBOL' not in df.columns:
+            return None
+
+        if 'SYMBOL' not in snapshot.frame.columns:
             logging.error("❌ 'SYMBOL' column not found in Google Sheet. Please check the header name.")
-            return pd.DataFrame()
-        
+            return None
+
         logging.info(f"Google Sheet data from '{sheet_name}' read successful.")
-        return df
+        return snapshot
     except WorksheetNotFound:
         logging.warning(f"Worksheet '{sheet_name}' not found. Skipping.")
-        return pd.DataFrame()
+        return None
     except Exception as e:
         logging.error(f"Google Sheet data read failed for '{sheet_name}': {e}")
-        return pd.DataFrame()
+        return None
 
-def update_google_sheet_cell(client, sheet_id, sheet_name, cell, content):
-    try:
-        ws = client.open_by_key(sheet_id).worksheet(sheet_name)
-        if isinstance(content, list):
-            ws.update(values=content, range_name=cell)
-        else:
-            ws.update(values=[[content]], range_name=cell)
-        logging.info(f"Sheet '{sheet_name}' updated at cell {cell}.")
-    except Exception as e:
-        logging.error(f"Sheet update failed for '{sheet_name}': {e}")
+def read_google_sheet_data(client, sheet_id, sheet_name):
+    snapshot = read_sheet_snapshot(client, sheet_id, sheet_name)
+    return snapshot.frame.copy() if snapshot else pd.DataFrame()
 
-def update_trading_journal(client, sheet_id, trade_record):
+def update_google_sheet_cell(client, sheet_id, sheet_name, cell, content):
+    # Queued; run_bot sends all of a cycle's writes in one batch request.
+    sheet_writer_for(client).queue(sheet_id, sheet_name, cell, content)
+    logging.info(f"Sheet '{sheet_name}' update queued for cell {cell}.")
+
+@profiling.timed("journal")
+def update_trading_journal(client, sheet_id, trade_record, held=False):
+    # Recorded in the local journal log; its worker appends to the sheet when run_bot
+    # (or the stream's order worker) starts it after the cycle's sheet writes.
     try:
-        spreadsheet = client.open_by_key(sheet_id)
-        try:
-            journal_sheet = spreadsheet.worksheet(TRADE_JOURNAL_SHEET)
-        except WorksheetNotFound:
-            logging.info(f"Creating new worksheet '{TRADE_JOURNAL_SHEET}'.")
-            journal_sheet = spreadsheet.add_worksheet(title=TRADE_JOURNAL_SHEET, rows="100", cols="6")
-            journal_sheet.append_row(['TIMESTAMP', 'SYMBOL', 'ACTION', 'QUANTITY', 'PRICE', 'ORDER_ID'])
-        
-        journal_sheet.append_row(trade_record)
-        logging.info(f"Trade record added to '{TRADE_JOURNAL_SHEET}'.")
+        entry_id = journal.append(trade_record, held=held)
+        logging.info(f"Trade record {entry_id} queued for '{TRADE_JOURNAL_SHEET}'.")
+        return entry_id
     except Exception as e:
         logging.error(f"Failed to update trading journal: {e}")
+        return None
 
-def fetch_historical_data(api, symbol, token_info, days=30):
-    try:
-        if not api:
-            logging.warning("API is not logged in. Skipping historical data fetch.")
-            return pd.DataFrame()
-        
-        if not token_info or not token_info.get('token') or not token_info.get('exch_seg'):
-            logging.error(f"Invalid token_info for {symbol}: {token_info}")
-            return pd.DataFrame()
-
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-
-        params = {
-            "exchange": token_info.get('exch_seg'),
-            "symboltoken": token_info.get('token'),
-            "interval": "ONE_DAY",
-            "fromdate": start_date.strftime("%Y-%m-%d %H:%M"),
-            "todate": end_date.strftime("%Y-%m-%d %H:%M")
-        }
-        
-        historical_data = api.getCandleData(params)
-        
-        if not historical_data or 'data' not in historical_data or not historical_data['data']:
-            logging.warning(f"No historical data found for {symbol}. Raw response: {historical_data}")
-            return pd.DataFrame()
-        
-        df_hist = pd.DataFrame(historical_data['data'], columns=["date", "open", "high", "low", "close", "volume"])
-        df_hist['close'] = pd.to_numeric(df_hist['close'])
-        
-        logging.info(f"Successfully fetched {len(df_hist)} data points for {symbol}.")
-        return df_hist
-    except Exception as e:
-        logging.error(f"Failed to fetch historical data for {symbol}: {e}")
-        return pd.DataFrame()
+@profiling.timed("history")
+def fetch_historical_data(api, symbols, tokens, days=30):
+    full_df = fetch_history_cached(api, symbols, tokens, days=days)
+    logging.info(f"Historical data ready: {len(full_df)} data points.")
+    return full_df
 
-def get_live_prices_and_update_sheet(api, symbols_df, gs_client, sheet_id, sheet_name):
+@profiling.timed("ltp")
+def get_live_prices_and_update_sheet(api, symbols_df, gs_client, snapshot):
     if not api:
         logging.warning("Angel One API not logged in. Skipping live price fetch.")
         return False
@@ -178,117 +174,57 @@ def get_live_prices_and_update_sheet(api, symbols_df, gs_client, sheet_id, sheet
         logging.error("Required columns for price fetch are missing.")
         return False
 
+    prices = fetch_ltp_series(api, symbols_df)
+
+    # Rows without a token stay blank. The snapshot frame is updated in place and
+    # the write is queued, so the sheet is not read back to pick up CLOSE.
+    snapshot.set_column(gs_client, 'CLOSE', prices.astype(float), fallback_letter='B')
+    logging.info(f"Queued 'CLOSE' column update with {int(prices.notna().sum())} prices.")
+    return True
+
+@profiling.timed("option_chain")
+def update_option_chain_pcr(api, store, gs_client, snapshot):
+    """Fills PUT/CALL volume and OI for the index rows of the sheet from the live option chains."""
     try:
-        ws = gs_client.open_by_key(sheet_id).worksheet(sheet_name)
+        pcr = option_chain_pcr(api, store)
     except Exception as e:
-        logging.error(f"Failed to open worksheet for price update: {e}")
+        logging.error(f"Option chain PCR failed: {e}")
         return False
+    return apply_option_chain_pcr(pcr, gs_client, snapshot)
 
-    prices_to_update = []
-    
-    for _, row in symbols_df.iterrows():
-        try:
-            ltp_data = api.ltpData(
-                exchange=row['exch_seg'],
-                tradingsymbol=row['SYMBOL'],
-                symboltoken=row['symboltoken']
-            )
-            
-            if ltp_data and 'data' in ltp_data and 'ltp' in ltp_data['data']:
-                price = ltp_data['data']['ltp']
-                prices_to_update.append([price])
-                logging.info(f"Fetched LTP for {row['SYMBOL']}: {price}")
-            else:
-                prices_to_update.append([""])
-                logging.warning(f"Failed to fetch LTP for {row['SYMBOL']}.")
-            time.sleep(0.2)
-        except Exception as e:
-            prices_to_update.append([""])
-            logging.error(f"Error fetching LTP for {row['SYMBOL']}: {e}")
-
-    if prices_to_update:
-        try:
-            ws.update(values=prices_to_update, range_name=f'B2:B{1 + len(prices_to_update)}')
-            logging.info(f"Successfully updated 'CLOSE' column with {len(prices_to_update)} prices.")
-        except Exception as e:
-            logging.error(f"Failed to update 'CLOSE' column in sheet: {e}")
-            return False
+def apply_option_chain_pcr(pcr, gs_client, snapshot):
+    if pcr.empty:
+        return False
+
+    symbols = snapshot.frame['SYMBOL'].astype(str).str.strip().str.upper()
+    by_symbol = pcr.set_index('SYMBOL')
+    hits = symbols.isin(by_symbol.index)
+    for col in ['PUT_VOLUME', 'CALL_VOLUME', 'PUT_OI', 'CALL_OI']:
+        current = snapshot.frame[col] if col in snapshot.frame.columns else pd.Series("", index=snapshot.frame.index)
+        values = current.where(~hits, symbols.map(by_symbol[col]))
+        if col in snapshot.header:
+            snapshot.set_column(gs_client, col, values)
+        else:
+            snapshot.frame[col] = values
+    logging.info(f"Option chain PCR applied to {int(hits.sum())} sheet rows.")
     return True
 
 def fetch_and_save_tokens():
     try:
-        logging.info(f"🔄 Downloading master scrip from {MASTER_URL} ...")
-        r = requests.get(MASTER_URL, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-        if isinstance(data, dict) and "data" in data:
-            records = data["data"]
-        elif isinstance(data, list):
-            records = data
-        else:
-            logging.error("❌ Unexpected master JSON structure.")
-            return {}
-
-        df = pd.DataFrame(records)
-        df["symbol"] = df["symbol"].str.upper()
-        df["name"] = df["name"].str.upper()
-
-        indices_list = ['NIFTY', 'BANKNIFTY', 'FINNIFTY', 'MIDCPNIFTY', 'SENSEX']
-        indices_pattern = '|'.join([re.escape(i) for i in indices_list] + ['NIFTY 50', 'NIFTY BANK', 'NIFTY FINANCIAL SERVICES', 'NIFTY MIDCAP 100'])
-
-        filtered_df = df[
-            (df['exch_seg'].isin(['NFO', 'BSE', 'NSE'])) & 
-            ((df['name'].str.contains(indices_pattern, regex=True, na=False)) |
-            (df['instrumenttype'].isin(["OPTCOM", "FUTCOM", "FUTIDX", "EQ"])))
-        ].copy()
-
-        if filtered_df.empty:
-            logging.error("❌ Filtered dataframe is empty. No tokens found.")
-            return {}
-
-        final_tokens = {}
-        for _, row in filtered_df.iterrows():
-            if 'tradingsymbol' not in row:
-                continue
-
-            if 'NIFTY 50' in row['name']:
-                final_tokens['NIFTY'] = row.to_dict()
-            elif 'NIFTY BANK' in row['name']:
-                final_tokens['BANKNIFTY'] = row.to_dict()
-            elif 'NIFTY FINANCIAL SERVICES' in row['name']:
-                final_tokens['FINNIFTY'] = row.to_dict()
-            elif 'NIFTY MIDCAP 100' in row['name']:
-                final_tokens['MIDCPNIFTY'] = row.to_dict()
-            elif 'SENSEX' in row['name']:
-                final_tokens['SENSEX'] = row.to_dict()
-            else:
-                final_tokens[row['tradingsymbol']] = row.to_dict()
-        
-        with open('tokens.json', 'w') as f:
-            json.dump(final_tokens, f, indent=4)
-        
-        logging.info("✅ Tokens successfully saved to tokens.json")
-        logging.info(f"Saved {len(final_tokens)} tokens.")
-        return final_tokens
-
+        return refresh_store(MASTER_URL)
     except Exception as e:
         logging.error(f"❌ Error fetching or saving tokens: {e}")
         return {}
 
+@profiling.timed("tokens")
 def get_tokens():
-    try:
-        with open('tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        logging.info("✅ Successfully loaded tokens from local file.")
-        return data
-    except FileNotFoundError:
-        logging.warning("⚠️ 'tokens.json' not found. Fetching from API...")
-        return fetch_and_save_tokens()
-    except Exception as e:
-        logging.error(f"❌ Error reading local tokens file: {e}")
+    store = load_store(MASTER_URL)
+    if store is None:
         return {}
+    logging.info(f"✅ Instrument store ready: {len(store)} instruments (fetched {store.fetched_at:%Y-%m-%d %H:%M}).")
+    return store
 
+@profiling.timed("indicators")
 def calculate_indicators(df):
     try:
         df['close'] = pd.to_numeric(df['close'], errors='coerce')
@@ -298,253 +234,347 @@ def calculate_indicators(df):
             logging.warning("Not enough data to calculate indicators (min 26 required for MACD).")
             return pd.DataFrame()
 
-        # SMA Calculation (5 and 20 periods)
-        df["SMA_5"] = df["close"].rolling(window=5, min_periods=1).mean()
-        df["SMA_20"] = df["close"].rolling(window=20, min_periods=1).mean()
+        # SMA (5/20), RSI (14) and MACD (12/26/9), computed per symbol
+        from indicator_engine import calculate_indicator_frame
+        df = calculate_indicator_frame(df)
 
         # PCR Calculation
         if "PUT_VOLUME" in df.columns and "CALL_VOLUME" in df.columns:
             df["PUT_VOLUME"] = pd.to_numeric(df["PUT_VOLUME"], errors='coerce').fillna(0)
             df["CALL_VOLUME"] = pd.to_numeric(df["CALL_VOLUME"], errors='coerce').fillna(0)
             df["PCR"] = df["PUT_VOLUME"] / df["CALL_VOLUME"].replace(0, 1)
+            if "PUT_OI" in df.columns and "CALL_OI" in df.columns:
+                call_oi = pd.to_numeric(df["CALL_OI"], errors='coerce')
+                df["PCR_OI"] = pd.to_numeric(df["PUT_OI"], errors='coerce') / call_oi.where(call_oi > 0)
         else:
             df["PCR"] = np.nan
             logging.warning("Put/Call Volume data not found in Google Sheet. PCR will be NaN.")
 
-        # RSI Calculation
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-        rs = np.where(loss == 0, np.inf, gain / loss)
-        df['RSI'] = 100 - (100 / (1 + rs))
-
-        # MACD Calculation
-        exp1 = df['close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['SIGNAL_LINE'] = df['MACD'].ewm(span=9, adjust=False).mean()
-
         logging.info("Indicators calculated: SMA, PCR, RSI and MACD.")
         return df
     except Exception as e:
         logging.error(f"Indicator calculation failed: {e}")
         return pd.DataFrame()
 
+@profiling.timed("signals")
 def generate_signals(df):
-    signals = []
-    if not df.empty:
-        latest = df.groupby("SYMBOL").tail(1).reset_index(drop=True)
-        for _, r in latest.iterrows():
-            if pd.isna(r.get('MACD', np.nan)) or pd.isna(r.get('SIGNAL_LINE', np.nan)) or \
-               pd.isna(r.get('RSI', np.nan)) or pd.isna(r.get('SMA_5', np.nan)) or \
-               pd.isna(r.get('SMA_20', np.nan)):
-                continue
-
-            # BULLISH SIGNAL (BUY)
-            if (r['SMA_5'] > r['SMA_20'] and 
-                r['MACD'] > r['SIGNAL_LINE'] and 
-                r['RSI'] > 60 and 
-                (pd.isna(r['PCR']) or r['PCR'] < 0.75)):
-                signals.append(f"BUY {r['SYMBOL']} (Multi-Indicator)")
-
-            # BEARISH SIGNAL (SELL)
-            elif (r['SMA_5'] < r['SMA_20'] and 
-                  r['MACD'] < r['SIGNAL_LINE'] and 
-                  r['RSI'] < 40 and 
-                  (pd.isna(r['PCR']) or r['PCR'] > 1.10)):
-                signals.append(f"SELL {r['SYMBOL']} (Multi-Indicator)")
-    return signals
-
+    if df.empty:
+        return evaluate_signals(df, STRATEGIES)
+    latest = df.groupby("SYMBOL").tail(1).reset_index(drop=True)
+    monitored = [s for s in STRATEGIES if not compile_strategy(s).trade]
+    if monitored:
+        shadow = evaluate_strategies(latest, monitored)
+        logging.info(f"Monitoring-only strategy signals: {shadow.groupby('STRATEGY').size().to_dict()}")
+    return evaluate_signals(latest, STRATEGIES)
+
+@profiling.timed("login")
 def angel_login():
     if not LIVE_TRADING:
         logging.info("Live trading is off. Skipping Angel login.")
         return None
-    try:
-        api = SmartConnect(api_key=ANGEL_API_KEY)
-        totp = pyotp.TOTP(ANGEL_TOTP_SECRET).now()
-        api.generateSession(
-            ANGEL_CLIENT_CODE,
-            ANGEL_CLIENT_PWD,
-            totp
-        )
-        logging.info("Angel One login successful.")
-        return api
-    except Exception as e:
-        logging.error(f"Angel login failed: {e}")
-        return None
-
-def place_order(api, symbol, side, token_info, quantity, gs_client=None):
+    # Reuses the cached session; renews the JWT with the refresh token and falls back to a TOTP login.
+    api = session_manager.get()
+    if api is None:
+        logging.error("Angel login failed.")
+    return api
+
+def record_ack(result, gs_client=None):
+    # Journaled as soon as the broker acks, held back from the sheet until the fill price is known.
+    intent = result.intent
+    trade_record = [
+        result.placed_at.strftime("%Y-%m-%d %H:%M:%S"),
+        intent.symbol,
+        intent.side,
+        intent.quantity,
+        result.fill_price,
+        result.order_id or "N/A"
+    ]
+    result.entry_id = update_trading_journal(gs_client, GSHEET_ID, trade_record, held=True) or ""
+
+def record_fill(result, gs_client=None):
+    if result.entry_id:
+        journal.release(result.entry_id, price=result.fill_price)
+
+def report_order_failure(result, gs_client=None):
+    if gs_client:
+        intent = result.intent
+        sheet_writer_for(gs_client).queue(intent.sheet_id or GSHEET_ID, intent.sheet_name or SHEET_NAME, "I2",
+                                          f"⚠️ Order Failed {intent.symbol}")
+
+@profiling.timed("orders")
+def place_orders(api, intents, gs_client=None):
     if not api:
-        logging.info(f"Dry-run: Would have placed a {side} order for {symbol} with quantity {quantity}.")
-        return
+        for intent in intents:
+            logging.info(f"Dry-run: Would have placed a {intent.side} order for {intent.symbol} with quantity {intent.quantity}.")
+        return []
 
     # Prevent duplicate orders
-    current_action = current_positions.get(symbol, None)
-    if current_action == side:
-        logging.info(f"Skipping {side} order for {symbol}. Position is already {side}.")
-        return
-
-    try:
-        order_params = {
-            "variety": "NORMAL",
-            "tradingsymbol": symbol,
-            "symboltoken": token_info['token'],
-            "transactiontype": side,
-            "ordertype": "MARKET",
-            "producttype": PRODUCT_TYPE,
-            "exchange": token_info['exch_seg'],
-            "quantity": quantity
-        }
-        order_id = api.placeOrder(order_params)
-        logging.info(f"Order for {symbol} placed successfully. Order ID: {order_id}")
-        
-        # Update trading journal
-        current_price = 0
-        try:
-            ltp_data = api.ltpData(
-                exchange=token_info['exch_seg'],
-                tradingsymbol=symbol,
-                symboltoken=token_info['token']
-            )
-            if ltp_data and 'data' in ltp_data and 'ltp' in ltp_data['data']:
-                current_price = ltp_data['data']['ltp']
-        except Exception:
-            pass
-
-        trade_record = [
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            symbol,
-            side,
-            quantity,
-            current_price,
-            order_id.get("data", {}).get("orderid", "N/A")
-        ]
-        update_trading_journal(gs_client, GSHEET_ID, trade_record)
-        
-        # Update current position status
-        current_positions[symbol] = side
-
-    except Exception as e:
-        logging.error(f"Order placement failed for {symbol}: {e}")
-        if gs_client:
-            try:
-                ws = gs_client.open_by_key(GSHEET_ID).worksheet(SHEET_NAME)
-                ws.update("I2", f"⚠️ Order Failed {symbol}")
-            except Exception as ee:
-                logging.error(f"Sheet update failed for Order error: {ee}")
+    to_send = []
+    for intent in intents:
+        if current_positions.get(intent.symbol) == intent.side:
+            logging.info(f"Skipping {intent.side} order for {intent.symbol}. Position is already {intent.side}.")
+        else:
+            to_send.append(intent)
+
+    # Journal rows are written on the ack; fill prices and failure alerts follow on the post-trade thread.
+    order_executor.on_ack = lambda r: record_ack(r, gs_client)
+    order_executor.on_fill = lambda r: record_fill(r, gs_client)
+    order_executor.on_failure = lambda r: report_order_failure(r, gs_client)
+    results = order_executor.execute(api, to_send)
+    for result in results:
+        if result.ok:
+            current_positions.record(result.intent.symbol, result.intent.side, result.intent.quantity, result.order_id)
+    return results
 
 # --- MAIN EXECUTION ---
-def run_bot():
+def run_bot(cycle=None):
     logging.info("Starting trading bot run.")
     
     gs_client = get_google_sheet_client()
     if not gs_client:
         return
 
-    angel_api = angel_login()
-    tokens = get_tokens()
-    
-    if not tokens:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "⚠️ Token data not fetched from API")
-        return
+    writer = sheet_writer_for(gs_client)
+    try:
+        (cycle or run_cycle)(gs_client)
+    finally:
+        with profiling.span("orders"):
+            if not order_executor.wait(timeout=JOURNAL_DRAIN_TIMEOUT):
+                logging.warning("Post-trade work still running; its journal rows are recorded when it finishes.")
+        with profiling.span("sheet_write"):
+            # Before any of our writes land, so an edit made during the cycle is not taken for ours.
+            check_snapshots_for_edits(gs_client)
+            flushed = writer.flush()
+        with profiling.span("journal"):
+            journal.start(gs_client)
+            if not journal.drain():
+                logging.warning(f"Trade journal still has {journal.pending()} rows pending; they stay in {journal.path}.")
+        # After the journal appends too: they change the spreadsheet's update time as well.
+        if flushed:
+            mark_snapshots_synced(gs_client)
+        profiling.count("sheets_requests", writer.requests)
+        logging.info(f"Google Sheets handle/write requests this cycle: {writer.requests}")
+
+def load_sheet(gs_client, sheet_id=GSHEET_ID, sheet_name=SHEET_NAME):
+    """Snapshot of a symbols sheet, or None after noting the problem in G2."""
+    snapshot = read_sheet_snapshot(gs_client, sheet_id, sheet_name, SHEET_COLUMNS)
+    if snapshot is None:
+        update_google_sheet_cell(gs_client, sheet_id, sheet_name, "G2", "⚠️ Google Sheet empty or invalid")
+        return None
 
-    df_sheet = read_google_sheet_data(gs_client, GSHEET_ID, SHEET_NAME)
-    if df_sheet.empty:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "⚠️ Google Sheet empty or invalid")
-        return
+    required_sheet_cols = ["SYMBOL", "CLOSE"]
+    missing_cols = [col for col in required_sheet_cols if col not in snapshot.header]
+    if missing_cols:
+        error_msg = f"❌ Error: Missing required columns in Google Sheet: {', '.join(missing_cols)}. Please ensure all required headers exist."
+        logging.error(error_msg)
+        update_google_sheet_cell(gs_client, sheet_id, sheet_name, "G2", error_msg)
+        return None
+    return snapshot
 
+def sheet_symbols(snapshot, tokens):
+    """Sheet rows with a known instrument, with token_info/symboltoken/tradingsymbol/exch_seg added."""
+    df_sheet = snapshot.frame.copy()
     df_sheet['SYMBOL'] = df_sheet['SYMBOL'].astype(str).str.strip().str.upper()
 
     df_sheet['token_info'] = df_sheet['SYMBOL'].apply(lambda s: tokens.get(s))
     df_sheet = df_sheet.dropna(subset=['SYMBOL', 'token_info']).copy()
-
     if df_sheet.empty:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "No valid symbols found after filtering.")
-        return
+        return df_sheet
 
     df_sheet['symboltoken'] = df_sheet['token_info'].apply(lambda d: d.get('token'))
     df_sheet['tradingsymbol'] = df_sheet['token_info'].apply(lambda d: d.get('tradingsymbol'))
     df_sheet['exch_seg'] = df_sheet['token_info'].apply(lambda d: d.get('exch_seg'))
-
-
-    if angel_api:
-        get_live_prices_and_update_sheet(angel_api, df_sheet, gs_client, GSHEET_ID, SHEET_NAME)
-    
-    df_updated_sheet = read_google_sheet_data(gs_client, GSHEET_ID, SHEET_NAME)
-    if df_updated_sheet.empty:
-        logging.error("Failed to re-read updated sheet data.")
-        return
-
-    required_sheet_cols = ["SYMBOL", "CLOSE"]
-    missing_cols = [col for col in required_sheet_cols if col not in df_updated_sheet.columns]
-    if missing_cols:
-        error_msg = f"❌ Error: Missing required columns in Google Sheet: {', '.join(missing_cols)}. Please ensure all required headers exist."
-        logging.error(error_msg)
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", error_msg)
-        return
-
-    full_df = pd.DataFrame()
-    for symbol in df_updated_sheet['SYMBOL'].unique():
-        token_info = tokens.get(symbol)
-        if token_info:
-            hist_df = fetch_historical_data(angel_api, symbol, token_info, days=30)
-            if not hist_df.empty:
-                hist_df['SYMBOL'] = symbol
-                full_df = pd.concat([full_df, hist_df], ignore_index=True)
-
-    if 'PUT_VOLUME' in df_updated_sheet.columns and 'CALL_VOLUME' in df_updated_sheet.columns:
-        sheet_volume_df = df_updated_sheet[['SYMBOL', 'PUT_VOLUME', 'CALL_VOLUME']].copy()
+    return df_sheet
+
+def compute_signals(api, df_sheet, tokens, sheet_id=GSHEET_ID, sheet_name=SHEET_NAME):
+    """
+    History, indicators and signals for resolved sheet rows (from sheet_id /
+    sheet_name, which the order intents carry). Returns (signals, messages,
+    intents, failure); failure is a (sheet note, Telegram alert) pair when
+    no signals could be computed.
+    """
+    full_df = fetch_historical_data(api, df_sheet['SYMBOL'].unique(), tokens, days=30)
+
+    if 'PUT_VOLUME' in df_sheet.columns and 'CALL_VOLUME' in df_sheet.columns:
+        volume_cols = [c for c in ['PUT_VOLUME', 'CALL_VOLUME', 'PUT_OI', 'CALL_OI'] if c in df_sheet.columns]
+        sheet_volume_df = df_sheet[['SYMBOL'] + volume_cols].drop_duplicates('SYMBOL')
         full_df = full_df.merge(sheet_volume_df, on='SYMBOL', how='left')
 
     if full_df.empty:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "❌ Failed to fetch historical data.")
-        send_telegram_message("❌ Error: Failed to fetch historical data. Cannot calculate indicators.")
-        return
+        return None, [], [], ("❌ Failed to fetch historical data.",
+                              "❌ Error: Failed to fetch historical data. Cannot calculate indicators.")
 
     df_with_indicators = calculate_indicators(full_df)
     
     if df_with_indicators.empty:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "❌ Indicator calculation failed. Not enough data.")
         logging.error("Exiting due to failed indicator calculation.")
-        send_telegram_message("❌ Error: Indicator calculation failed. Not enough data.")
-        return
+        return None, [], [], ("❌ Indicator calculation failed. Not enough data.",
+                              "❌ Error: Indicator calculation failed. Not enough data.")
         
     signals = generate_signals(df_with_indicators)
-    logging.info(f"Generated signals: {signals}")
-
-    if signals:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", [[s] for s in signals])
-        send_telegram_message("📣 New Signals:\n" + "\n".join(signals), gs_client)
-
-        for s in signals:
-            parts = s.split()
-            if len(parts) < 2: continue
-            side, symbol = parts[0], parts[1]
-            info = tokens.get(symbol)
-            if info:
-                try:
-                    quantity_from_sheet = df_updated_sheet[df_updated_sheet['SYMBOL'] == symbol]['QUANTITY'].iloc[0]
-                    order_quantity = int(quantity_from_sheet)
-                except (KeyError, IndexError, ValueError):
-                    logging.warning(f"Quantity column not found or invalid for {symbol}. Using default quantity: {ORDER_QTY}")
-                    order_quantity = ORDER_QTY
-                
-                place_order(angel_api, info['tradingsymbol'], side, info, order_quantity, gs_client)
-            else:
-                logging.warning(f"Token not found for {symbol}.")
+    messages = format_signals(signals)
+    logging.info(f"Generated signals: {messages}")
+
+    signal_time = time.perf_counter()
+    intents = []
+    for side, symbol in zip(signals['SIDE'], signals['SYMBOL']):
+        info = tokens.get(symbol)
+        if info:
+            try:
+                quantity_from_sheet = df_sheet[df_sheet['SYMBOL'] == symbol]['QUANTITY'].iloc[0]
+                order_quantity = int(quantity_from_sheet)
+            except (KeyError, IndexError, ValueError):
+                logging.warning(f"Quantity column not found or invalid for {symbol}. Using default quantity: {ORDER_QTY}")
+                order_quantity = ORDER_QTY
+            
+            intents.append(OrderIntent(info['tradingsymbol'], side, info, order_quantity, PRODUCT_TYPE, signal_time,
+                                       sheet_id=sheet_id, sheet_name=sheet_name))
+        else:
+            logging.warning(f"Token not found for {symbol}.")
+    return signals, messages, intents, None
+
+def report_signals(gs_client, messages, failure=None, sheet_id=GSHEET_ID, sheet_name=SHEET_NAME):
+    """Notes the cycle outcome in G2 and sends the Telegram summary."""
+    if failure:
+        note, alert = failure
+        update_google_sheet_cell(gs_client, sheet_id, sheet_name, "G2", note)
+        send_telegram_message(alert)
+    elif messages:
+        update_google_sheet_cell(gs_client, sheet_id, sheet_name, "G2", [[m] for m in messages])
+        send_telegram_message("📣 New Signals:\n" + "\n".join(messages), gs_client)
     else:
-        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "No signals generated.")
+        update_google_sheet_cell(gs_client, sheet_id, sheet_name, "G2", "No signals generated.")
         send_telegram_message("ℹ️ No trading signals generated in this run.", gs_client)
+
+def run_cycle(gs_client):
+    greeks_cache.clear()
+    angel_api = angel_login()
+    if angel_api and not current_positions.reconciled:
+        with profiling.span("reconcile"):
+            current_positions.reconcile(angel_api)
+    tokens = get_tokens()
+    
+    if not tokens:
+        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "⚠️ Token data not fetched from API")
+        return
+
+    snapshot = load_sheet(gs_client)
+    if snapshot is None:
+        return
+
+    if angel_api:
+        update_option_chain_pcr(angel_api, tokens, gs_client, snapshot)
+
+    df_sheet = sheet_symbols(snapshot, tokens)
+    if df_sheet.empty:
+        update_google_sheet_cell(gs_client, GSHEET_ID, SHEET_NAME, "G2", "No valid symbols found after filtering.")
+        return
+
+    if angel_api:
+        get_live_prices_and_update_sheet(angel_api, df_sheet, gs_client, snapshot)
+
+    signals, messages, intents, failure = compute_signals(angel_api, df_sheet, tokens)
+    report_signals(gs_client, messages, failure)
+    if intents:
+        place_orders(angel_api, intents, gs_client)
     
     logging.info("Bot run completed.")
 
+def run_scheduled(cycle=None):
+    try:
+        with profiling.cycle():
+            run_bot(cycle)
+    except Exception as e:
+        send_telegram_message(f"❌ Critical Error: Bot run failed, next run on the next bar. Error: {e}")
+        raise
+    finally:
+        if LIVE_TRADING:
+            session_manager.report_logins()
+
+def run_stream():
+    """WebSocket mode: signals are evaluated on every tick-driven bar close instead of on BarScheduler runs."""
+    # The WebSocket client and tick aggregation are only loaded in this mode.
+    from bar_aggregator import aggregate_candles
+    from indicator_engine import IndicatorEngine
+    from live_feed import LIVE_TIMEFRAMES, LiveFeed, feed_instruments
+
+    angel_api = angel_login()
+    gs_client = get_google_sheet_client()
+    tokens = get_tokens()
+    if not angel_api or not gs_client or not tokens:
+        logging.error("❌ Streaming mode needs live trading (Angel login), the Google Sheet and the instrument store.")
+        return
+
+    current_positions.reconcile(angel_api)
+    snapshot = read_sheet_snapshot(gs_client, GSHEET_ID, SHEET_NAME, SHEET_COLUMNS)
+    if snapshot is None:
+        return
+    symbols = snapshot.frame['SYMBOL'].astype(str).str.strip().str.upper().unique()
+    quantities = {}
+    if 'QUANTITY' in snapshot.frame.columns:
+        quantities = dict(zip(snapshot.frame['SYMBOL'].astype(str).str.strip().str.upper(),
+                              pd.to_numeric(snapshot.frame['QUANTITY'], errors='coerce')))
+
+    # Every timeframe is warmed up from the same cached 1-minute candles.
+    engines = {tf: IndicatorEngine() for tf in LIVE_TIMEFRAMES}
+    history = fetch_history_cached(angel_api, symbols, tokens, days=5, interval="ONE_MINUTE")
+    if not history.empty:
+        exchanges = {s: (tokens.get(s) or {}).get('exch_seg', 'NSE') for s in symbols}
+        for tf, bars in aggregate_candles(history, exchanges.get, LIVE_TIMEFRAMES).items():
+            engines[tf].warm_up(bars)
+
+    signal_queue = queue.Queue()
+
+    def on_signal(symbol, side, reason, bar):
+        signal_queue.put((symbol, side, reason, time.perf_counter()))
+
+    def order_worker():
+        while True:
+            symbol, side, reason, signal_time = signal_queue.get()
+            info = tokens.get(symbol)
+            qty = quantities.get(symbol)
+            quantity = int(qty) if pd.notna(qty) and qty > 0 else ORDER_QTY
+            results = place_orders(angel_api, [OrderIntent(symbol, side, info, quantity, PRODUCT_TYPE, signal_time)], gs_client)
+            if not results:
+                # Strategies fire on every bar close while their condition holds; the
+                # position already matches, so there is nothing new to report.
+                continue
+            send_telegram_message(f"📣 New Signal:\n{side} {symbol} ({reason})", gs_client)
+            order_executor.wait(timeout=JOURNAL_DRAIN_TIMEOUT)
+            sheet_writer_for(gs_client).flush()
+            journal.start(gs_client)
+
+    threading.Thread(target=order_worker, name="stream-orders", daemon=True).start()
+    feed = LiveFeed(
+        feed_instruments(tokens, symbols), angel_api.access_token, ANGEL_API_KEY, ANGEL_CLIENT_CODE,
+        angel_api.getfeedToken(), engines=engines, strategies=STRATEGIES, on_signal=on_signal,
+    )
+    feed.run()
+
+def run_shards():
+    from shard_runner import ShardRunner
+    runner = ShardRunner(sys.modules[__name__]).start()
+    try:
+        BarScheduler(lambda: run_scheduled(runner.run_cycle), BAR_INTERVAL_SECONDS).run()
+    finally:
+        runner.close()
+
+COMMANDS = {
+    "run": (lambda: BarScheduler(run_scheduled, BAR_INTERVAL_SECONDS).run(),
+            "run a cycle on every bar close of the session (default)"),
+    "once": (run_scheduled, "run one cycle now and exit"),
+    "stream": (run_stream, "evaluate signals on WebSocket ticks instead of bar-close runs"),
+    "shards": (run_shards, "run bar-close cycles on a pool of worker processes (SHARD_* settings)"),
+}
+
+def cli(argv=None):
+    """Command-line entry point: `python main.py [run|once|stream|shards]`."""
+    parser = argparse.ArgumentParser(description="Angel One trading bot driven by the LIVE DATA Google Sheet.")
+    parser.add_argument("command", nargs="?", default="run", choices=list(COMMANDS),
+                        help="; ".join(f"{name}: {text}" for name, (_, text) in COMMANDS.items()))
+    args = parser.parse_args(argv)
+    init()
+    COMMANDS[args.command][0]()
+
 if __name__ == "__main__":
-    while True:
-        try:
-            run_bot()
-            logging.info(f"Sleeping for {SLEEP_SECONDS} seconds...")
-            time.sleep(SLEEP_SECONDS)
-        except Exception as e:
-            logging.error(f"An unexpected error occurred in the main loop: {e}")
-            send_telegram_message(f"❌ Critical Error: Bot crashed! Restarting in 60 seconds. Error: {e}")
-            time.sleep(60)
+    cli()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+from datetime import date, datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+IST_OFFSET_MS = 19_800_000  # UTC+05:30, no daylight saving
+DAY_MS = 86_400_000
+
+# JSON file of exchange holidays, e.g. {"NSE": ["2025-01-26", ...], "MCX": [...]}
+# or a plain list applied to every exchange. Not shipped: dates come from the
+# exchange circulars for the year.
+MARKET_HOLIDAYS_FILE = os.getenv("MARKET_HOLIDAYS_FILE", "")
+_holidays = None
+
+
+def _hhmm(value):
+    hours, minutes = value.split(":")
+    return dt_time(int(hours), int(minutes))
+
+
+# Regular trading hours per exch_seg (IST). MCX closes at 23:30 or 23:55
+# depending on US daylight saving; override with MCX_SESSION_CLOSE.
+SESSIONS = {
+    "NSE": (dt_time(9, 15), dt_time(15, 30)),
+    "BSE": (dt_time(9, 15), dt_time(15, 30)),
+    "NFO": (dt_time(9, 15), dt_time(15, 30)),
+    "BFO": (dt_time(9, 15), dt_time(15, 30)),
+    "CDS": (dt_time(9, 0), dt_time(17, 0)),
+    "MCX": (dt_time(9, 0), _hhmm(os.getenv("MCX_SESSION_CLOSE", "23:30"))),
+}
+
+
+def _offset_ms(t):
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1000
+
+
+def session_offsets(exchange):
+    """(open, close) as milliseconds after local midnight."""
+    open_t, close_t = SESSIONS.get(exchange, SESSIONS["NSE"])
+    return _offset_ms(open_t), _offset_ms(close_t)
+
+
+def load_holidays(path=MARKET_HOLIDAYS_FILE):
+    """{exchange or "ALL": set of dates} from MARKET_HOLIDAYS_FILE (weekends are always closed)."""
+    global _holidays
+    _holidays = {}
+    if not path:
+        return _holidays
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            data = {"ALL": data}
+        _holidays = {ex.upper(): {date.fromisoformat(d) for d in days} for ex, days in data.items()}
+        logging.info(f"Loaded market holidays for {', '.join(sorted(_holidays))} from {path}.")
+    except Exception as e:
+        logging.error(f"❌ Failed to load market holidays from {path}: {e}")
+    return _holidays
+
+
+def holidays(exchange):
+    if _holidays is None:
+        load_holidays()
+    return _holidays.get(exchange, set()) | _holidays.get("ALL", set())
+
+
+def is_trading_day(day, exchange="NSE"):
+    return day.weekday() < 5 and day not in holidays(exchange)
+
+
+def session_bounds(exchange, day):
+    """Aware (open, close) datetimes of the exchange session on `day`."""
+    open_t, close_t = SESSIONS.get(exchange, SESSIONS["NSE"])
+    return datetime.combine(day, open_t, MARKET_TZ), datetime.combine(day, close_t, MARKET_TZ)
+
+
+def is_open(exchange, when=None):
+    when = when or datetime.now(MARKET_TZ)
+    when = when.astimezone(MARKET_TZ)
+    if not is_trading_day(when.date(), exchange):
+        return False
+    open_dt, close_dt = session_bounds(exchange, when.date())
+    return open_dt <= when < close_dt
+
+
+def next_open(exchange, when=None):
+    """`when` itself during a session, otherwise the next session open."""
+    when = (when or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    day = when.date()
+    while True:
+        if is_trading_day(day, exchange):
+            open_dt, close_dt = session_bounds(exchange, day)
+            if when < close_dt:
+                return max(open_dt, when)
+        day += timedelta(days=1)
+
+
+def session_open_ms(exchange, ts_ms):
+    """
+    Epoch ms of the session open for each timestamp, or -1 where the
+    timestamp is outside the session (weekends included). Works on scalars
+    and NumPy arrays.
+    """
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    open_off, close_off = session_offsets(exchange)
+    local = ts_ms + IST_OFFSET_MS
+    midnight = local - local % DAY_MS
+    into_day = local - midnight
+    weekday = (midnight // DAY_MS + 3) % 7  # 1970-01-01 was a Thursday (Monday == 0)
+    inside = (into_day >= open_off) & (into_day < close_off) & (weekday < 5)
+    closed = holidays(exchange)
+    if closed:
+        epoch = date(1970, 1, 1)
+        inside &= ~np.isin(midnight // DAY_MS, [(d - epoch).days for d in closed])
+    result = np.where(inside, midnight - IST_OFFSET_MS + open_off, -1)
+    return result if result.ndim else int(result)
+
+
+def session_close_ms(exchange, open_ms):
+    open_off, close_off = session_offsets(exchange)
+    return open_ms + (close_off - open_off)
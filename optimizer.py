@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from backtest import CostModel, evaluate_frame, iter_store_frames, prepare_frame
+from candle_store import CandleStore
+from indicator_engine import ewm_macd, rolling_rsi, rolling_sma
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
+
+OPTIMIZER_RESULTS = os.getenv("OPTIMIZER_RESULTS", "data/optimizer_results.csv")
+
+INDICATOR_PARAMS = ["sma_fast", "sma_slow", "rsi_window", "macd_fast", "macd_slow", "macd_signal"]
+THRESHOLD_PARAMS = ["rsi_buy", "rsi_sell", "pcr_buy", "pcr_sell"]
+
+# The live values (5/20, 14, 12/26/9, 60/40, 0.75/1.10) are part of the default grid.
+DEFAULT_GRID = {
+    "sma_fast": [3, 5, 8],
+    "sma_slow": [20, 30],
+    "rsi_window": [9, 14],
+    "macd_fast": [12],
+    "macd_slow": [26],
+    "macd_signal": [9],
+    "rsi_buy": [55, 60, 65],
+    "rsi_sell": [35, 40, 45],
+    "pcr_buy": [0.75],
+    "pcr_sell": [1.10],
+}
+
+
+def param_key(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def expand_grid(grid):
+    names = INDICATOR_PARAMS + THRESHOLD_PARAMS
+    for values in itertools.product(*(grid[n] for n in names)):
+        params = dict(zip(names, values))
+        if params["sma_fast"] < params["sma_slow"] and params["macd_fast"] < params["macd_slow"]:
+            yield params
+
+
+def sample_grid(grid, n, seed=0):
+    combos = list(expand_grid(grid))
+    random.Random(seed).shuffle(combos)
+    return combos[:n]
+
+
+def strategy_for(params):
+    fast, slow = f"SMA_{params['sma_fast']}", f"SMA_{params['sma_slow']}"
+    return {
+        "name": "sweep",
+        "require": [fast, slow, "MACD", "SIGNAL_LINE", "RSI"],
+        "buy": [f"{fast} > {slow}", "MACD > SIGNAL_LINE", f"RSI > {params['rsi_buy']}",
+                f"isnan(PCR) or PCR < {params['pcr_buy']}"],
+        "sell": [f"{fast} < {slow}", "MACD < SIGNAL_LINE", f"RSI < {params['rsi_sell']}",
+                 f"isnan(PCR) or PCR > {params['pcr_sell']}"],
+    }
+
+
+# --- Shared candle arrays ---
+def write_shared_arrays(df, directory):
+    """
+    Dumps the prepared universe into .npy files the workers memory-map.
+    Returns (symbols, tz): dates are stored as UTC nanoseconds and tz
+    (e.g. Asia/Kolkata, None for naive dates) is restored by the workers.
+    """
+    df = prepare_frame(df)
+    dates = pd.to_datetime(df["date"])
+    tz = str(dates.dt.tz) if dates.dt.tz is not None else None
+    if tz is not None:
+        dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+    np.save(os.path.join(directory, "close.npy"), df["close"].to_numpy(dtype=np.float64))
+    np.save(os.path.join(directory, "codes.npy"), df["SYMBOL"].cat.codes.to_numpy(dtype=np.int32))
+    np.save(os.path.join(directory, "dates.npy"), dates.to_numpy("datetime64[ns]").view("i8"))
+    return [str(c) for c in df["SYMBOL"].cat.categories], tz
+
+
+_frame = None
+_groups = None
+
+
+def _init_worker(directory, symbols, tz=None):
+    global _frame, _groups
+    codes = np.load(os.path.join(directory, "codes.npy"), mmap_mode="r")
+    dates = pd.DatetimeIndex(np.load(os.path.join(directory, "dates.npy"), mmap_mode="r").view("datetime64[ns]"))
+    _frame = pd.DataFrame({
+        "SYMBOL": pd.Categorical.from_codes(codes, categories=symbols),
+        "date": dates.tz_localize("UTC").tz_convert(tz) if tz else dates,
+        "close": np.load(os.path.join(directory, "close.npy"), mmap_mode="r"),
+        "PCR": np.nan,
+    })
+    _groups = pd.Series(np.asarray(codes), index=_frame.index)
+    _cached_sma.cache_clear()
+    _cached_rsi.cache_clear()
+    _cached_macd.cache_clear()
+
+
+# Indicator columns are cached per worker, so combinations sharing a window
+# (e.g. the same SMA pair with different RSI thresholds) compute it once.
+@lru_cache(maxsize=16)
+def _cached_sma(window):
+    return rolling_sma(_frame["close"], _groups, window).to_numpy()
+
+
+@lru_cache(maxsize=8)
+def _cached_rsi(window):
+    return rolling_rsi(_frame["close"], _groups, window).to_numpy()
+
+
+@lru_cache(maxsize=8)
+def _cached_macd(fast, slow, signal):
+    macd, signal_line = ewm_macd(_frame["close"], _groups, fast, slow, signal)
+    return macd.to_numpy(), signal_line.to_numpy()
+
+
+def _run_group(indicator_params, threshold_sets, costs):
+    """Evaluates every threshold set sharing one set of indicator parameters."""
+    p = indicator_params
+    df = _frame.copy(deep=False)
+    df[f"SMA_{p['sma_fast']}"] = _cached_sma(p["sma_fast"])
+    df[f"SMA_{p['sma_slow']}"] = _cached_sma(p["sma_slow"])
+    df["RSI"] = _cached_rsi(p["rsi_window"])
+    df["MACD"], df["SIGNAL_LINE"] = _cached_macd(p["macd_fast"], p["macd_slow"], p["macd_signal"])
+
+    rows = []
+    for thresholds in threshold_sets:
+        params = {**indicator_params, **thresholds}
+        result = evaluate_frame(df, strategy_for(params), costs=costs)
+        rows.append({"key": param_key(params), **params, **result.metrics})
+    return rows
+
+
+# --- Results table ---
+def load_done_keys(path):
+    if not os.path.exists(path):
+        return set()
+    try:
+        return set(pd.read_csv(path, usecols=["key"])["key"].astype(str))
+    except Exception as e:
+        logging.error(f"Could not read previous results from {path}: {e}")
+        return set()
+
+
+def append_results(path, rows):
+    if not rows:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pd.DataFrame(rows).to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def optimize(df, combos, workers=None, results_path=OPTIMIZER_RESULTS, costs=None):
+    """
+    Fans parameter combinations out over a process pool. Candles are shared
+    through memory-mapped files; results are appended as each group finishes
+    so an interrupted sweep resumes where it stopped.
+    """
+    done = load_done_keys(results_path)
+    pending = [c for c in combos if param_key(c) not in done]
+    logging.info(f"{len(combos)} combinations, {len(combos) - len(pending)} already done, {len(pending)} to run.")
+    if not pending:
+        return pd.read_csv(results_path)
+
+    groups = {}
+    for combo in pending:
+        ind = tuple(combo[n] for n in INDICATOR_PARAMS)
+        groups.setdefault(ind, []).append({n: combo[n] for n in THRESHOLD_PARAMS})
+
+    with tempfile.TemporaryDirectory(prefix="optimizer-") as directory:
+        symbols, tz = write_shared_arrays(df, directory)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(directory, symbols, tz)) as pool:
+            futures = [
+                pool.submit(_run_group, dict(zip(INDICATOR_PARAMS, ind)), thresholds, costs or CostModel())
+                for ind, thresholds in groups.items()
+            ]
+            for i, future in enumerate(as_completed(futures), start=1):
+                try:
+                    append_results(results_path, future.result())
+                except Exception as e:
+                    logging.error(f"Parameter group failed: {e}")
+                logging.info(f"Finished {i}/{len(futures)} parameter groups.")
+    return pd.read_csv(results_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the local candle store.")
+    parser.add_argument("keys", nargs="+", help="EXCHANGE:TOKEN pairs present in the candle store")
+    parser.add_argument("--interval", default="ONE_DAY")
+    parser.add_argument("--since", default=None)
+    parser.add_argument("--grid", help="JSON file overriding DEFAULT_GRID entries")
+    parser.add_argument("--random", type=int, default=0, help="evaluate N random combinations instead of the full grid")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--results", default=OPTIMIZER_RESULTS)
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+    combos = sample_grid(grid, args.random) if args.random else list(expand_grid(grid))
+
+    keys = [tuple(k.split(":", 1)) for k in args.keys]
+    frames = list(iter_store_frames(CandleStore(), keys, args.interval, len(keys), since=args.since))
+    if not frames:
+        logging.error("❌ No cached candles for the requested keys. Run candle_store.py first.")
+        sys.exit(1)
+
+    results = optimize(frames[0], combos, workers=args.workers, results_path=args.results)
+    print(results.sort_values("total_pnl", ascending=False).head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from greeks import GREEK_FIELDS, greeks_cache, time_to_expiry
+from instrument_store import MARKET_TZ
+from quote_fetcher import fetch_market_data
+
+OPTION_UNDERLYINGS = [s.strip().upper() for s in
+                      os.getenv("OPTION_UNDERLYINGS", "NIFTY,BANKNIFTY,FINNIFTY,MIDCPNIFTY").split(",") if s.strip()]
+OPTION_CHAIN_STRIKES = int(os.getenv("OPTION_CHAIN_STRIKES", "20"))  # strikes each side of ATM; 0 = whole chain
+PCR_COLUMNS = ["SYMBOL", "EXPIRY", "SPOT", "ATM", "PUT_VOLUME", "CALL_VOLUME", "PUT_OI", "CALL_OI", "PCR", "PCR_OI",
+               "ATM_IV"]
+
+
+def parse_expiry(expiry):
+    """Master expiry string ("26DEC2024") as a date, or None."""
+    try:
+        return datetime.strptime(expiry, "%d%b%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+class OptionChain:
+    """
+    Strikes of one (underlying, expiry) in a sorted array with the store
+    rows of the CE and PE contract at each strike (-1 where missing), so
+    strike lookups are a binary search.
+    """
+
+    def __init__(self, underlying, expiry, strikes, ce_rows, pe_rows):
+        self.underlying = underlying
+        self.expiry = expiry
+        self.strikes = strikes
+        self.ce_rows = ce_rows
+        self.pe_rows = pe_rows
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def atm_index(self, price):
+        """Index of the strike nearest to `price` (the lower one on a tie)."""
+        i = int(np.searchsorted(self.strikes, price))
+        if i == 0:
+            return 0
+        if i == len(self.strikes):
+            return i - 1
+        return i if self.strikes[i] - price < price - self.strikes[i - 1] else i - 1
+
+    def atm(self, price):
+        return float(self.strikes[self.atm_index(price)])
+
+    def strike(self, price, offset=0, option_type="CE"):
+        """
+        Strike `offset` steps from ATM: positive is out of the money, negative
+        in the money, for `option_type` (calls OTM above spot, puts below).
+        None if it falls off the chain.
+        """
+        step = offset if option_type.upper() == "CE" else -offset
+        i = self.atm_index(price) + step
+        return float(self.strikes[i]) if 0 <= i < len(self.strikes) else None
+
+    def window(self, price, width=OPTION_CHAIN_STRIKES):
+        """Slice of strike positions within `width` strikes of ATM (the whole chain if width is 0)."""
+        if not width:
+            return slice(0, len(self.strikes))
+        i = self.atm_index(price)
+        return slice(max(0, i - width), i + width + 1)
+
+
+class OptionChainIndex:
+    """
+    Per-(underlying, expiry) OptionChains built once from the instrument
+    store's columns (index options only).
+    """
+
+    def __init__(self, store, underlyings=None):
+        self.store = store
+        self.chains = {}
+        self.expiries = {}
+        underlyings = underlyings or OPTION_UNDERLYINGS
+
+        name = np.asarray(store.column("name"))
+        kind = np.asarray(store.column("instrumenttype"))
+        otype = np.asarray(store.column("option_type"))
+        rows = np.flatnonzero((kind == "OPTIDX") & np.isin(name, underlyings) & np.isin(otype, ["CE", "PE"]))
+        if not len(rows):
+            return
+        expiry = np.asarray(store.column("expiry"))[rows]
+        strike = np.asarray(store.column("strike"))[rows]
+        order = np.lexsort((strike, expiry, name[rows]))
+        rows, expiry, strike = rows[order], expiry[order], strike[order]
+
+        keys = np.char.add(np.char.add(name[rows], "|"), expiry)
+        bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            group = rows[lo:hi]
+            underlying, exp = keys[lo].split("|", 1)
+            day = parse_expiry(exp)
+            if day is None:
+                continue
+            strikes, slots = np.unique(strike[lo:hi], return_inverse=True)
+            ce = np.full(len(strikes), -1, dtype=np.int64)
+            pe = np.full(len(strikes), -1, dtype=np.int64)
+            is_ce = otype[group] == "CE"
+            ce[slots[is_ce]] = group[is_ce]
+            pe[slots[~is_ce]] = group[~is_ce]
+            self.chains[(underlying, day)] = OptionChain(underlying, day, strikes, ce, pe)
+            self.expiries.setdefault(underlying, []).append(day)
+        for days in self.expiries.values():
+            days.sort()
+
+    def nearest_expiry(self, underlying, today=None):
+        """First expiry on or after `today` (IST)."""
+        today = today or datetime.now(MARKET_TZ).date()
+        for day in self.expiries.get(underlying.upper(), []):
+            if day >= today:
+                return day
+        return None
+
+    def chain(self, underlying, expiry=None):
+        """Chain for the expiry (default: the nearest one), or None."""
+        underlying = underlying.upper()
+        expiry = expiry or self.nearest_expiry(underlying)
+        return self.chains.get((underlying, expiry))
+
+
+_index = None
+
+
+def chain_index(store):
+    """Process-wide OptionChainIndex, rebuilt when the store is refreshed."""
+    global _index
+    if _index is None or _index.store.fetched_at != store.fetched_at or _index.store.path != store.path:
+        _index = OptionChainIndex(store)
+        logging.info(f"Option chains indexed: {len(_index.chains)} (underlying, expiry) pairs.")
+    return _index
+
+
+def chain_greeks(store, chain, spot, ltp, cache=None, now=None):
+    """
+    IV and Greeks for the chain's contracts that have a price in `ltp`
+    ({token: last price}), in one array call through the per-cycle cache.
+    """
+    cache = cache or greeks_cache
+    rows = np.concatenate([chain.ce_rows, chain.pe_rows])
+    rows = rows[rows >= 0]
+    tokens = np.asarray(store.column("token"))[rows]
+    priced = np.array([t in ltp for t in tokens], dtype=bool)
+    rows, tokens = rows[priced], tokens[priced]
+    frame = pd.DataFrame({
+        "token": tokens,
+        "strike": np.asarray(store.column("strike"))[rows],
+        "option_type": np.asarray(store.column("option_type"))[rows],
+        "ltp": [ltp[t] for t in tokens],
+    })
+    if frame.empty:
+        return frame.assign(**{f: np.nan for f in GREEK_FIELDS})
+    values = cache.compute(frame["token"], spot, frame["strike"].to_numpy(), time_to_expiry(chain.expiry, now),
+                           frame["ltp"].to_numpy(dtype=float), (frame["option_type"] == "CE").to_numpy())
+    return frame.assign(**values)
+
+
+def spot_prices(api, store, underlyings):
+    """{underlying: LTP} of the index itself, in one batched call."""
+    legs = {}
+    for underlying in underlyings:
+        info = store.get(underlying)
+        if info:
+            legs[(info["exch_seg"], info["token"])] = underlying
+    quotes = fetch_market_data(api, legs, mode="LTP")
+    return {legs[(q.get("exchange"), str(q.get("symbolToken")))]: float(q["ltp"])
+            for q in quotes if (q.get("exchange"), str(q.get("symbolToken"))) in legs and q.get("ltp") is not None}
+
+
+def option_chain_pcr(api, store, underlyings=None, width=OPTION_CHAIN_STRIKES, spots=None):
+    """
+    PCR by volume and open interest for the nearest expiry of each
+    underlying, over ATM +/- `width` strikes. Spot prices are fetched unless
+    given; all chain quotes come from bulk FULL getMarketData calls.
+    Returns a frame with PCR_COLUMNS (one row per underlying).
+    """
+    underlyings = [u.upper() for u in (underlyings or OPTION_UNDERLYINGS)]
+    index = chain_index(store)
+    spots = spots if spots is not None else spot_prices(api, store, underlyings)
+
+    legs = {}  # (exch_seg, token) -> (underlying, "CE"/"PE")
+    chains = {}
+    exch_col, token_col = store.column("exch_seg"), store.column("token")
+    for underlying in underlyings:
+        chain = index.chain(underlying)
+        spot = spots.get(underlying)
+        if chain is None or spot is None:
+            logging.warning(f"No option chain or spot price for {underlying}; PCR skipped.")
+            continue
+        chains[underlying] = (chain, spot)
+        part = chain.window(spot, width)
+        for side, rows in (("CE", chain.ce_rows[part]), ("PE", chain.pe_rows[part])):
+            for i in rows[rows >= 0]:
+                legs[(str(exch_col[i]), str(token_col[i]))] = (underlying, side)
+
+    totals = {u: {"CE": [0.0, 0.0], "PE": [0.0, 0.0]} for u in chains}
+    ltp = {}
+    for q in fetch_market_data(api, legs, mode="FULL") if legs else []:
+        leg = legs.get((q.get("exchange"), str(q.get("symbolToken"))))
+        if leg is None:
+            continue
+        acc = totals[leg[0]][leg[1]]
+        acc[0] += float(q.get("tradeVolume") or 0)
+        acc[1] += float(q.get("opnInterest") or 0)
+        if q.get("ltp"):
+            ltp[str(q.get("symbolToken"))] = float(q["ltp"])
+
+    out = []
+    for underlying, (chain, spot) in chains.items():
+        (call_vol, call_oi), (put_vol, put_oi) = totals[underlying]["CE"], totals[underlying]["PE"]
+        greeks = chain_greeks(store, chain, spot, ltp)
+        atm = chain.atm(spot)
+        atm_iv = greeks.loc[greeks["strike"] == atm, "iv"].mean() if len(greeks) else np.nan
+        out.append([underlying, chain.expiry.isoformat(), spot, atm, put_vol, call_vol, put_oi, call_oi,
+                    put_vol / call_vol if call_vol else np.nan, put_oi / call_oi if call_oi else np.nan, atm_iv])
+    pcr = pd.DataFrame(out, columns=PCR_COLUMNS)
+    if len(pcr):
+        logging.info("Option chain PCR: " + ", ".join(
+            f"{r.SYMBOL} {r.PCR:.2f}/{r.PCR_OI:.2f} (vol/OI), ATM IV {r.ATM_IV:.1%}" for r in pcr.itertuples()))
+    return pcr
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from rate_limiter import TokenBucket
+
+# Angel One allows 20 order requests/second; stay well under it by default.
+ORDER_RATE_PER_SEC = float(os.getenv("ORDER_RATE_PER_SEC", "10"))
+ORDER_MAX_INFLIGHT = int(os.getenv("ORDER_MAX_INFLIGHT", "4"))
+ORDER_FILL_LOOKUPS = int(os.getenv("ORDER_FILL_LOOKUPS", "3"))
+ORDER_FILL_DELAY = float(os.getenv("ORDER_FILL_DELAY", "1.0"))
+
+_order_limiter = TokenBucket(ORDER_RATE_PER_SEC)
+
+
+@dataclass
+class OrderIntent:
+    symbol: str
+    side: str
+    token_info: dict
+    quantity: int
+    product_type: str = "MIS"
+    signal_time: float = field(default_factory=time.perf_counter)
+    sheet_id: str = ""    # sheet the signal came from (failure notes go there); empty: the bot's default sheet
+    sheet_name: str = ""
+
+
+@dataclass
+class OrderResult:
+    intent: OrderIntent
+    order_id: str = ""
+    error: str = ""
+    placed_at: datetime = None
+    send_latency: float = 0.0   # placeOrder round trip
+    ack_latency: float = 0.0    # signal -> broker ack
+    fill_price: float = 0.0
+    entry_id: str = ""          # trade journal row, set by the on_ack callback
+
+    @property
+    def ok(self):
+        return bool(self.order_id) and not self.error
+
+
+def order_params(intent):
+    return {
+        "variety": "NORMAL",
+        "tradingsymbol": intent.symbol,
+        "symboltoken": intent.token_info['token'],
+        "transactiontype": intent.side,
+        "ordertype": "MARKET",
+        "producttype": intent.product_type,
+        "exchange": intent.token_info['exch_seg'],
+        "quantity": intent.quantity,
+    }
+
+
+def _order_id(resp):
+    # placeOrder returns the order id string; placeOrderFullResponse the raw dict.
+    if isinstance(resp, dict):
+        return str((resp.get("data") or {}).get("orderid") or "")
+    return str(resp or "")
+
+
+def send_order(api, intent, limiter=None):
+    result = OrderResult(intent=intent)
+    (limiter or _order_limiter).acquire()
+    start = time.perf_counter()
+    try:
+        result.order_id = _order_id(api.placeOrder(order_params(intent)))
+        if not result.order_id:
+            result.error = "No order id returned"
+    except Exception as e:
+        result.error = str(e)
+    now = time.perf_counter()
+    result.placed_at = datetime.now()
+    result.send_latency = now - start
+    result.ack_latency = now - intent.signal_time
+    return result
+
+
+def _rows(resp):
+    if not isinstance(resp, dict):
+        return []
+    return resp.get("data") or []
+
+
+def lookup_fill_prices(api, order_ids):
+    """
+    Average fill price per order id from one tradeBook call, falling back to
+    orderBook's averageprice for orders without trades yet.
+    """
+    wanted = set(order_ids)
+    fills = {}
+    try:
+        for trade in _rows(api.tradeBook()):
+            oid = str(trade.get("orderid", ""))
+            if oid in wanted:
+                qty = float(trade.get("fillsize") or 0)
+                price = float(trade.get("fillprice") or 0)
+                value, total = fills.get(oid, (0.0, 0.0))
+                fills[oid] = (value + price * qty, total + qty)
+    except Exception as e:
+        logging.warning(f"tradeBook lookup failed: {e}")
+    prices = {oid: value / total for oid, (value, total) in fills.items() if total}
+
+    missing = wanted - prices.keys()
+    if missing:
+        try:
+            for order in _rows(api.orderBook()):
+                oid = str(order.get("orderid", ""))
+                avg = float(order.get("averageprice") or 0)
+                if oid in missing and avg:
+                    prices[oid] = avg
+        except Exception as e:
+            logging.warning(f"orderBook lookup failed: {e}")
+    return prices
+
+
+def summarize_latency(results, wall_time):
+    acks = sorted(r.ack_latency for r in results if r.ok)
+    sends = sorted(r.send_latency for r in results)
+    return {
+        "orders": len(results),
+        "failed": sum(1 for r in results if not r.ok),
+        "ack_p50_ms": round(acks[len(acks) // 2] * 1000, 1) if acks else 0.0,
+        "ack_max_ms": round(acks[-1] * 1000, 1) if acks else 0.0,
+        "send_max_ms": round(sends[-1] * 1000, 1) if sends else 0.0,
+        "wall_time_s": round(wall_time, 3),
+    }
+
+
+class OrderExecutor:
+    """
+    Sends independent orders concurrently (at most `max_inflight` at once,
+    under the shared order rate limiter) and returns as soon as every order
+    has been acknowledged. on_ack runs for every acked order before
+    execute() returns (the durable journal entry); fill-price lookup and the
+    on_fill/on_failure callbacks (journal price, alerts) run afterwards on a
+    single background thread; wait() blocks until that work is done.
+    """
+
+    def __init__(self, max_inflight=ORDER_MAX_INFLIGHT, limiter=None, on_ack=None, on_fill=None, on_failure=None):
+        self.max_inflight = max(1, max_inflight)
+        self.limiter = limiter or _order_limiter
+        self.on_ack = on_ack
+        self.on_fill = on_fill
+        self.on_failure = on_failure
+        self._post_trade = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post-trade")
+        self._pending = []
+
+    def execute(self, api, intents):
+        intents = list(intents)
+        if not intents:
+            return []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_inflight, len(intents)), thread_name_prefix="order") as pool:
+            results = list(pool.map(lambda intent: send_order(api, intent, self.limiter), intents))
+        wall_time = time.perf_counter() - start
+
+        for r in results:
+            if r.ok:
+                logging.info(f"Order for {r.intent.symbol} placed successfully. Order ID: {r.order_id} (ack {r.ack_latency * 1000:.0f} ms after signal)")
+            else:
+                logging.error(f"Order placement failed for {r.intent.symbol}: {r.error}")
+        logging.info(f"Order execution stats: {summarize_latency(results, wall_time)}")
+
+        if self.on_ack:
+            for r in results:
+                if r.ok:
+                    self._call(self.on_ack, r)
+        self._pending.append(self._post_trade.submit(self._enrich, api, results))
+        return results
+
+    def _enrich(self, api, results):
+        for r in results:
+            if not r.ok and self.on_failure:
+                self._call(self.on_failure, r)
+
+        waiting = {r.order_id: r for r in results if r.ok}
+        for attempt in range(ORDER_FILL_LOOKUPS):
+            if not waiting:
+                break
+            time.sleep(ORDER_FILL_DELAY * (attempt + 1))
+            for oid, price in lookup_fill_prices(api, waiting).items():
+                waiting.pop(oid).fill_price = price
+        if waiting:
+            logging.warning(f"No fill price found for orders: {', '.join(waiting)}")
+
+        if self.on_fill:
+            for r in results:
+                if r.ok:
+                    self._call(self.on_fill, r)
+
+    @staticmethod
+    def _call(callback, result):
+        try:
+            callback(result)
+        except Exception as e:
+            logging.error(f"Post-trade callback failed for {result.intent.symbol}: {e}")
+
+    def wait(self, timeout=None):
+        """Waits for post-trade work queued by execute(). Returns False on timeout."""
+        pending, self._pending = self._pending, []
+        _, not_done = wait_futures(pending, timeout=timeout)
+        self._pending.extend(not_done)
+        return not not_done
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+POSITION_DB = os.getenv("POSITION_DB", "data/positions.sqlite")
+
+
+def broker_sides(resp):
+    """
+    {tradingsymbol: (side, netqty)} for every open position in an
+    api.position() response. Raises ValueError for an unusable response;
+    a successful response without data means no open positions.
+    """
+    if not isinstance(resp, dict) or resp.get("status") is False:
+        raise ValueError(f"position book unavailable: {resp}")
+    sides = {}
+    for pos in resp.get("data") or []:
+        qty = int(float(pos.get("netqty") or 0))
+        if qty:
+            sides[pos.get("tradingsymbol")] = ("BUY" if qty > 0 else "SELL", abs(qty))
+    return sides
+
+
+class PositionStore:
+    """
+    Last traded side per symbol (the duplicate-order guard), kept in an
+    in-memory dict for O(1) lookups and written through to SQLite so it
+    survives restarts. Placed orders are logged in the same database.
+    reconcile() takes every open position from the broker's book; symbols
+    the broker reports flat keep the side of the bot's last order, so the
+    guard answers the same before and after a restart.
+    """
+
+    def __init__(self, path=POSITION_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS positions ("
+            " symbol TEXT PRIMARY KEY, side TEXT NOT NULL, quantity INTEGER, updated_at TEXT, source TEXT);"
+            "CREATE TABLE IF NOT EXISTS orders ("
+            " order_id TEXT, symbol TEXT, side TEXT, quantity INTEGER, placed_at TEXT);"
+            "CREATE TABLE IF NOT EXISTS reconciliations ("
+            " at TEXT, duration_ms REAL, broker_positions INTEGER,"
+            " added INTEGER, removed INTEGER, changed INTEGER, error TEXT);"
+        )
+        self._lock = threading.Lock()
+        self._sides = dict(self._db.execute("SELECT symbol, side FROM positions").fetchall())
+        self.reconciled = False
+
+    def get(self, symbol, default=None):
+        return self._sides.get(symbol, default)
+
+    def __contains__(self, symbol):
+        return symbol in self._sides
+
+    def __len__(self):
+        return len(self._sides)
+
+    def record(self, symbol, side, quantity=None, order_id=None):
+        """Records a placed order and makes `side` the symbol's position."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._sides[symbol] = side
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, 'order')", (symbol, side, quantity, now)
+            )
+            if order_id:
+                self._db.execute("INSERT INTO orders VALUES (?, ?, ?, ?, ?)", (order_id, symbol, side, quantity, now))
+            self._db.execute("COMMIT")
+
+    def reconcile(self, api):
+        """
+        One api.position() call; the broker's open positions replace the
+        local ones, and sides recorded from our own orders are kept for
+        symbols the broker reports flat (BUY then SELL still blocks a second
+        SELL). Drift counts and timing are stored in `reconciliations` and
+        returned. On failure the local state is kept.
+        """
+        start = time.perf_counter()
+        now = datetime.now().isoformat(timespec="seconds")
+        stats = {"broker_positions": 0, "added": 0, "removed": 0, "changed": 0, "error": ""}
+        try:
+            broker = broker_sides(api.position())
+        except Exception as e:
+            broker = None
+            stats["error"] = str(e)
+
+        with self._lock:
+            if broker is not None:
+                ordered = self._db.execute("SELECT * FROM positions WHERE source = 'order'").fetchall()
+                flat = [row for row in ordered if row[0] not in broker]
+                stats["broker_positions"] = len(broker)
+                stats["added"] = sum(1 for s in broker if s not in self._sides)
+                kept = {row[0]: row[1] for row in flat}
+                stats["removed"] = sum(1 for s in self._sides if s not in broker and s not in kept)
+                stats["changed"] = sum(1 for s, (side, _) in broker.items() if s in self._sides and self._sides[s] != side)
+                self._sides = dict(kept, **{s: side for s, (side, _) in broker.items()})
+            stats["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            self._db.execute("BEGIN")
+            if broker is not None:
+                self._db.execute("DELETE FROM positions")
+                self._db.executemany("INSERT INTO positions VALUES (?, ?, ?, ?, ?)", flat)
+                self._db.executemany(
+                    "INSERT INTO positions VALUES (?, ?, ?, ?, 'broker')",
+                    [(s, side, qty, now) for s, (side, qty) in broker.items()],
+                )
+            self._db.execute(
+                "INSERT INTO reconciliations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (now, stats["duration_ms"], stats["broker_positions"], stats["added"], stats["removed"], stats["changed"], stats["error"]),
+            )
+            self._db.execute("COMMIT")
+
+        self.reconciled = broker is not None
+        if stats["error"]:
+            logging.error(f"Position reconciliation failed, keeping local state: {stats['error']}")
+        else:
+            logging.info(f"Position reconciliation: {stats}")
+        return stats
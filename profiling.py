@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+import functools
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+PROFILING = os.getenv("PROFILING", "false").strip().lower() in ("1", "true", "yes")
+PROFILE_EXPORT = os.getenv("PROFILE_EXPORT", "data/metrics.prom")  # .prom: Prometheus text, .jsonl: JSON lines
+PROFILE_CAPTURE = os.getenv("PROFILE_CAPTURE", "").strip().lower()  # "cprofile" or "pyinstrument": one cycle
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+
+_enabled = PROFILING
+_capture = PROFILE_CAPTURE
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class Metrics:
+    """Stage timings and counters, cumulative and for the current cycle."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = defaultdict(float)      # stage -> seconds since start
+        self.calls = defaultdict(int)         # stage -> spans since start
+        self.counters = defaultdict(float)    # (name, labels) -> value since start
+        self.cycles = 0
+        self.last_cycle_seconds = 0.0
+        self.cycle_stages = defaultdict(float)
+        self.cycle_counters = defaultdict(float)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] += seconds
+            self.calls[stage] += 1
+            self.cycle_stages[stage] += seconds
+
+    def count(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] += value
+            self.cycle_counters[key] += value
+
+    def start_cycle(self):
+        with self._lock:
+            self.cycle_stages = defaultdict(float)
+            self.cycle_counters = defaultdict(float)
+
+    def end_cycle(self, seconds):
+        with self._lock:
+            self.cycles += 1
+            self.last_cycle_seconds = seconds
+
+    def prometheus(self):
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value:.6g}")
+
+        with self._lock:
+            metric("bot_cycles_total", "counter", [("", self.cycles)])
+            metric("bot_cycle_last_seconds", "gauge", [("", self.last_cycle_seconds)])
+            metric("bot_stage_seconds_total", "counter", [(f'{{stage="{s}"}}', v) for s, v in sorted(self.totals.items())])
+            metric("bot_stage_calls_total", "counter", [(f'{{stage="{s}"}}', v) for s, v in sorted(self.calls.items())])
+            metric("bot_stage_last_seconds", "gauge", [(f'{{stage="{s}"}}', v) for s, v in sorted(self.cycle_stages.items())])
+            by_metric = defaultdict(list)
+            for (name, labels), value in sorted(self.counters.items()):
+                by_metric[name].append((_labels(labels), value))
+            for name, samples in by_metric.items():
+                metric(f"bot_{name}_total", "counter", samples)
+        return "\n".join(lines) + "\n"
+
+    def json_line(self):
+        with self._lock:
+            return json.dumps({
+                "ts": datetime.now().isoformat(timespec="seconds"),
+                "cycle_seconds": round(self.last_cycle_seconds, 6),
+                "stages": {s: round(v, 6) for s, v in self.cycle_stages.items()},
+                "counters": {name + _labels(labels): v for (name, labels), v in self.cycle_counters.items()},
+            })
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+
+metrics = Metrics()
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True, capture=None):
+    """Turns instrumentation on/off at runtime; `capture` requests a one-cycle profile."""
+    global _enabled, _capture
+    _enabled = on
+    if capture is not None:
+        _capture = capture
+    if on:
+        install_http_counters()
+
+
+def span(stage):
+    """Times a block as `stage`; a shared no-op when profiling is off."""
+    return _Span(stage) if _enabled else _NOOP
+
+
+def count(name, value=1, **labels):
+    """Adds to the counter bot_<name>_total{labels}."""
+    if _enabled:
+        metrics.count(name, value, tuple(sorted(labels.items())))
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_http_installed = False
+
+
+def install_http_counters():
+    """
+    Counts HTTP requests and request/response bytes per host for everything
+    that goes through requests (SmartAPI, gspread, Telegram). Installed only
+    when profiling is enabled.
+    """
+    global _http_installed
+    if _http_installed:
+        return
+    import requests
+
+    original_send = requests.Session.send
+
+    @functools.wraps(original_send)
+    def send(session, request, **kwargs):
+        response = original_send(session, request, **kwargs)
+        if _enabled:
+            host = urlsplit(request.url).hostname or "unknown"
+            body = request.body or b""
+            count("http_requests", host=host)
+            count("http_bytes", len(body), host=host, direction="out")
+            size = response.headers.get("Content-Length")
+            if size is None and not kwargs.get("stream"):
+                size = len(response.content)
+            count("http_bytes", int(size or 0), host=host, direction="in")
+        return response
+
+    requests.Session.send = send
+    _http_installed = True
+
+
+def export(path=PROFILE_EXPORT):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".jsonl"):
+        with open(path, "a") as f:
+            f.write(metrics.json_line() + "\n")
+    else:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(metrics.prometheus())
+        os.replace(tmp, path)
+
+
+@contextmanager
+def _captured():
+    global _capture
+    mode, _capture = _capture, ""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logging.warning("pyinstrument is not installed; using cProfile.")
+            mode = "cprofile"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                path = os.path.join(PROFILE_DIR, f"cycle-{stamp}.html")
+                with open(path, "w") as f:
+                    f.write(profiler.output_html())
+                logging.info(f"Cycle profile written to {path}.")
+            return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, f"cycle-{stamp}.pstats")
+        profiler.dump_stats(path)
+        top = io.StringIO()
+        pstats.Stats(profiler, stream=top).sort_stats("cumulative").print_stats(25)
+        logging.info(f"Cycle profile written to {path} (view with: python -m pstats {path}).\n{top.getvalue()}")
+
+
+@contextmanager
+def cycle():
+    """Wraps one run_bot cycle: resets per-cycle stats, optionally profiles it, then exports."""
+    if not _enabled and not _capture:
+        yield
+        return
+    metrics.start_cycle()
+    start = time.perf_counter()
+    try:
+        if _capture:
+            with _captured():
+                yield
+        else:
+            yield
+    finally:
+        metrics.end_cycle(time.perf_counter() - start)
+        if _enabled:
+            export()
+            logging.info(f"Cycle stage timings (s): { {s: round(v, 3) for s, v in metrics.cycle_stages.items()} }")
+
+
+if _enabled:
+    install_http_counters()
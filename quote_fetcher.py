@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from rate_limiter import TokenBucket
+
+# SmartAPI accepts up to 50 tokens per getMarketData request.
+QUOTE_BATCH_SIZE = 50
+QUOTE_RATE_PER_SEC = float(os.getenv("QUOTE_RATE_PER_SEC", "10"))
+
+_quote_limiter = TokenBucket(QUOTE_RATE_PER_SEC)
+
+
+def build_batches(exchange_tokens, batch_size=QUOTE_BATCH_SIZE):
+    """
+    Packs (exch_seg, token) pairs into getMarketData payloads of at most
+    `batch_size` tokens, e.g. [{"NSE": ["3045", ...], "NFO": [...]}, ...].
+    """
+    pairs = sorted({(str(ex), str(tok)) for ex, tok in exchange_tokens})
+    batches = []
+    for start in range(0, len(pairs), batch_size):
+        batch = {}
+        for ex, tok in pairs[start:start + batch_size]:
+            batch.setdefault(ex, []).append(tok)
+        batches.append(batch)
+    return batches
+
+
+def fetch_market_data(api, exchange_tokens, mode="LTP", limiter=None):
+    """
+    Fetches quotes for an iterable of (exch_seg, token) pairs in batched
+    getMarketData calls. Returns the list of 'fetched' quote dicts.
+    """
+    limiter = limiter or _quote_limiter
+    fetched = []
+    for batch in build_batches(exchange_tokens):
+        limiter.acquire()
+        try:
+            resp = api.getMarketData(mode, batch)
+        except Exception as e:
+            logging.error(f"getMarketData failed for {sum(len(t) for t in batch.values())} tokens: {e}")
+            continue
+
+        if not resp or not resp.get('status') or not resp.get('data'):
+            logging.warning(f"getMarketData returned no data. Raw response: {resp}")
+            continue
+
+        fetched.extend(resp['data'].get('fetched') or [])
+        unfetched = resp['data'].get('unfetched') or []
+        if unfetched:
+            logging.warning(f"{len(unfetched)} tokens could not be fetched: {unfetched[:5]}")
+    return fetched
+
+
+def fetch_ltp_series(api, symbols_df, limiter=None):
+    """
+    Returns a float Series of LTPs aligned to symbols_df.index (NaN where the
+    quote is missing). symbols_df needs 'exch_seg' and 'symboltoken' columns.
+    """
+    if symbols_df.empty:
+        return pd.Series(dtype=float, index=symbols_df.index)
+
+    exch = symbols_df['exch_seg'].astype(str)
+    tokens = symbols_df['symboltoken'].astype(str)
+    quotes = fetch_market_data(api, zip(exch, tokens), mode="LTP", limiter=limiter)
+
+    ltp_by_key = {
+        f"{q.get('exchange')}:{q.get('symbolToken')}": q.get('ltp')
+        for q in quotes
+    }
+    keys = exch + ":" + tokens
+    prices = pd.to_numeric(keys.map(ltp_by_key), errors='coerce').astype(np.float64)
+
+    logging.info(f"Fetched LTP for {int(prices.notna().sum())}/{len(prices)} symbols.")
+    return prices
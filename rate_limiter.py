@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens are refilled every `per` seconds,
+    up to `capacity`. acquire() blocks until a token is available instead of
+    sleeping a fixed amount between API calls.
+    """
+
+    def __init__(self, rate, per=1.0, capacity=None):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._shared = None
+
+    def attach(self, shared):
+        """
+        Draws tokens from `shared` (e.g. a multiprocessing manager proxy)
+        instead of this bucket, so several processes share one budget.
+        """
+        self._shared = shared
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate / self.per)
+            self._last = now
+
+    def try_acquire(self, tokens=1):
+        if self._shared is not None:
+            return self._shared.try_acquire(tokens)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def refund(self, tokens=1):
+        """Returns tokens taken by a call that did not go ahead (up to capacity)."""
+        if self._shared is not None:
+            return self._shared.refund(tokens)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available. Returns the seconds spent waiting."""
+        if self._shared is not None:
+            return self._shared.acquire(tokens)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) * self.per / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class MultiLimiter:
+    """
+    Combines several buckets, e.g. a broker's per-second and per-minute
+    limits. Pass the longest window first so a call never holds a short-window
+    token while it waits on the long one.
+    """
+
+    def __init__(self, *buckets):
+        self.buckets = buckets
+        self._shared = None
+
+    def attach(self, shared):
+        """See TokenBucket.attach."""
+        self._shared = shared
+
+    def try_acquire(self, tokens=1):
+        if self._shared is not None:
+            return self._shared.try_acquire(tokens)
+        taken = []
+        for bucket in self.buckets:
+            if not bucket.try_acquire(tokens):
+                # All or nothing: give back what the earlier buckets granted.
+                for granted in taken:
+                    granted.refund(tokens)
+                return False
+            taken.append(bucket)
+        return True
+
+    def acquire(self, tokens=1):
+        if self._shared is not None:
+            return self._shared.acquire(tokens)
+        return sum(b.acquire(tokens) for b in self.buckets)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from market_calendar import MARKET_TZ, is_trading_day, session_bounds
+
+SCHEDULE_EXCHANGES = [ex.strip().upper() for ex in os.getenv("SCHEDULE_EXCHANGES", "NSE").split(",")]
+SCHEDULE_GRACE_SECONDS = float(os.getenv("SCHEDULE_GRACE_SECONDS", "5"))  # let the closed candle settle
+SCHEDULER_MAX_RUNTIME = float(os.getenv("SCHEDULER_MAX_RUNTIME", "0"))  # seconds; 0 = no limit
+SCHEDULER_EXIT_AFTER_CLOSE = os.getenv("SCHEDULER_EXIT_AFTER_CLOSE", "false").strip().lower() in ("1", "true", "yes")
+MAX_LOOKAHEAD_DAYS = 14
+
+
+def next_boundary(exchanges, interval, after, grace=SCHEDULE_GRACE_SECONDS):
+    """
+    First bar close strictly after `after` (aware) for any of the exchanges:
+    session open + k * interval (k >= 1, the last one cut at the session
+    close), plus `grace`. Weekends and MARKET_HOLIDAYS_FILE days are skipped.
+    """
+    after = after.astimezone(MARKET_TZ)
+    step = timedelta(seconds=interval)
+    pause = timedelta(seconds=grace)
+    best = None
+    for exchange in exchanges:
+        day = after.date()
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if is_trading_day(day, exchange):
+                open_dt, close_dt = session_bounds(exchange, day)
+                k = max(1, (after - pause - open_dt) // step + 1)
+                if k <= math.ceil((close_dt - open_dt) / step):
+                    fire = min(open_dt + k * step, close_dt) + pause
+                    if fire > after:
+                        best = fire if best is None else min(best, fire)
+                        break
+            day += timedelta(days=1)
+    return best
+
+
+def last_close(exchanges, day):
+    """Latest session close on `day` among the exchanges trading that day, or None."""
+    closes = [session_bounds(ex, day)[1] for ex in exchanges if is_trading_day(day, ex)]
+    return max(closes) if closes else None
+
+
+class BarScheduler:
+    """
+    Runs `job` on every bar boundary of the exchange sessions instead of
+    sleeping a fixed amount after each run. A boundary that arrives while
+    the previous run is still going is skipped, never queued. Lateness
+    (actual start - scheduled time) is logged per tick and summarized.
+    """
+
+    def __init__(self, job, interval, exchanges=None, grace=SCHEDULE_GRACE_SECONDS,
+                 max_runtime=SCHEDULER_MAX_RUNTIME, exit_after_close=SCHEDULER_EXIT_AFTER_CLOSE, clock=None):
+        self.job = job
+        self.interval = interval
+        self.exchanges = exchanges or SCHEDULE_EXCHANGES
+        self.grace = grace
+        self.max_runtime = max_runtime
+        self.exit_after_close = exit_after_close
+        self.clock = clock or (lambda: datetime.now(MARKET_TZ))
+        self.lateness = []
+        self.skipped = 0
+        self.failures = 0
+        self._worker = None
+        self._stop = threading.Event()
+
+    def _run_job(self):
+        try:
+            self.job()
+        except Exception as e:
+            self.failures += 1
+            logging.error(f"An unexpected error occurred in the scheduled run: {e}")
+
+    def _sleep_until(self, when):
+        # Re-check the wall clock in short slices so suspend/NTP jumps don't oversleep.
+        while not self._stop.is_set():
+            remaining = (when - self.clock()).total_seconds()
+            if remaining <= 0:
+                return True
+            self._stop.wait(min(remaining, 30.0))
+        return False
+
+    def tick(self, scheduled):
+        """Starts the job for one boundary unless the previous run is still going."""
+        late = (self.clock() - scheduled).total_seconds()
+        if self._worker is not None and self._worker.is_alive():
+            self.skipped += 1
+            logging.warning(f"Previous run still in progress; skipping the {scheduled:%H:%M:%S} tick ({self.skipped} skipped so far).")
+            return False
+        self.lateness.append(late)
+        logging.info(f"Scheduled run for {scheduled:%Y-%m-%d %H:%M:%S} started {late * 1000:.0f} ms late.")
+        self._worker = threading.Thread(target=self._run_job, name="scheduled-run", daemon=True)
+        self._worker.start()
+        return True
+
+    def stats(self):
+        late = sorted(self.lateness)
+        return {
+            "ticks": len(late),
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "late_p50_ms": round(late[len(late) // 2] * 1000, 1) if late else 0.0,
+            "late_p95_ms": round(late[int(len(late) * 0.95)] * 1000, 1) if late else 0.0,
+            "late_max_ms": round(late[-1] * 1000, 1) if late else 0.0,
+        }
+
+    def run(self):
+        started = time.monotonic()
+        while not self._stop.is_set():
+            now = self.clock()
+            scheduled = next_boundary(self.exchanges, self.interval, now, self.grace)
+            if scheduled is None:
+                logging.error(f"No trading session for {self.exchanges} in the next {MAX_LOOKAHEAD_DAYS} days.")
+                break
+            if self.exit_after_close:
+                close = last_close(self.exchanges, now.date())
+                if close is None or scheduled > close + timedelta(seconds=self.grace):
+                    logging.info("Sessions closed for the day; scheduler exiting.")
+                    break
+            if self.max_runtime and time.monotonic() - started + (scheduled - now).total_seconds() > self.max_runtime:
+                logging.info("Next tick falls after SCHEDULER_MAX_RUNTIME; scheduler exiting.")
+                break
+            logging.info(f"Next run at {scheduled:%Y-%m-%d %H:%M:%S %Z}.")
+            if not self._sleep_until(scheduled):
+                break
+            if self.tick(scheduled) and len(self.lateness) % 10 == 0:
+                logging.info(f"Scheduler stats: {self.stats()}")
+
+        if self._worker is not None:
+            self._worker.join()
+        logging.info(f"Scheduler stats: {self.stats()}")
+
+    def stop(self):
+        self._stop.set()
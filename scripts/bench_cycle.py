@@ -0,0 +1,168 @@
+"""
+End-to-end cycle benchmark on the replay harness (scripts/replay.py):
+full run_bot cycles against synthetic universes, reporting wall time, API
+calls per service, tracemalloc peak and the time the real broker and
+Sheets quotas would add for those calls (the stand-ins are unthrottled).
+The first cycle is cold (empty candle cache, new session, first orders),
+later ones are warm. Every size runs in its own process; peak memory is
+measured in a second run so tracing does not inflate the wall times.
+
+With --baseline it is a regression gate: it exits 1 if any API call count
+grew, or wall time / peak memory grew by more than --tolerance (CI runs it
+on every pull request against scripts/bench_cycle_baseline.json).
+
+Run from the repo root:
+    python -m scripts.bench_cycle --sizes 10 100 1000 10000
+    python -m scripts.bench_cycle --sizes 10 100 1000 --save-baseline scripts/bench_cycle_baseline.json
+    python -m scripts.bench_cycle --sizes 10 100 1000 --baseline scripts/bench_cycle_baseline.json --tolerance 1.0
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import tracemalloc
+
+import candle_fetcher
+import order_executor
+import quote_fetcher
+import sheet_writer
+from scripts.replay import SERVICES, SHEET_WRITE_METHODS, Harness, parse_latency, synthetic_cassette
+
+WALL_NOISE_S = 0.05   # wall-time differences below this are never regressions
+MEMORY_NOISE_MB = 2.0
+# The journal worker appends whatever rows are pending when it wakes, so its
+# request count depends on thread timing; it may not exceed one per order
+# (plus the header row of a new journal sheet).
+TIMING_DEPENDENT_CALLS = {"sheets.append_rows"}
+
+
+def _floor(bucket, n):
+    return max(0.0, n - bucket.capacity) * bucket.per / bucket.rate
+
+
+def quota_seconds(calls):
+    """
+    Least time the bot's rate limiters (QUOTE/HIST/ORDER rates, Sheets
+    quotas) would spend on these calls, starting from full buckets.
+    """
+    reads = sum(n for key, n in calls.items() if key.startswith("sheets.") and key[7:] not in SHEET_WRITE_METHODS)
+    writes = sum(n for key, n in calls.items() if key.startswith("sheets.") and key[7:] in SHEET_WRITE_METHODS)
+    hist = calls.get("angel.getCandleData", 0)
+    return (_floor(quote_fetcher._quote_limiter, calls.get("angel.getMarketData", 0))
+            + max(_floor(b, hist) for b in candle_fetcher._hist_limiter.buckets)
+            + _floor(order_executor._order_limiter, calls.get("angel.placeOrder", 0))
+            + _floor(sheet_writer.sheets_read_limiter, reads)
+            + _floor(sheet_writer.sheets_write_limiter, writes))
+
+
+def run_size(n, cycles, latency, trace_memory):
+    """Runs `cycles` cycles on a fresh universe in this process; one result dict per cycle."""
+    results = []
+    with Harness(synthetic_cassette(n), latency) as harness:
+        for i in range(cycles):
+            if trace_memory:
+                tracemalloc.start()
+            stats = harness.run_cycle()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+            tracemalloc.stop()
+            calls = {f"{service}.{method}": count for (service, method), count in sorted(stats.calls.items())}
+            results.append({
+                "symbols": n, "cycle": "cold" if i == 0 else "warm", "wall_s": round(stats.wall, 3),
+                "peak_mb": round(peak, 1) if peak is not None else None, "calls": calls,
+                "quota_s": round(quota_seconds(calls), 1), "orders": stats.orders,
+                "stages": {s: round(v, 3) for s, v in sorted(stats.stages.items())},
+            })
+    return results
+
+
+def measure(n, args):
+    """Timed run and (unless --no-memory) a traced run of one size, each in a child process."""
+    def child(trace):
+        cmd = [sys.executable, "-m", "scripts.bench_cycle", "--one", str(n), "--cycles", str(args.cycles)]
+        cmd += ["--latency", *args.latency] if args.latency else []
+        cmd += ["--trace-memory"] if trace else []
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=None if args.verbose else subprocess.DEVNULL,
+                             text=True, check=True).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+    results = child(False)
+    if not args.no_memory:
+        for result, traced in zip(results, child(True)):
+            result["peak_mb"] = traced["peak_mb"]
+    return results
+
+
+def api_total(result, service):
+    return sum(n for key, n in result["calls"].items() if key.startswith(service + "."))
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against a baseline from --save-baseline."""
+    base = {(r["symbols"], r["cycle"]): r for r in baseline}
+    problems = []
+    for r in results:
+        b = base.get((r["symbols"], r["cycle"]))
+        if b is None:
+            continue
+        label = f"{r['symbols']} symbols, {r['cycle']}"
+        for key, n in r["calls"].items():
+            allowed = r["orders"] + 1 if key in TIMING_DEPENDENT_CALLS else b["calls"].get(key, 0)
+            if n > allowed:
+                problems.append(f"{label}: {key} {b['calls'].get(key, 0)} -> {n} calls")
+        if r["wall_s"] > b["wall_s"] * (1 + tolerance) and r["wall_s"] - b["wall_s"] > WALL_NOISE_S:
+            problems.append(f"{label}: wall time {b['wall_s']:.2f}s -> {r['wall_s']:.2f}s")
+        if (r["peak_mb"] is not None and b.get("peak_mb") is not None
+                and r["peak_mb"] > b["peak_mb"] * (1 + tolerance) and r["peak_mb"] - b["peak_mb"] > MEMORY_NOISE_MB):
+            problems.append(f"{label}: peak memory {b['peak_mb']:.1f} MB -> {r['peak_mb']:.1f} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1_000, 10_000])
+    parser.add_argument("--cycles", type=int, default=2, help="first cycle cold, the rest warm")
+    parser.add_argument("--latency", nargs="*", metavar="SERVICE=SECONDS", help="per-call latency (default: none)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--baseline", help="fail on regressions against this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed wall time/memory growth (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's log output")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--trace-memory", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        # Child process: the bot logs to stderr, the results are the last stdout line.
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+        print(json.dumps(run_size(args.one, args.cycles, parse_latency(args.latency), args.trace_memory)))
+        return
+
+    print(f"{'symbols':>7} {'cycle':>5} {'wall_s':>8} " + " ".join(f"{s:>8}" for s in SERVICES)
+          + f" {'peak_mb':>8} {'quota_s':>8} {'orders':>6}  slowest stages")
+    results = []
+    for n in args.sizes:
+        for r in measure(n, args):
+            results.append(r)
+            slowest = sorted(r["stages"].items(), key=lambda kv: -kv[1])[:3]
+            peak = f"{r['peak_mb']:>8.1f}" if r["peak_mb"] is not None else f"{'-':>8}"
+            print(f"{n:>7} {r['cycle']:>5} {r['wall_s']:>8.2f} "
+                  + " ".join(f"{api_total(r, s):>8}" for s in SERVICES)
+                  + f" {peak} {r['quota_s']:>8.1f} {r['orders']:>6}  "
+                  + ", ".join(f"{s} {v:.2f}s" for s, v in slowest))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"Baseline written to {args.save_baseline}.")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("Performance regressions:\n  " + "\n  ".join(problems))
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
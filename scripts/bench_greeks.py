@@ -0,0 +1,71 @@
+"""
+Benchmark of the vectorized IV solver and Greeks on a synthetic chain:
+prices are generated from known volatilities, solved back and checked.
+
+Run from the repo root:
+    python -m scripts.bench_greeks --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from greeks import GreeksCache, bs_greeks, bs_price, implied_vol
+
+TARGET_MS = 50.0
+
+
+def make_chain(n, spot=22000.0, seed=0):
+    rng = np.random.default_rng(seed)
+    strikes = np.round(spot * np.exp(rng.normal(0, 0.08, n)) / 50) * 50
+    T = rng.uniform(1, 60, n) / 365
+    sigma = rng.uniform(0.08, 0.8, n)
+    is_call = rng.random(n) < 0.5
+    prices = bs_price(spot, strikes, T, sigma, is_call)
+    return spot, strikes, T, sigma, is_call, prices
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'contracts':>9} {'iv_ms':>8} {'greeks_ms':>10} {'cache_miss_ms':>14} {'cache_hit_ms':>13} "
+          f"{'solved':>7} {'max_iv_err':>11}")
+    for n in args.sizes:
+        spot, strikes, T, sigma, is_call, prices = make_chain(n)
+        iv = implied_vol(prices, spot, strikes, T, is_call)
+        iv_ms = best_of(lambda: implied_vol(prices, spot, strikes, T, is_call), args.repeat)
+        greeks_ms = best_of(lambda: bs_greeks(spot, strikes, T, iv, is_call), args.repeat)
+
+        tokens = np.arange(n).astype(str)
+        cache = GreeksCache()
+        start = time.perf_counter()
+        cache.compute(tokens, spot, strikes, T, prices, is_call)
+        miss_ms = (time.perf_counter() - start) * 1000
+        hit_ms = best_of(lambda: cache.compute(tokens, spot, strikes, T, prices, is_call), args.repeat)
+
+        # Deep in-the-money contracts with almost no time value have no well-defined IV.
+        vega = bs_greeks(spot, strikes, T, sigma, is_call)["vega"]
+        meaningful = vega > 1e-3
+        solved = np.isfinite(iv)[meaningful].mean()
+        err = np.nanmax(np.abs(iv - sigma)[meaningful])
+        print(f"{n:>9} {iv_ms:>8.1f} {greeks_ms:>10.1f} {miss_ms:>14.1f} {hit_ms:>13.1f} {solved:>7.1%} {err:>11.1e}")
+        if n == 10_000:
+            total = iv_ms + greeks_ms
+            print(f"{'':>9} IV + Greeks for 10k contracts: {total:.1f} ms (target < {TARGET_MS:.0f} ms)"
+                  f" {'OK' if total < TARGET_MS else 'SLOW'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compares the old scrip-master path (whole body -> json -> DataFrame ->
+filter) with the streaming parser used by instrument_store.refresh_store.
+
+Run from the repo root against a recorded master file:
+    python -m scripts.bench_master_parse --file OpenAPIScripMaster.json
+Without --file a synthetic master of --rows records is generated.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from instrument_store import RecordBuilder, _iter_master_chunks, iter_json_array, keep_record
+
+
+def legacy_parse(path):
+    # What fetch_and_save_tokens did with requests.get(MASTER_URL).json().
+    with open(path, "rb") as f:
+        body = f.read()
+    data = json.loads(body)
+    records = data["data"] if isinstance(data, dict) else data
+    df = pd.DataFrame(records)
+    df["symbol"] = df["symbol"].str.upper()
+    df["name"] = df["name"].str.upper()
+    indices_list = ['NIFTY', 'BANKNIFTY', 'FINNIFTY', 'MIDCPNIFTY', 'SENSEX']
+    indices_pattern = '|'.join([re.escape(i) for i in indices_list] + ['NIFTY 50', 'NIFTY BANK', 'NIFTY FINANCIAL SERVICES', 'NIFTY MIDCAP 100'])
+    filtered = df[
+        (df['exch_seg'].isin(['NFO', 'BSE', 'NSE'])) &
+        ((df['name'].str.contains(indices_pattern, regex=True, na=False)) |
+         (df['instrumenttype'].isin(["OPTCOM", "FUTCOM", "FUTIDX", "EQ"])) |
+         (df['symbol'].str.endswith("-EQ")))
+    ].copy()
+    return len(filtered)
+
+
+def streaming_parse(path):
+    builder = RecordBuilder()
+    for rec in iter_json_array(_iter_master_chunks(path)):
+        if keep_record(rec):
+            builder.add(rec)
+    builder.arrays()
+    return len(builder)
+
+
+def synthetic_master(path, rows, seed=0):
+    rng = random.Random(seed)
+    names = ["NIFTY", "BANKNIFTY", "RELIANCE", "SBIN", "CRUDEOIL", "GOLD", "TCS", "INFY"]
+    exchanges = ["NSE", "NFO", "BSE", "MCX", "CDS", "BFO"]
+    with open(path, "w") as f:
+        f.write("[")
+        for i in range(rows):
+            name = rng.choice(names)
+            strike = rng.randrange(100, 60000, 50)
+            rec = {
+                "token": str(10000 + i), "symbol": f"{name}28OCT25{strike}{rng.choice(['CE', 'PE'])}",
+                "name": name, "expiry": "28OCT2025", "strike": f"{strike * 100}.000000", "lotsize": "75",
+                "instrumenttype": rng.choice(["OPTIDX", "OPTSTK", "FUTCOM", "", "AMXIDX"]),
+                "exch_seg": rng.choice(exchanges), "tick_size": "5.000000",
+            }
+            f.write(("," if i else "") + json.dumps(rec))
+        f.write("]")
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    rows = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", help="recorded OpenAPIScripMaster.json")
+    parser.add_argument("--rows", type=int, default=150_000)
+    args = parser.parse_args()
+
+    path = args.file
+    tmp = None
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+        tmp.close()
+        path = tmp.name
+        synthetic_master(path, args.rows)
+    print(f"master: {path} ({os.path.getsize(path) / 2 ** 20:.1f} MB)")
+
+    try:
+        print(f"{'path':<10} {'kept':>8} {'seconds':>8} {'peak_MB':>8}")
+        for label, fn in (("legacy", legacy_parse), ("streaming", streaming_parse)):
+            rows, elapsed, peak = measure(fn, path)
+            print(f"{label:<10} {rows:>8} {elapsed:>8.2f} {peak:>8.1f}")
+    finally:
+        if tmp:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Wall-clock benchmark of the batched LTP fetch against a mocked SmartConnect.
+
+Run from the repo root:
+    python -m scripts.bench_quotes --latency 0.05
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from quote_fetcher import fetch_ltp_series
+
+LEGACY_SLEEP = 0.2  # fixed sleep of the old per-row ltpData loop
+
+
+class MockSmartConnect:
+    """Serves getMarketData/ltpData with a fixed network latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def getMarketData(self, mode, exchangeTokens):
+        self.calls += 1
+        time.sleep(self.latency)
+        fetched = [
+            {"exchange": ex, "symbolToken": tok, "tradingSymbol": f"SYM{tok}", "ltp": 100.0 + int(tok) % 97}
+            for ex, toks in exchangeTokens.items() for tok in toks
+        ]
+        return {"status": True, "data": {"fetched": fetched, "unfetched": []}}
+
+    def ltpData(self, exchange, tradingsymbol, symboltoken):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"status": True, "data": {"ltp": 100.0 + int(symboltoken) % 97}}
+
+
+def make_universe(n):
+    exchanges = ["NSE", "NFO", "BSE"]
+    return pd.DataFrame({
+        "SYMBOL": [f"SYM{i}" for i in range(n)],
+        "symboltoken": [str(1000 + i) for i in range(n)],
+        "exch_seg": [exchanges[i % len(exchanges)] for i in range(n)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="mocked round-trip seconds per API call")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'calls':>6} {'batched_s':>10} {'legacy_est_s':>13}")
+    for n in args.sizes:
+        api = MockSmartConnect(args.latency)
+        df = make_universe(n)
+        start = time.perf_counter()
+        prices = fetch_ltp_series(api, df)
+        elapsed = time.perf_counter() - start
+        assert prices.notna().all()
+        legacy = n * (args.latency + LEGACY_SLEEP)
+        print(f"{n:>8} {api.calls:>6} {elapsed:>10.2f} {legacy:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
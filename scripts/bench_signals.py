@@ -0,0 +1,72 @@
+"""
+Microbenchmark of the vectorized signal stage against the previous
+iterrows() implementation.
+
+Run from the repo root:
+    python -m scripts.bench_signals
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from signals import evaluate_signals
+
+
+def legacy_generate_signals(latest):
+    # The per-row loop main.generate_signals used before vectorization.
+    signals = []
+    for _, r in latest.iterrows():
+        if pd.isna(r.get('MACD', np.nan)) or pd.isna(r.get('SIGNAL_LINE', np.nan)) or \
+           pd.isna(r.get('RSI', np.nan)) or pd.isna(r.get('SMA_5', np.nan)) or \
+           pd.isna(r.get('SMA_20', np.nan)):
+            continue
+        if (r['SMA_5'] > r['SMA_20'] and r['MACD'] > r['SIGNAL_LINE'] and r['RSI'] > 60 and
+                (pd.isna(r['PCR']) or r['PCR'] < 0.75)):
+            signals.append(f"BUY {r['SYMBOL']} (Multi-Indicator)")
+        elif (r['SMA_5'] < r['SMA_20'] and r['MACD'] < r['SIGNAL_LINE'] and r['RSI'] < 40 and
+                (pd.isna(r['PCR']) or r['PCR'] > 1.10)):
+            signals.append(f"SELL {r['SYMBOL']} (Multi-Indicator)")
+    return signals
+
+
+def make_latest(n, seed=0):
+    rng = np.random.default_rng(seed)
+    pcr = rng.uniform(0.5, 1.5, n)
+    pcr[rng.random(n) < 0.2] = np.nan
+    return pd.DataFrame({
+        "SYMBOL": [f"SYM{i}" for i in range(n)],
+        "SMA_5": rng.normal(100, 5, n),
+        "SMA_20": rng.normal(100, 5, n),
+        "MACD": rng.normal(0, 1, n),
+        "SIGNAL_LINE": rng.normal(0, 1, n),
+        "RSI": rng.uniform(0, 100, n),
+        "PCR": pcr,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="skip the slow loop above this size")
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'signals':>8} {'vectorized_ms':>14} {'iterrows_ms':>12}")
+    for n in args.sizes:
+        latest = make_latest(n)
+        start = time.perf_counter()
+        signals = evaluate_signals(latest)
+        vec_ms = (time.perf_counter() - start) * 1000
+
+        legacy_ms = float("nan")
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            legacy = legacy_generate_signals(latest)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            assert len(legacy) == len(signals)
+        print(f"{n:>8} {len(signals):>8} {vec_ms:>14.1f} {legacy_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark: `python -X importtime -c "import main"` in fresh
+interpreters, reporting the median import time and process wall time, and
+the top-level imports that cost the most. With --ref the same is measured on
+another revision (exported with `git archive`), e.g. to compare a branch
+with main.
+
+Every interpreter runs in an empty directory with placeholder credentials,
+so revisions that open stores or exit on missing settings at import still
+import cleanly.
+
+Run from the repo root:
+    python -m scripts.bench_startup
+    python -m scripts.bench_startup --ref HEAD~1 --runs 7
+    python -m scripts.bench_startup --module main shard_runner backtest
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PLACEHOLDER_ENV = {
+    "ANGEL_API_KEY": "bench", "ANGEL_CLIENT_CODE": "bench", "ANGEL_CLIENT_PWD": "bench",
+    "ANGEL_TOTP_SECRET": "JBSWY3DPEHPK3PXP", "GSHEET_ID": "bench", "GSHEET_CREDS_JSON": "{}",
+}
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+WATCHED = ("pandas", "numpy", "gspread", "oauth2client", "SmartApi", "websocket", "requests", "pyotp")
+
+
+def import_once(src, module):
+    """(import_ms, wall_ms, {top-level import: cumulative ms}, loaded packages) for one fresh interpreter."""
+    env = dict(os.environ, **PLACEHOLDER_ENV, PYTHONPATH=str(src))
+    code = f"import sys, {module}; print(' '.join(sorted(sys.modules)))"
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as cwd:
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        wall = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed in {src}:\n{proc.stderr[-2000:]}")
+
+    # importtime lists children before their parent; a module's direct
+    # children are the lines just above it with two more spaces of indent.
+    total, children, pending = 0.0, {}, defaultdict(list)
+    for line in proc.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)) / 1000, len(m.group(3)) // 2, m.group(4)
+        if depth == 0 and name == module:
+            total = cumulative
+            children = dict(pending[1])
+        pending[depth].append((name, cumulative))
+        pending[depth + 1] = []
+    loaded = set(proc.stdout.split())
+    return total, wall, children, {p for p in WATCHED if p in loaded}
+
+
+def measure(src, module, runs):
+    results = [import_once(src, module) for _ in range(runs + 1)][1:]  # the first run warms the bytecode cache
+    by_child = defaultdict(list)
+    for _, _, children, _ in results:
+        for name, ms in children.items():
+            by_child[name].append(ms)
+    top = sorted(((statistics.median(v), k) for k, v in by_child.items()), reverse=True)
+    return {
+        "import_ms": statistics.median(r[0] for r in results),
+        "wall_ms": statistics.median(r[1] for r in results),
+        "top": top,
+        "loaded": results[-1][3],
+    }
+
+
+def export_revision(rev, dest):
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, stdout=subprocess.PIPE, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(dest)
+    return Path(dest)
+
+
+def report(label, result, top_n):
+    print(f"{label}: import {result['import_ms']:.0f} ms, process wall {result['wall_ms']:.0f} ms; "
+          f"loads {', '.join(sorted(result['loaded'])) or 'none of ' + ', '.join(WATCHED)}")
+    for ms, name in result["top"][:top_n]:
+        print(f"    {ms:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", nargs="+", default=["main"], help="modules to import (default: main)")
+    parser.add_argument("--runs", type=int, default=5, help="interpreters per measurement; the median is reported")
+    parser.add_argument("--ref", help="also measure this git revision")
+    parser.add_argument("--top", type=int, default=10, help="top-level imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-ref-") as tmp:
+        ref_src = export_revision(args.ref, tmp) if args.ref else None
+        for module in args.module:
+            current = measure(ROOT, module, args.runs)
+            report(f"import {module} (working tree)", current, args.top)
+            if ref_src is None:
+                continue
+            before = measure(ref_src, module, args.runs)
+            report(f"import {module} ({args.ref})", before, args.top)
+            change = current["import_ms"] / before["import_ms"] - 1
+            print(f"  -> import time {before['import_ms']:.0f} -> {current['import_ms']:.0f} ms ({change:+.0%}), "
+                  f"process wall {before['wall_ms']:.0f} -> {current['wall_ms']:.0f} ms\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Parity check: the streaming IndicatorEngine must reproduce the pandas
+indicators bar for bar to within 1e-9.
+
+Run from the repo root:
+    python -m scripts.check_indicator_parity              # synthetic random walks
+    python -m scripts.check_indicator_parity --cache NSE:3045:ONE_DAY
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import indicator
+import main
+from candle_store import CandleStore
+from indicator_engine import IndicatorEngine
+
+TOLERANCE = 1e-9
+
+
+def reference_ema_vwap(df):
+    # EMA-21 and VWAP as the MCX script computes them (it needs a time column to sort on).
+    return indicator.calculate_indicators(df.assign(time=np.arange(len(df))))[['EMA', 'VWAP']]
+
+
+def synthetic_candles(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 20000 + np.cumsum(rng.normal(0, 40, n))
+    # Flat stretches exercise the zero-loss RSI branch.
+    close[n // 3:n // 3 + 30] = close[n // 3]
+    spread = np.abs(rng.normal(0, 15, n))
+    return pd.DataFrame({
+        "close": close,
+        "high": close + spread,
+        "low": close - spread,
+        "volume": rng.integers(1, 10_000, n).astype(float),
+    })
+
+
+def check(df, label):
+    df = df.reset_index(drop=True).assign(SYMBOL=label)
+    expected = main.calculate_indicators(df.copy())
+    if expected.empty:
+        print(f"{label}: skipped ({len(df)} bars, reference needs at least 26)")
+        return True
+    expected = expected.join(reference_ema_vwap(df))
+
+    engine = IndicatorEngine()
+    rows = [engine.update(label, c, h, l, v) for c, h, l, v in
+            zip(df['close'], df['high'], df['low'], df['volume'])]
+    actual = pd.DataFrame(rows)
+
+    ok = True
+    for col in ["SMA_5", "SMA_20", "RSI", "MACD", "SIGNAL_LINE", "EMA", "VWAP"]:
+        exp = expected[col].to_numpy(dtype=float)
+        act = actual[col].to_numpy(dtype=float)
+        if not np.array_equal(np.isnan(exp), np.isnan(act)):
+            print(f"{label}: {col} NaN pattern differs")
+            ok = False
+            continue
+        mask = ~np.isnan(exp)
+        err = float(np.max(np.abs(exp[mask] - act[mask]))) if mask.any() else 0.0
+        status = "ok" if err <= TOLERANCE else "FAIL"
+        ok &= err <= TOLERANCE
+        print(f"{label}: {col:<11} max abs diff {err:.3e} {status}")
+
+    # Checkpoint round trip must not change the next bar.
+    restored = IndicatorEngine.from_dict(engine.to_dict())
+    bar = (df['close'].iloc[-1] * 1.01, df['high'].iloc[-1], df['low'].iloc[-1], 100.0)
+    if engine.update(label, *bar) != restored.update(label, *bar):
+        print(f"{label}: state round trip FAIL")
+        ok = False
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--cache", nargs="*", default=[], help="EXCHANGE:TOKEN:INTERVAL keys from the candle store")
+    args = parser.parse_args()
+
+    ok = True
+    for seed in range(args.seeds):
+        ok &= check(synthetic_candles(args.bars, seed), f"synthetic-{seed}")
+    store = CandleStore()
+    for key in args.cache:
+        exchange, token, interval = key.split(":")
+        ok &= check(store.load(exchange, token, interval), key)
+
+    print("PARITY OK" if ok else "PARITY FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
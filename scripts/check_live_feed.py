@@ -0,0 +1,129 @@
+"""
+End-to-end check of the WebSocket streaming mode against the local mock
+feed: ticks are replayed over a real socket, decoded by LiveFeed, turned
+into session-anchored 1m/5m/15m/1h/1D bars and pushed through one
+IndicatorEngine per timeframe. Bars and indicator values must match a
+pandas reference built from the same ticks. Late ticks (stamped inside a
+bar the shared feed clock already closed, or before the open bar) must be
+ignored rather than emit a bar twice.
+
+Run from the repo root:
+    python -m scripts.check_live_feed --tokens 50 --minutes 90
+"""
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicator_engine import INDICATOR_COLUMNS, IndicatorEngine
+from bar_aggregator import DEFAULT_TIMEFRAMES, TIMEFRAMES
+from live_feed import EXCHANGE_TYPES, QUOTE_DTYPE, LiveFeed, encode_packet
+from market_calendar import session_open_ms
+from scripts.mock_feed_server import SYNTHETIC_START_MS, start_server, synthetic_ticks
+
+TOLERANCE = 1e-9
+
+
+def reference_bars(packets, timeframe):
+    recs = np.frombuffer(b"".join(packets), dtype=QUOTE_DTYPE)
+    df = pd.DataFrame({
+        "SYMBOL": "SYM" + pd.Series(recs["token"]).str.decode("ascii"),
+        "ts": recs["exchange_ts"],
+        "price": recs["ltp"] / 100.0,
+        "cumvol": recs["volume"].astype(float),
+    })
+    open_ms = session_open_ms("NSE", df["ts"].to_numpy())
+    length = TIMEFRAMES[timeframe]
+    df["start"] = open_ms if length is None else open_ms + (df["ts"] - open_ms) // length * length
+    bars = df.groupby(["SYMBOL", "start"], sort=True).agg(
+        open=("price", "first"), high=("price", "max"), low=("price", "min"), close=("price", "last"),
+        last_vol=("cumvol", "last"), first_vol=("cumvol", "first"),
+    ).reset_index()
+    prev = bars.groupby("SYMBOL")["last_vol"].shift()
+    bars["volume"] = bars["last_vol"] - prev.fillna(bars["first_vol"])
+    return bars
+
+
+def check_late_ticks():
+    """Two instruments on one feed clock: A's ticks close B's bar, then B's late tick arrives."""
+    nse = EXCHANGE_TYPES["NSE"]
+    bars = []
+    feed = LiveFeed([("1", nse, "A-EQ"), ("2", nse, "B-EQ")], "jwt", "key", "client", "feed",
+                    mode=2, timeframes=["1m", "5m"], on_bar=lambda bar, values: bars.append(bar))
+    t0 = SYNTHETIC_START_MS
+    ticks = [("2", 10_000, 100.0), ("1", 20_000, 200.0), ("1", 60_500, 201.0)]
+    for token, offset, price in ticks:
+        feed.handle_packet(encode_packet(token, nse, t0 + offset, price, volume=0))
+    feed.close_due(t0 + 60_500)  # closes B's first 1m bar on A's clock
+    late = [("2", 59_800, 90.0), ("1", 125_000, 202.0), ("1", 70_000, 80.0)]
+    for token, offset, price in late:
+        feed.handle_packet(encode_packet(token, nse, t0 + offset, price, volume=0))
+    feed.close_due(t0 + 86_400_000)
+
+    got = pd.DataFrame(bars)
+    keys = list(zip(got["SYMBOL"], got["timeframe"], got["start"]))
+    b_first = got[(got["SYMBOL"] == "B-EQ") & (got["timeframe"] == "1m")]
+    ok = (len(keys) == len(set(keys)) and feed.bars.ignored == 2
+          and len(b_first) == 1 and b_first["close"].iloc[0] == 100.0 and got["low"].min() == 100.0)
+    print(f"late ticks: {len(got)} bars, {feed.bars.ignored} ignored {'ok' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--minutes", type=int, default=90)
+    parser.add_argument("--ticks-per-minute", type=int, default=30)
+    args = parser.parse_args()
+
+    packets = synthetic_ticks(args.tokens, args.minutes, args.ticks_per_minute, quote=True)
+    port, server = start_server(packets)
+    instruments = [(str(t), EXCHANGE_TYPES["NSE"], f"SYM{t}") for t in range(1, args.tokens + 1)]
+
+    bars = []
+    feed = LiveFeed(instruments, "jwt", "key", "client", "feed", url=f"ws://127.0.0.1:{port}",
+                    mode=2, timeframes=DEFAULT_TIMEFRAMES, on_bar=lambda bar, values: bars.append(bar))
+    start = time.perf_counter()
+    runner = threading.Thread(target=feed.run, kwargs={"reconnect": False})
+    runner.start()
+    runner.join(120)
+    server.join(5)
+    wall = time.perf_counter() - start
+    feed.close_due(feed.feed_now() + 86_400_000)
+
+    emitted = pd.DataFrame(bars)
+    ok = feed.stats["ticks"] == len(packets)
+    cols = ["open", "high", "low", "close", "volume"]
+    for tf in DEFAULT_TIMEFRAMES:
+        got = emitted[emitted["timeframe"] == tf].sort_values(["SYMBOL", "start"]).reset_index(drop=True)
+        ref = reference_bars(packets, tf).sort_values(["SYMBOL", "start"]).reset_index(drop=True)
+        ref_engine = IndicatorEngine()
+        for row in ref.itertuples():
+            ref_engine.update(row.SYMBOL, row.close, row.high, row.low, row.volume)
+        a = feed.engines[tf].snapshot().set_index("SYMBOL").sort_index()[INDICATOR_COLUMNS]
+        b = ref_engine.snapshot().set_index("SYMBOL").sort_index()[INDICATOR_COLUMNS]
+        match = (
+            len(got) == len(ref)
+            and (got["start"].to_numpy() == ref["start"].to_numpy()).all()
+            and np.allclose(got[cols].to_numpy(float), ref[cols].to_numpy(float), atol=TOLERANCE, rtol=0)
+            and np.allclose(a.to_numpy(float), b.to_numpy(float), atol=TOLERANCE, rtol=0, equal_nan=True)
+        )
+        print(f"{tf:>3}: {len(got)} bars (reference {len(ref)}) {'ok' if match else 'MISMATCH'}")
+        ok = ok and match
+
+    lat = sorted(feed.signal_latency)
+    print(f"ticks: {feed.stats['ticks']} of {len(packets)} in {wall:.2f}s ({feed.stats['ticks'] / wall:,.0f}/s)")
+    print(f"bars: {feed.stats['bars']}, signals: {feed.stats['signals']}")
+    if lat:
+        print(f"bar close -> signal latency: p50 {lat[len(lat) // 2] * 1e6:.0f} us, max {lat[-1] * 1e6:.0f} us")
+
+    ok = check_late_ticks() and ok
+    print("LIVE FEED OK" if ok else "LIVE FEED MISMATCH")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Local stand-in for the SmartAPI WebSocket v2 feed (stdlib only). Waits for
+the client's subscribe request, then replays recorded binary ticks for the
+subscribed tokens and closes the connection.
+
+Ticks come from a file written by LiveFeed(record_path=...) (2-byte length
+prefix + packet) or are generated as random walks.
+
+Run from the repo root:
+    python -m scripts.mock_feed_server --port 8765 --record ticks.bin --speed 10
+    python -m scripts.mock_feed_server --port 8765 --synthetic 50 --minutes 30
+"""
+import argparse
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from live_feed import EXCHANGE_TYPES, decode_packet, encode_packet
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+SYNTHETIC_START_MS = 1_705_290_300_000  # Mon 2024-01-15 09:15 IST
+
+
+def read_recording(path):
+    packets = []
+    with open(path, "rb") as f:
+        while True:
+            size = f.read(2)
+            if len(size) < 2:
+                break
+            packets.append(f.read(int.from_bytes(size, "little")))
+    return packets
+
+
+def synthetic_ticks(n_tokens, minutes, ticks_per_minute=30, start_ms=None, seed=7, quote=False):
+    """Random-walk ticks for tokens "1".."n" on NSE, in exchange-time order (default: from a session open)."""
+    rng = np.random.default_rng(seed)
+    start_ms = start_ms if start_ms is not None else SYNTHETIC_START_MS
+    n = minutes * ticks_per_minute
+    offsets = np.sort(rng.integers(0, minutes * 60_000, size=(n_tokens, n)), axis=1)
+    prices = 100 + np.cumsum(rng.normal(0, 0.05, size=(n_tokens, n)), axis=1)
+    volumes = np.cumsum(rng.integers(1, 50, size=(n_tokens, n)), axis=1)
+    order = np.argsort(offsets, axis=None, kind="stable")
+    packets = []
+    for seq, flat in enumerate(order):
+        t, i = divmod(int(flat), n)
+        packets.append(encode_packet(
+            str(t + 1), EXCHANGE_TYPES["NSE"], start_ms + int(offsets[t, i]), round(float(prices[t, i]), 2),
+            sequence=seq, volume=int(volumes[t, i]) if quote else None,
+        ))
+    return packets
+
+
+def _recv_exact(conn, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = conn.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("client closed")
+        buf += chunk
+    return buf
+
+
+def recv_frame(conn):
+    head = _recv_exact(conn, 2)
+    opcode = head[0] & 0x0F
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _recv_exact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _recv_exact(conn, 8))[0]
+    mask = _recv_exact(conn, 4) if head[1] & 0x80 else None
+    payload = _recv_exact(conn, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def send_frame(conn, payload, opcode=0x2):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    n = len(payload)
+    if n < 126:
+        head = struct.pack(">BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+    conn.sendall(head + payload)
+
+
+def handshake(conn):
+    request = b""
+    while b"\r\n\r\n" not in request:
+        request += conn.recv(4096)
+    headers = dict(
+        line.split(": ", 1) for line in request.decode().split("\r\n")[1:] if ": " in line
+    )
+    key = {k.lower(): v for k, v in headers.items()}["sec-websocket-key"]
+    accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+    conn.sendall((
+        "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+    ).encode())
+    return {k.lower(): v for k, v in headers.items()}
+
+
+def serve_client(conn, packets, speed=0.0):
+    """Replays `packets` for the subscribed tokens; speed 0 sends as fast as possible."""
+    handshake(conn)
+    subscribed = set()
+    ready = threading.Event()
+
+    def reader():
+        try:
+            while True:
+                opcode, payload = recv_frame(conn)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x1:
+                    text = payload.decode()
+                    if text == "ping":
+                        send_frame(conn, "pong", opcode=0x1)
+                        continue
+                    req = json.loads(text)
+                    for entry in req["params"]["tokenList"]:
+                        subscribed.update((str(t), entry["exchangeType"]) for t in entry["tokens"])
+                    ready.set()
+        except (ConnectionError, OSError):
+            pass
+        ready.set()
+
+    threading.Thread(target=reader, daemon=True).start()
+    ready.wait(10)
+    time.sleep(0.05)  # let chunked subscribe requests arrive
+
+    prev_ts = None
+    sent = 0
+    for packet in packets:
+        rec = decode_packet(packet)
+        if (rec["token"].decode(), int(rec["exchange_type"])) not in subscribed:
+            continue
+        ts = int(rec["exchange_ts"])
+        if speed and prev_ts is not None and ts > prev_ts:
+            time.sleep((ts - prev_ts) / 1000.0 / speed)
+        prev_ts = ts
+        send_frame(conn, packet)
+        sent += 1
+    try:
+        send_frame(conn, struct.pack(">H", 1000), opcode=0x8)
+    except OSError:
+        pass
+    conn.close()
+    return sent
+
+
+def start_server(packets, host="127.0.0.1", port=0, speed=0.0, once=True):
+    """Starts the mock feed on a background thread; returns (port, thread)."""
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind((host, port))
+    srv.listen(1)
+
+    def loop():
+        while True:
+            conn, _ = srv.accept()
+            serve_client(conn, packets, speed)
+            if once:
+                break
+        srv.close()
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return srv.getsockname()[1], thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--record", help="recorded tick file from LiveFeed(record_path=...)")
+    parser.add_argument("--synthetic", type=int, default=20, help="number of random-walk tokens")
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed multiple; 0 = no pacing")
+    args = parser.parse_args()
+
+    packets = read_recording(args.record) if args.record else synthetic_ticks(args.synthetic, args.minutes)
+    port, thread = start_server(packets, port=args.port, speed=args.speed, once=False)
+    print(f"Mock feed with {len(packets)} ticks on ws://127.0.0.1:{port}")
+    thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,784 @@
+"""
+Record/replay harness for full bot cycles without Angel One, Google Sheets
+or Telegram. Local stand-ins for SmartConnect, the gspread client and the
+Telegram endpoint serve a cassette with a configurable per-call latency,
+and main.run_bot runs unchanged against them in a scratch working
+directory (instrument store, candle cache, positions, journal and session
+files all live there). Every call is counted per service.
+
+A cassette is a directory:
+    meta.json      sheet id/name, recorded_at, median latency per service, position book
+    master.json    scrip master records of the recorded instruments
+    sheets.json    {sheet_id: {sheet_name: [[row], ...]}}
+    quotes.jsonl   one getMarketData quote per line (FULL where it was fetched in FULL mode)
+    candles.jsonl  {"exchange", "token", "interval", "data": [[date, o, h, l, c, v], ...]} per line
+
+`record` logs in with the real credentials and fetches what a cycle reads
+(sheet, quotes, option chains, history, position book); it never places
+orders. On replay, candle dates are shifted so the newest one is today and
+orders fill at the recorded LTP. synthetic_cassette() builds a seeded
+universe of any size instead.
+
+Run from the repo root:
+    python -m scripts.replay record data/cassettes/today
+    python -m scripts.replay run data/cassettes/today --cycles 2 --recorded-latency
+    python -m scripts.replay run --synthetic 500 --latency angel=0.05 sheets=0.2 telegram=0.1
+"""
+import argparse
+import base64
+import bisect
+import importlib
+import json
+import logging
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import requests
+from gspread.exceptions import SpreadsheetNotFound, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+import candle_fetcher
+import order_executor
+import profiling
+import quote_fetcher
+import session_manager
+import sheet_writer
+from greeks import bs_price
+from instrument_store import MARKET_TZ, RecordBuilder, write_store
+from rate_limiter import TokenBucket
+
+SERVICES = ("angel", "sheets", "telegram")
+SHEET_NAME = "LIVE DATA"
+SHEET_HEADER = ["SYMBOL", "CLOSE", "QUANTITY", "PUT_VOLUME", "CALL_VOLUME", "PCR", "SIGNALS", "ALERTS", "ORDERS",
+                "PUT_OI", "CALL_OI"]
+SHEET_WRITE_METHODS = {"values_batch_update", "update", "append_row", "append_rows", "add_worksheet"}
+
+# Replaces every credential so a replay can never reach the real services.
+HARNESS_ENV = {
+    "ANGEL_API_KEY": "replay",
+    "ANGEL_CLIENT_CODE": "R0000",
+    "ANGEL_CLIENT_PWD": "0000",
+    "ANGEL_TOTP_SECRET": "JBSWY3DPEHPK3PXP",
+    "GSHEET_CREDS_JSON": "{}",
+    "TELEGRAM_BOT_TOKEN": "replay",
+    "TELEGRAM_CHAT_ID": "0",
+    "LIVE_TRADING": "true",
+}
+
+SYNTHETIC_INDICES = {  # sheet symbol -> (master symbol, token, level, strike step, lot size)
+    "NIFTY": ("Nifty 50", "99926000", 22000.0, 50, 25),
+    "BANKNIFTY": ("Nifty Bank", "99926009", 48000.0, 100, 15),
+    "FINNIFTY": ("Nifty Fin Service", "99926037", 21000.0, 50, 40),
+    "MIDCPNIFTY": ("NIFTY MID SELECT", "99926074", 11000.0, 25, 75),
+}
+
+
+def _now():
+    return datetime.now(MARKET_TZ).replace(tzinfo=None)
+
+
+def _candle_date(value):
+    return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+
+
+@dataclass
+class Cassette:
+    sheet_id: str = "replay-sheet"
+    sheet_name: str = SHEET_NAME
+    recorded_at: str = ""
+    latency: dict = field(default_factory=dict)   # service -> median seconds per call
+    positions: list = field(default_factory=list)  # api.position() data rows
+    master: list = field(default_factory=list)
+    sheets: dict = field(default_factory=dict)
+    quotes: dict = field(default_factory=dict)     # "EXCHANGE:token" -> quote dict
+    candles: dict = field(default_factory=dict)    # (exchange, token, interval) -> rows
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        cassette = cls(**meta)
+        with open(path / "master.json") as f:
+            cassette.master = json.load(f)
+        with open(path / "sheets.json") as f:
+            cassette.sheets = json.load(f)
+        with open(path / "quotes.jsonl") as f:
+            for line in f:
+                q = json.loads(line)
+                cassette.quotes[f"{q['exchange']}:{q['symbolToken']}"] = q
+        with open(path / "candles.jsonl") as f:
+            for line in f:
+                c = json.loads(line)
+                cassette.candles[(c["exchange"], c["token"], c["interval"])] = c["data"]
+        return cassette
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        meta = {"sheet_id": self.sheet_id, "sheet_name": self.sheet_name, "recorded_at": self.recorded_at,
+                "latency": self.latency, "positions": self.positions}
+        with open(path / "meta.json", "w") as f:
+            json.dump(meta, f, indent=1)
+        with open(path / "master.json", "w") as f:
+            json.dump(self.master, f)
+        with open(path / "sheets.json", "w") as f:
+            json.dump(self.sheets, f)
+        with open(path / "quotes.jsonl", "w") as f:
+            for q in self.quotes.values():
+                f.write(json.dumps(q) + "\n")
+        with open(path / "candles.jsonl", "w") as f:
+            for (exchange, token, interval), rows in self.candles.items():
+                f.write(json.dumps({"exchange": exchange, "token": token, "interval": interval, "data": rows}) + "\n")
+
+
+# --- stand-ins ---
+class CallLog:
+    """Thread-safe call counts per (service, method); hit() also applies the service's latency."""
+
+    def __init__(self, latency=None):
+        self.latency = {s: float((latency or {}).get(s, 0.0)) for s in SERVICES}
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def hit(self, service, method):
+        with self._lock:
+            self.counts[(service, method)] += 1
+        if self.latency[service]:
+            time.sleep(self.latency[service])
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.counts)
+
+
+def fake_jwt(ttl=86_400):
+    """An unsigned JWT with an exp claim, so session_manager.jwt_expiry() can read it."""
+    def part(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+    return f"{part({'alg': 'none'})}.{part({'exp': int(time.time() + ttl)})}.replay"
+
+
+class ReplayBroker:
+    """
+    Angel One as the stand-in clients see it: quotes and candles from the
+    cassette, and an order/trade/position book that fills every market
+    order at the recorded LTP.
+    """
+
+    def __init__(self, cassette, log, rebase=True):
+        self.log = log
+        self.quotes = cassette.quotes
+        self.candles = {}
+        shift = timedelta(0)
+        if rebase and cassette.candles:
+            newest = max(_candle_date(rows[-1][0]) for rows in cassette.candles.values() if rows)
+            shift = timedelta(days=max(0, (_now().date() - newest.date()).days))
+        for key, rows in cassette.candles.items():
+            dates = [_candle_date(r[0]) + shift for r in rows]
+            if shift:
+                rows = [[(d.replace(tzinfo=MARKET_TZ)).isoformat()] + r[1:] for d, r in zip(dates, rows)]
+            self.candles[key] = (dates, rows)
+        self.positions = {p["tradingsymbol"]: int(float(p.get("netqty") or 0)) for p in cassette.positions}
+        self.orders = []
+        self._lock = threading.Lock()
+
+    def client(self, api_key=None, **kwargs):
+        return ReplaySmartConnect(self, api_key)
+
+    def quote(self, exchange, token, mode):
+        q = self.quotes.get(f"{exchange}:{token}")
+        if q is None or mode != "LTP":
+            return q
+        return {k: q.get(k) for k in ("exchange", "tradingSymbol", "symbolToken", "ltp")}
+
+    def place(self, params):
+        with self._lock:
+            order_id = f"R{len(self.orders) + 1:09d}"
+            q = self.quotes.get(f"{params['exchange']}:{params['symboltoken']}") or {}
+            qty = int(params["quantity"])
+            self.orders.append({
+                "orderid": order_id, "tradingsymbol": params["tradingsymbol"], "transactiontype": params["transactiontype"],
+                "quantity": qty, "averageprice": float(q.get("ltp") or 0), "status": "complete",
+            })
+            sign = 1 if params["transactiontype"] == "BUY" else -1
+            self.positions[params["tradingsymbol"]] = self.positions.get(params["tradingsymbol"], 0) + sign * qty
+            return order_id
+
+
+class ReplaySmartConnect:
+    """The SmartConnect methods the bot calls, served by a ReplayBroker."""
+
+    def __init__(self, broker, api_key=None):
+        self.broker = broker
+        self.api_key = api_key
+        self.access_token = self.refresh_token = self.feed_token = self.userId = None
+        self.session_expiry_hook = None
+
+    def _hit(self, method):
+        self.broker.log.hit("angel", method)
+
+    def setAccessToken(self, token):
+        self.access_token = token
+
+    def setRefreshToken(self, token):
+        self.refresh_token = token
+
+    def setFeedToken(self, token):
+        self.feed_token = token
+
+    def setUserId(self, user_id):
+        self.userId = user_id
+
+    def getfeedToken(self):
+        return self.feed_token
+
+    def generateSession(self, client_code, password, totp):
+        self._hit("generateSession")
+        self.access_token, self.refresh_token, self.feed_token = fake_jwt(), "replay-refresh", "replay-feed"
+        self.userId = client_code
+        return {"status": True, "data": {"jwtToken": f"Bearer {self.access_token}", "refreshToken": self.refresh_token,
+                                         "feedToken": self.feed_token}}
+
+    def generateToken(self, refresh_token):
+        self._hit("generateToken")
+        self.access_token = fake_jwt()
+        return {"status": True, "data": {"jwtToken": self.access_token, "refreshToken": refresh_token,
+                                         "feedToken": self.feed_token}}
+
+    def getProfile(self, refresh_token):
+        self._hit("getProfile")
+        return {"status": True, "data": {"clientcode": self.userId}}
+
+    def getMarketData(self, mode, exchangeTokens):
+        self._hit("getMarketData")
+        fetched, unfetched = [], []
+        for exchange, tokens in exchangeTokens.items():
+            for token in tokens:
+                q = self.broker.quote(exchange, str(token), mode)
+                if q is None:
+                    unfetched.append({"exchange": exchange, "symbolToken": str(token), "message": "no data"})
+                else:
+                    fetched.append(q)
+        return {"status": True, "message": "SUCCESS", "data": {"fetched": fetched, "unfetched": unfetched}}
+
+    def getCandleData(self, params):
+        self._hit("getCandleData")
+        dates, rows = self.broker.candles.get((params["exchange"], str(params["symboltoken"]), params["interval"]),
+                                              ([], []))
+        lo = bisect.bisect_left(dates, datetime.strptime(params["fromdate"], "%Y-%m-%d %H:%M"))
+        hi = bisect.bisect_right(dates, datetime.strptime(params["todate"], "%Y-%m-%d %H:%M"))
+        return {"status": True, "message": "SUCCESS", "data": rows[lo:hi]}
+
+    def placeOrder(self, orderparams):
+        self._hit("placeOrder")
+        return self.broker.place(orderparams)
+
+    def orderBook(self):
+        self._hit("orderBook")
+        with self.broker._lock:
+            return {"status": True, "data": [dict(o) for o in self.broker.orders]}
+
+    def tradeBook(self):
+        self._hit("tradeBook")
+        with self.broker._lock:
+            return {"status": True, "data": [
+                {"orderid": o["orderid"], "tradingsymbol": o["tradingsymbol"], "fillsize": o["quantity"],
+                 "fillprice": o["averageprice"]} for o in self.broker.orders]}
+
+    def position(self):
+        self._hit("position")
+        with self.broker._lock:
+            return {"status": True, "data": [{"tradingsymbol": s, "netqty": str(q)}
+                                             for s, q in self.broker.positions.items() if q]}
+
+
+class ReplaySheets:
+    """Google Sheets as grids of cell values; client() returns a new gspread-like client on every call."""
+
+    def __init__(self, sheets, log):
+        self.log = log
+        self.grids = {sid: {name: [list(r) for r in grid] for name, grid in tabs.items()} for sid, tabs in sheets.items()}
+        self.version = {sid: 0 for sid in self.grids}
+        self._lock = threading.RLock()
+
+    def client(self):
+        return ReplayGspread(self)
+
+    def write(self, sheet_id, sheet_name, range_name, values):
+        grid = self.grids[sheet_id][sheet_name]
+        rng = a1_range_to_grid_range(range_name)
+        row0, col0 = rng.get("startRowIndex", 0), rng.get("startColumnIndex", 0)
+        for r, row in enumerate(values):
+            while len(grid) <= row0 + r:
+                grid.append([])
+            cells = grid[row0 + r]
+            for c, value in enumerate(row):
+                cells.extend([""] * (col0 + c + 1 - len(cells)))
+                cells[col0 + c] = value
+        self.version[sheet_id] += 1
+
+
+class ReplayGspread:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open_by_key(self, key):
+        self.backend.log.hit("sheets", "open_by_key")
+        if key not in self.backend.grids:
+            raise SpreadsheetNotFound(key)
+        return ReplaySpreadsheet(self.backend, key)
+
+
+class ReplaySpreadsheet:
+    def __init__(self, backend, sheet_id):
+        self.backend = backend
+        self.id = sheet_id
+
+    def worksheet(self, title):
+        self.backend.log.hit("sheets", "worksheet")
+        if title not in self.backend.grids[self.id]:
+            raise WorksheetNotFound(title)
+        return ReplayWorksheet(self.backend, self.id, title)
+
+    def add_worksheet(self, title, rows, cols):
+        self.backend.log.hit("sheets", "add_worksheet")
+        with self.backend._lock:
+            self.backend.grids[self.id].setdefault(title, [])
+        return ReplayWorksheet(self.backend, self.id, title)
+
+    def get_lastUpdateTime(self):
+        self.backend.log.hit("sheets", "get_lastUpdateTime")
+        return f"v{self.backend.version[self.id]}"
+
+    def values_batch_update(self, body):
+        self.backend.log.hit("sheets", "values_batch_update")
+        with self.backend._lock:
+            for item in body["data"]:
+                name, _, rng = item["range"].rpartition("!")
+                self.backend.write(self.id, name[1:-1].replace("''", "'"), rng, item["values"])
+        return {"totalUpdatedCells": sum(len(r) for item in body["data"] for r in item["values"])}
+
+
+class ReplayWorksheet:
+    def __init__(self, backend, sheet_id, title):
+        self.backend = backend
+        self.sheet_id = sheet_id
+        self.title = title
+
+    @property
+    def _grid(self):
+        return self.backend.grids[self.sheet_id][self.title]
+
+    def _hit(self, method):
+        self.backend.log.hit("sheets", method)
+
+    def get_all_values(self):
+        self._hit("get_all_values")
+        with self.backend._lock:
+            return [list(r) for r in self._grid]
+
+    def get_all_records(self):
+        self._hit("get_all_records")
+        with self.backend._lock:
+            grid = self._grid
+            if not grid:
+                return []
+            header = grid[0]
+            return [{h: (row[i] if i < len(row) else "") for i, h in enumerate(header)} for row in grid[1:]]
+
+    def row_values(self, row):
+        self._hit("row_values")
+        with self.backend._lock:
+            values = list(self._grid[row - 1]) if row <= len(self._grid) else []
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def col_values(self, col):
+        self._hit("col_values")
+        with self.backend._lock:
+            values = [row[col - 1] if col <= len(row) else "" for row in self._grid]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def batch_get(self, ranges, **kwargs):
+        self._hit("batch_get")
+        out = []
+        with self.backend._lock:
+            for name in ranges:
+                rng = a1_range_to_grid_range(name)
+                col = rng.get("startColumnIndex", 0)
+                rows = self._grid[rng.get("startRowIndex", 0):rng.get("endRowIndex")]
+                values = [[row[col]] if col < len(row) and row[col] != "" else [] for row in rows]
+                while values and not values[-1]:
+                    values.pop()
+                out.append(values)
+        return out
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._hit("update")
+        with self.backend._lock:
+            self.backend.write(self.sheet_id, self.title, range_name or "A1", values)
+
+    def append_row(self, values, **kwargs):
+        self._append([values])
+
+    def append_rows(self, values, **kwargs):
+        self._append(values)
+
+    def _append(self, rows):
+        self._hit("append_rows")
+        with self.backend._lock:
+            grid = self._grid
+            last = len(grid)
+            while last and not any(v != "" for v in grid[last - 1]):
+                last -= 1
+            self.backend.write(self.sheet_id, self.title, f"A{last + 1}", [list(r) for r in rows])
+
+
+class ReplayTelegram:
+    """Intercepts requests.post to api.telegram.org while installed; other hosts pass through."""
+
+    def __init__(self, log):
+        self.log = log
+        self.messages = []
+        self._original = None
+
+    def install(self):
+        if self._original is not None:
+            return
+        original = self._original = requests.post
+
+        def post(url, *args, **kwargs):
+            if "api.telegram.org" not in str(url):
+                return original(url, *args, **kwargs)
+            self.log.hit("telegram", "sendMessage")
+            self.messages.append((kwargs.get("data") or {}).get("text", ""))
+            response = requests.Response()
+            response.status_code = 200
+            response._content = b'{"ok": true}'
+            return response
+
+        requests.post = post
+
+    def uninstall(self):
+        if self._original is not None:
+            requests.post, self._original = self._original, None
+
+
+# --- harness ---
+@dataclass
+class CycleStats:
+    wall: float
+    calls: Counter
+    stages: dict
+    orders: int
+    messages: int
+
+
+def unthrottle():
+    """Points the bot's rate limiters at an unlimited bucket (the stand-ins have no quotas)."""
+    unlimited = TokenBucket(math.inf)
+    for limiter in (quote_fetcher._quote_limiter, candle_fetcher._hist_limiter, order_executor._order_limiter,
+                    sheet_writer.sheets_read_limiter, sheet_writer.sheets_write_limiter):
+        limiter.attach(unlimited)
+
+
+def master_records(store, rows):
+    """Scrip master records (strikes back in paise) for instrument store rows."""
+    out = []
+    for i in rows:
+        rec = store.row(int(i))
+        out.append({"token": rec["token"], "symbol": rec["symbol"], "name": rec["name"], "expiry": rec["expiry"],
+                    "strike": rec["strike"] * 100 if rec["strike"] > 0 else -1, "lotsize": rec["lotsize"],
+                    "instrumenttype": rec["instrumenttype"], "exch_seg": rec["exch_seg"],
+                    "tick_size": rec["tick_size"]})
+    return out
+
+
+class Harness:
+    """
+    Runs main.run_bot against the stand-ins. main is imported on start()
+    inside the working directory (a temporary one by default), so use one
+    Harness per process.
+    """
+
+    def __init__(self, cassette, latency=None, workdir=None, throttle=False):
+        self.cassette = cassette
+        self.log = CallLog(latency)
+        self.broker = ReplayBroker(cassette, self.log)
+        self.sheets = ReplaySheets(cassette.sheets, self.log)
+        self.telegram = ReplayTelegram(self.log)
+        self._own_workdir = workdir is None
+        self.workdir = Path(workdir or tempfile.mkdtemp(prefix="replay-"))
+        self.throttle = throttle
+        self.app = None
+        self._cwd = None
+
+    def start(self):
+        os.environ.update(HARNESS_ENV, GSHEET_ID=self.cassette.sheet_id)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self._cwd = os.getcwd()
+        os.chdir(self.workdir)
+        builder = RecordBuilder()
+        for rec in self.cassette.master:
+            builder.add(rec)
+        write_store(builder)
+
+        self.app = importlib.import_module("main")
+        self.app.get_google_sheet_client = self.sheets.client
+        session_manager.PooledSmartConnect = self.broker.client
+        order_executor.ORDER_FILL_DELAY = 0.0  # the stand-in fills orders immediately
+        self.app.init()
+        self.telegram.install()
+        if not self.throttle:
+            unthrottle()
+        profiling.enable(True)
+        return self
+
+    def run_cycle(self):
+        before = self.log.snapshot()
+        orders, messages = len(self.broker.orders), len(self.telegram.messages)
+        started = time.perf_counter()
+        with profiling.cycle():
+            self.app.run_bot()
+        wall = time.perf_counter() - started
+        return CycleStats(wall, self.log.snapshot() - before, dict(profiling.metrics.cycle_stages),
+                          len(self.broker.orders) - orders, len(self.telegram.messages) - messages)
+
+    def close(self):
+        self.telegram.uninstall()
+        if self._cwd is not None:
+            os.chdir(self._cwd)
+            self._cwd = None
+        if self._own_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# --- cassettes ---
+def synthetic_cassette(n_symbols, seed=0, days=60, strikes=41, expiries=2):
+    """
+    A deterministic universe of `n_symbols` cash equities (NSE and BSE)
+    plus the NIFTY, BANKNIFTY, FINNIFTY and MIDCPNIFTY indices and their
+    option chains. Each instrument's data is seeded by its token, so a
+    symbol looks the same at every universe size.
+    """
+    cassette = Cassette(recorded_at=_now().isoformat(timespec="seconds"))
+    today = _now().date()
+    dates = [d for d in (today - timedelta(days=i) for i in range(int(days * 1.5))) if d.weekday() < 5][:days][::-1]
+    date_strings = [f"{d:%Y-%m-%d}T00:00:00+05:30" for d in dates]
+
+    def walk(exchange, token, start, vol):
+        rng = np.random.default_rng([seed, zlib.crc32(f"{exchange}:{token}".encode())])
+        close = start * np.exp(np.cumsum(rng.normal(0.0, vol, len(dates))))
+        high = close * (1 + rng.uniform(0, vol, len(dates)))
+        low = close * (1 - rng.uniform(0, vol, len(dates)))
+        open_ = low + (high - low) * rng.random(len(dates))
+        volume = rng.integers(10_000, 1_000_000, len(dates))
+        cassette.candles[(exchange, token, "ONE_DAY")] = [
+            [d, round(o, 2), round(h, 2), round(lo, 2), round(c, 2), int(v)]
+            for d, o, h, lo, c, v in zip(date_strings, open_, high, low, close, volume)]
+        return float(round(close[-1], 2))
+
+    def add_quote(exchange, token, symbol, ltp, **extra):
+        cassette.quotes[f"{exchange}:{token}"] = {"exchange": exchange, "tradingSymbol": symbol, "symbolToken": token,
+                                                  "ltp": ltp, **extra}
+
+    sheet_rows = []
+    upcoming = [d for d in (today + timedelta(days=i) for i in range(7 * expiries + 7)) if d.weekday() == 3][:expiries]
+    option_token = 40_000
+    for alias, (symbol, token, level, step, lot) in SYNTHETIC_INDICES.items():
+        cassette.master.append({"token": token, "symbol": symbol, "name": alias, "expiry": "", "strike": -1,
+                                "lotsize": 1, "instrumenttype": "AMXIDX", "exch_seg": "NSE", "tick_size": -1})
+        spot = walk("NSE", token, level, 0.01)
+        add_quote("NSE", token, symbol, spot)
+        sheet_rows.append([alias, "", lot])
+
+        rng = np.random.default_rng([seed, zlib.crc32(alias.encode())])
+        atm = round(spot / step) * step
+        ladder = atm + step * (np.arange(strikes) - strikes // 2)
+        for expiry in upcoming:
+            T = max((expiry - today).days, 0.5) / 365
+            for option_type in ("CE", "PE"):
+                sigma = 0.14 + 0.3 * ((ladder - atm) / atm) ** 2
+                prices = np.maximum(bs_price(spot, ladder, T, sigma, option_type == "CE"), 0.05)
+                for strike, price in zip(ladder.tolist(), prices.tolist()):
+                    option_token += 1
+                    opt_symbol = f"{alias}{expiry:%d%b%y}{strike:g}{option_type}".upper()
+                    cassette.master.append({
+                        "token": str(option_token), "symbol": opt_symbol, "name": alias,
+                        "expiry": f"{expiry:%d%b%Y}".upper(), "strike": strike * 100, "lotsize": lot,
+                        "instrumenttype": "OPTIDX", "exch_seg": "NFO", "tick_size": 5.0,
+                    })
+                    add_quote("NFO", str(option_token), opt_symbol, round(price, 2),
+                              tradeVolume=int(rng.integers(1_000, 500_000)), opnInterest=int(rng.integers(1_000, 2_000_000)))
+
+    for i in range(n_symbols):
+        symbol, token, exchange = f"SYN{i:05d}-EQ", str(100_000 + i), "BSE" if i % 5 == 4 else "NSE"
+        cassette.master.append({"token": token, "symbol": symbol, "name": f"SYN{i:05d}", "expiry": "", "strike": -1,
+                                "lotsize": 1, "instrumenttype": "", "exch_seg": exchange, "tick_size": 5.0})
+        add_quote(exchange, token, symbol, walk(exchange, token, 100.0 + i % 900, 0.02))
+        sheet_rows.append([symbol, "", 1])
+
+    width = len(SHEET_HEADER)
+    grid = [list(SHEET_HEADER)] + [row + [""] * (width - len(row)) for row in sheet_rows]
+    cassette.sheets = {cassette.sheet_id: {cassette.sheet_name: grid, "TRADE JOURNAL": []}}
+    return cassette
+
+
+class RecordingSmartConnect:
+    """Passes calls through to a logged-in SmartConnect and keeps its quotes, candles and position book."""
+
+    def __init__(self, api, cassette):
+        self._api = api
+        self._cassette = cassette
+        self._lock = threading.Lock()
+        self.timings = []
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        resp = fn(*args)
+        with self._lock:
+            self.timings.append(time.perf_counter() - started)
+        return resp
+
+    def getMarketData(self, mode, exchangeTokens):
+        resp = self._timed(self._api.getMarketData, mode, exchangeTokens)
+        for q in ((resp or {}).get("data") or {}).get("fetched") or []:
+            key = f"{q.get('exchange')}:{q.get('symbolToken')}"
+            with self._lock:
+                self._cassette.quotes[key] = {**self._cassette.quotes.get(key, {}), **q}
+        return resp
+
+    def getCandleData(self, params):
+        resp = self._timed(self._api.getCandleData, params)
+        if resp and resp.get("data"):
+            with self._lock:
+                self._cassette.candles[(params["exchange"], str(params["symboltoken"]), params["interval"])] = resp["data"]
+        return resp
+
+    def position(self):
+        resp = self._timed(self._api.position)
+        self._cassette.positions = (resp or {}).get("data") or []
+        return resp
+
+    def placeOrder(self, *args, **kwargs):
+        raise RuntimeError("Orders are never sent while recording.")
+
+
+def record(path, days=60):
+    """Records what one cycle reads from the live services into a cassette directory."""
+    import main
+    from candle_store import CandleStore, fetch_history_cached
+    from option_chain import OPTION_UNDERLYINGS, chain_index, option_chain_pcr
+    from quote_fetcher import fetch_market_data
+
+    main.init()
+    api = main.angel_login()
+    client = main.get_google_sheet_client()
+    store = main.get_tokens()
+    if not api or not client or not store:
+        logging.error("❌ Recording needs a live Angel session (LIVE_TRADING=true), the Google Sheet and the instrument store.")
+        return None
+
+    cassette = Cassette(main.GSHEET_ID, main.SHEET_NAME, recorded_at=_now().isoformat(timespec="seconds"))
+    recorder = RecordingSmartConnect(api, cassette)
+    started = time.perf_counter()
+    grid = client.open_by_key(main.GSHEET_ID).worksheet(main.SHEET_NAME).get_all_values()
+    sheet_latency = time.perf_counter() - started
+    cassette.sheets = {main.GSHEET_ID: {main.SHEET_NAME: grid}}
+
+    header = [str(h).strip().upper() for h in grid[0]] if grid else []
+    col = header.index("SYMBOL") if "SYMBOL" in header else 0
+    symbols = sorted({str(r[col]).strip().upper() for r in grid[1:] if len(r) > col and str(r[col]).strip()})
+    rows = {store.meta["aliases"].get(s, store.find("tradingsymbol", s)) for s in symbols + OPTION_UNDERLYINGS}
+    for chain in chain_index(store).chains.values():
+        rows.update(int(i) for i in np.concatenate([chain.ce_rows, chain.pe_rows]) if i >= 0)
+    cassette.master = master_records(store, sorted(r for r in rows if r is not None))
+
+    pairs = [(info["exch_seg"], info["token"]) for info in map(store.get, symbols) if info]
+    fetch_market_data(recorder, pairs, mode="FULL")
+    option_chain_pcr(recorder, store)
+    with tempfile.TemporaryDirectory() as tmp:
+        fetch_history_cached(recorder, symbols, store, days=days, store=CandleStore(tmp))
+    recorder.position()
+
+    cassette.latency = {"angel": round(statistics.median(recorder.timings), 4) if recorder.timings else 0.0,
+                        "sheets": round(sheet_latency, 4)}
+    cassette.save(path)
+    logging.info(f"✅ Cassette written to {path}: {len(symbols)} sheet symbols, {len(cassette.quotes)} quotes, "
+                 f"{len(cassette.candles)} candle sets, {len(cassette.master)} instruments.")
+    return cassette
+
+
+def parse_latency(items):
+    """["angel=0.05", "sheets=0.2"] -> {"angel": 0.05, "sheets": 0.2}"""
+    latency = {}
+    for item in items or []:
+        service, _, seconds = item.partition("=")
+        if service not in SERVICES:
+            raise argparse.ArgumentTypeError(f"unknown service '{service}' (one of {', '.join(SERVICES)})")
+        latency[service] = float(seconds)
+    return latency
+
+
+def format_calls(calls):
+    return ", ".join(f"{service}.{method}={n}" for (service, method), n in sorted(calls.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="record a cassette from the live services (no orders)")
+    rec.add_argument("path")
+    rec.add_argument("--days", type=int, default=60)
+    run = sub.add_parser("run", help="run cycles against a cassette")
+    run.add_argument("path", nargs="?")
+    run.add_argument("--synthetic", type=int, help="generate a universe of N symbols instead of loading a cassette")
+    run.add_argument("--cycles", type=int, default=1)
+    run.add_argument("--latency", nargs="*", metavar="SERVICE=SECONDS", help="per-call latency (default: none)")
+    run.add_argument("--recorded-latency", action="store_true", help="use the cassette's median latencies")
+    run.add_argument("--throttle", action="store_true", help="keep the bot's rate limiters")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        raise SystemExit(0 if record(args.path, args.days) else 1)
+
+    if args.synthetic is None and not args.path:
+        parser.error("run needs a cassette path or --synthetic N")
+    cassette = synthetic_cassette(args.synthetic) if args.synthetic is not None else Cassette.load(args.path)
+    latency = dict(cassette.latency) if args.recorded_latency else {}
+    latency.update(parse_latency(args.latency))
+    with Harness(cassette, latency, throttle=args.throttle) as harness:
+        for cycle in range(args.cycles):
+            stats = harness.run_cycle()
+            print(f"cycle {cycle + 1}: {stats.wall:.2f}s, {stats.orders} orders, {stats.messages} Telegram messages")
+            print(f"  calls: {format_calls(stats.calls)}")
+            print("  stages: " + ", ".join(f"{s}={v:.3f}s" for s, v in sorted(stats.stages.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Shared helpers for the scripts/ utilities.
+"""
+import logging
+import math
+
+from instrument_store import load_store
+from option_chain import chain_index
+
+# Strike spacing used when the option chain is not available.
+STRIKE_STEPS = {"NIFTY": 50, "BANKNIFTY": 100, "FINNIFTY": 50, "MIDCPNIFTY": 25, "SENSEX": 100}
+
+
+def get_atm_price(symbol, live_price, store=None):
+    """
+    ATM strike of the nearest expiry for `symbol` at `live_price`.
+    Returns (atm_strike, api_failed): api_failed is True when there is no
+    usable live price, in which case atm_strike is None.
+    """
+    try:
+        price = float(live_price)
+    except (TypeError, ValueError):
+        price = math.nan
+    if not price > 0:
+        return None, True
+
+    symbol = str(symbol).upper()
+    try:
+        store = store or load_store()
+        chain = chain_index(store).chain(symbol) if store else None
+    except Exception as e:
+        logging.warning(f"Option chain unavailable for {symbol}: {e}")
+        chain = None
+    if chain is not None:
+        return chain.atm(price), False
+
+    step = STRIKE_STEPS.get(symbol, 50)
+    return float(round(price / step) * step), False
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urljoin
+
+import requests
+
+import profiling
+from market_calendar import MARKET_TZ
+
+SESSION_CACHE = os.getenv("SESSION_CACHE", "data/session.bin")
+SESSION_DB = os.getenv("SESSION_DB", "data/sessions.sqlite")
+SESSION_CACHE_KEY = os.getenv("SESSION_CACHE_KEY", "")  # default: derived from the login secrets
+SESSION_RENEW_MARGIN = float(os.getenv("SESSION_RENEW_MARGIN", "600"))  # renew this many seconds before expiry
+SESSION_JWT_TTL = float(os.getenv("SESSION_JWT_TTL", "3600"))  # used when the JWT carries no exp
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "10"))
+KDF_ROUNDS = 200_000
+
+_http = None
+_http_lock = threading.Lock()
+
+
+def pooled_session():
+    """The process-wide requests.Session every SmartAPI call goes through (keep-alive, pooled)."""
+    global _http
+    with _http_lock:
+        if _http is None:
+            _http = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=SESSION_POOL_SIZE)
+            _http.mount("https://", adapter)
+            _http.mount("http://", adapter)
+        return _http
+
+
+PooledSmartConnect = None  # defined by smart_connect_class() on first use
+
+
+def smart_connect_class():
+    """
+    PooledSmartConnect, defined on first use: importing SmartApi looks up the
+    machine's public IP over HTTP, which only a process that talks to the
+    broker should wait for.
+    """
+    global PooledSmartConnect
+    if PooledSmartConnect is None:
+        PooledSmartConnect = _define_pooled_smart_connect()
+    return PooledSmartConnect
+
+
+def _define_pooled_smart_connect():
+    from SmartApi import SmartConnect
+    from SmartApi import smartExceptions as ex
+
+    class PooledSmartConnect(SmartConnect):
+        """
+        SmartConnect whose requests use the shared pooled session. The library's
+        _request calls requests.request(), which opens a new connection (and
+        TLS handshake) per call and ignores the `pool` argument.
+        """
+
+        def _request(self, route, method, parameters=None):
+            params = parameters.copy() if parameters else {}
+            url = urljoin(self.root, self._routes[route].format(**params))
+            headers = self.requestHeaders()
+            if self.access_token:
+                headers["Authorization"] = f"Bearer {self.access_token}"
+
+            r = pooled_session().request(
+                method,
+                url,
+                data=json.dumps(params) if method in ["POST", "PUT"] else None,
+                params=json.dumps(params) if method in ["GET", "DELETE"] else None,
+                headers=headers,
+                verify=not self.disable_ssl,
+                allow_redirects=True,
+                timeout=self.timeout,
+                proxies=self.proxies,
+            )
+
+            if "json" in headers["Content-type"]:
+                try:
+                    data = json.loads(r.content.decode("utf8"))
+                except ValueError:
+                    raise ex.DataException(f"Couldn't parse the JSON response received from the server: {r.content}")
+                if data.get("error_type"):
+                    if self.session_expiry_hook and r.status_code == 403 and data["error_type"] == "TokenException":
+                        self.session_expiry_hook()
+                    exp = getattr(ex, data["error_type"], ex.GeneralException)
+                    raise exp(data["message"], code=r.status_code)
+                if data.get("status", False) is False:
+                    logging.error(f"SmartAPI {method} {url} failed: {data.get('message')}")
+                return data
+            if "csv" in headers["Content-type"]:
+                return r.content
+            raise ex.DataException(f"Unknown Content-type ({headers['Content-type']}) with response: ({r.content})")
+
+    return PooledSmartConnect
+
+
+def _aes():
+    """pycryptodome's AES, imported with the first cache read or write; None if it is missing."""
+    try:
+        from Crypto.Cipher import AES
+    except ImportError:  # pycryptodome missing: sessions are kept in memory only
+        return None
+    return AES
+
+
+def jwt_expiry(token, default_ttl=SESSION_JWT_TTL):
+    """Epoch seconds from the JWT's exp claim, or now + default_ttl if it has none."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return time.time() + default_ttl
+
+
+def refresh_expiry(now=None):
+    """Angel refresh tokens are daily: treat them as valid until the next IST midnight."""
+    now = datetime.fromtimestamp(now or time.time(), MARKET_TZ)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), MARKET_TZ)
+    return midnight.timestamp()
+
+
+class SessionManager:
+    """
+    One SmartAPI session per trading day instead of a TOTP login per run.
+    The JWT, refresh and feed tokens (with expiry) live in memory and in an
+    AES-GCM encrypted cache file; the JWT is renewed with generateToken()
+    before it expires, and a full TOTP login is only the fallback. Every
+    login is timed and stored in SESSION_DB.
+    """
+
+    def __init__(self, api_key, client_code, password, totp_secret, path=SESSION_CACHE, db_path=SESSION_DB,
+                 key=SESSION_CACHE_KEY):
+        self.api_key = api_key
+        self.client_code = client_code
+        self.password = password
+        self.totp_secret = totp_secret
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._secret = (key or f"{api_key}:{client_code}:{password}:{totp_secret}").encode()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS logins ("
+            " at TEXT, kind TEXT, ok INTEGER, duration_ms REAL, error TEXT)"
+        )
+        self._lock = threading.RLock()
+        self.api = None
+        self.tokens = None  # jwt, refresh, feed, jwt_expires, refresh_expires
+        self._cache_checked = False
+        self.reused = 0  # get() calls served by the live session without any login
+
+    # --- encrypted cache ---
+    def _key(self, salt):
+        return hashlib.pbkdf2_hmac("sha256", self._secret, salt, KDF_ROUNDS)
+
+    def _save(self):
+        AES = _aes()
+        if AES is None:
+            return
+        salt = os.urandom(16)
+        cipher = AES.new(self._key(salt), AES.MODE_GCM)
+        body, tag = cipher.encrypt_and_digest(json.dumps(self.tokens).encode())
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(salt + cipher.nonce + tag + body)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self.path)
+
+    def _load(self):
+        AES = _aes()
+        if AES is None:
+            logging.warning("pycryptodome is not installed; the session cache is disabled.")
+            return None
+        if not self.path.exists():
+            return None
+        try:
+            raw = self.path.read_bytes()
+            salt, nonce, tag, body = raw[:16], raw[16:32], raw[32:48], raw[48:]
+            cipher = AES.new(self._key(salt), AES.MODE_GCM, nonce=nonce)
+            return json.loads(cipher.decrypt_and_verify(body, tag))
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable session cache {self.path}: {e}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            self.api = None
+            self.tokens = None
+            self.path.unlink(missing_ok=True)
+
+    # --- metrics ---
+    def _record(self, kind, started, error=None):
+        duration_ms = (time.perf_counter() - started) * 1000
+        self._db.execute(
+            "INSERT INTO logins VALUES (?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(timespec="seconds"), kind, int(error is None), duration_ms, error),
+        )
+        profiling.count("logins", kind=kind, ok=str(error is None).lower())
+        if error is None:
+            logging.info(f"Angel One session ready via {kind} in {duration_ms:.0f} ms.")
+        else:
+            logging.warning(f"Angel One {kind} failed after {duration_ms:.0f} ms: {error}")
+
+    def login_stats(self, days=7):
+        """{kind: (count, failures, avg_ms, max_ms)} over the last `days` days."""
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+        rows = self._db.execute(
+            "SELECT kind, COUNT(*), SUM(1 - ok), AVG(duration_ms), MAX(duration_ms) FROM logins"
+            " WHERE at >= ? GROUP BY kind", (since,)
+        ).fetchall()
+        return {kind: (n, failed, round(avg, 1), round(worst, 1)) for kind, n, failed, avg, worst in rows}
+
+    def report_logins(self, days=7):
+        """
+        Logs login_stats() and the login time saved: each successful cache
+        restore or JWT refresh, and each reuse of the live session in this
+        process, is counted against the average successful TOTP login.
+        Returns the seconds saved over the window, or None before any TOTP
+        login has been timed.
+        """
+        stats = self.login_stats(days)
+        totp_ms = self._db.execute("SELECT AVG(duration_ms) FROM logins WHERE kind = 'totp' AND ok = 1").fetchone()[0]
+        if totp_ms is None:
+            logging.info(f"Angel One logins ({days} days): {stats}; no successful TOTP login timed yet.")
+            return None
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+        avoided, saved_ms = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(? - duration_ms), 0) FROM logins"
+            " WHERE kind != 'totp' AND ok = 1 AND at >= ?", (totp_ms, since)
+        ).fetchone()
+        saved_ms += self.reused * totp_ms
+        logging.info(f"Angel One logins ({days} days): {stats}; {saved_ms / 1000:.1f}s saved by {avoided} "
+                     f"cache/refresh sessions and {self.reused} reuses in this process "
+                     f"(TOTP login avg {totp_ms:.0f} ms).")
+        return saved_ms / 1000
+
+    # --- session ---
+    def _client(self):
+        api = smart_connect_class()(api_key=self.api_key)
+        api.session_expiry_hook = self.invalidate
+        return api
+
+    def _apply(self, api):
+        api.setAccessToken(self.tokens["jwt"])
+        api.setRefreshToken(self.tokens["refresh"])
+        api.setFeedToken(self.tokens["feed"])
+        api.setUserId(self.client_code)
+
+    def invalidate(self):
+        """Called when the broker rejects the JWT: the next get() renews it."""
+        with self._lock:
+            if self.tokens:
+                self.tokens["jwt_expires"] = 0
+
+    def _valid(self, field, now):
+        return self.tokens is not None and now < self.tokens[field] - SESSION_RENEW_MARGIN
+
+    def _from_cache(self):
+        started = time.perf_counter()
+        tokens = self._load()
+        if not tokens or time.time() >= tokens["refresh_expires"] - SESSION_RENEW_MARGIN:
+            return False
+        self.tokens = tokens
+        self.api = self._client()
+        self._apply(self.api)
+        if not self._valid("jwt_expires", time.time()):
+            return True  # get() renews it with the refresh token
+        try:
+            profile = self.api.getProfile(tokens["refresh"])
+            if not profile or profile.get("status") is False:
+                raise ValueError(profile.get("message") if profile else "empty profile response")
+        except Exception as e:
+            self._record("cache", started, str(e))
+            self.api, self.tokens = None, None
+            return False
+        self._record("cache", started)
+        return True
+
+    def _refresh(self):
+        started = time.perf_counter()
+        try:
+            resp = self.api.generateToken(self.tokens["refresh"])
+            jwt = resp["data"]["jwtToken"]
+        except Exception as e:
+            self._record("refresh", started, str(e))
+            return False
+        self.tokens.update(jwt=jwt, feed=resp["data"].get("feedToken") or self.tokens["feed"],
+                           jwt_expires=jwt_expiry(jwt))
+        self._apply(self.api)
+        self._record("refresh", started)
+        self._save()
+        return True
+
+    def _totp_login(self):
+        import pyotp
+
+        started = time.perf_counter()
+        api = self._client()
+        try:
+            resp = api.generateSession(self.client_code, self.password, pyotp.TOTP(self.totp_secret).now())
+            if not resp or resp.get("status") is False:
+                raise ValueError(resp.get("message") if resp else "empty login response")
+        except Exception as e:
+            self._record("totp", started, str(e))
+            return False
+        jwt = api.access_token
+        self.tokens = {
+            "jwt": jwt, "refresh": api.refresh_token, "feed": api.feed_token,
+            "jwt_expires": jwt_expiry(jwt), "refresh_expires": refresh_expiry(),
+        }
+        self.api = api
+        self._record("totp", started)
+        self._save()
+        return True
+
+    def get(self):
+        """A logged-in SmartConnect, renewing or logging in only when needed; None if login fails."""
+        with self._lock:
+            if not self._cache_checked:
+                self._cache_checked = True
+                self._from_cache()
+            now = time.time()
+            if self.api is not None and self._valid("jwt_expires", now):
+                self.reused += 1
+                return self.api
+            if self.api is not None and self._valid("refresh_expires", now) and self._refresh():
+                return self.api
+            if self._totp_login():
+                return self.api
+            return None
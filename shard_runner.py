@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+import pandas as pd
+
+import candle_fetcher
+import quote_fetcher
+import session_manager
+import sheet_writer
+from option_chain import option_chain_pcr
+from rate_limiter import MultiLimiter, TokenBucket
+
+# JSON list of sheets to run, e.g.
+# [{"sheet_id": "...", "sheet_name": "LIVE DATA", "exchanges": ["NSE", "BSE", "NFO"]},
+#  {"sheet_id_env": "SHEET_ID_CRUDEOIL", "sheet_name": "Sheet1", "exchanges": ["MCX"], "parts": 1}]
+# Without it the LIVE DATA sheet is the whole universe.
+SHARD_CONFIG = os.getenv("SHARD_CONFIG", "")
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0")) or os.cpu_count() or 1
+SHARD_PARTS = int(os.getenv("SHARD_PARTS", "0"))  # shards per sheet; default one per worker
+ORDER_BATCH_WAIT = 0.05  # seconds the order consumer waits to batch intents that arrive together
+
+
+@dataclass
+class SheetSource:
+    sheet_id: str
+    sheet_name: str
+    exchanges: tuple = ()  # empty: every exchange on the sheet
+    parts: int = 1
+
+    @property
+    def key(self):
+        return f"{self.sheet_id}:{self.sheet_name}"
+
+
+@dataclass
+class ShardResult:
+    sheet: str
+    part: int
+    symbols: int
+    prices: pd.Series
+    messages: list
+    intents: int
+    failure: tuple
+    seconds: float
+
+
+def load_sources(default_sheet_id, default_sheet_name, parts, path=SHARD_CONFIG):
+    if not path:
+        return [SheetSource(default_sheet_id, default_sheet_name, (), parts)]
+    with open(path) as f:
+        entries = json.load(f)
+    sources = []
+    for entry in entries:
+        sheet_id = entry.get("sheet_id") or os.getenv(entry.get("sheet_id_env", ""), "")
+        if not sheet_id:
+            logging.error(f"❌ Shard entry without a sheet id: {entry}")
+            continue
+        sources.append(SheetSource(
+            sheet_id, entry.get("sheet_name", default_sheet_name),
+            tuple(ex.upper() for ex in entry.get("exchanges", ())), int(entry.get("parts", parts)),
+        ))
+    return sources
+
+
+def shard_of(symbol, parts):
+    """Stable shard number of a symbol (the same in every process and run)."""
+    return zlib.crc32(symbol.encode()) % parts
+
+
+def split_rows(df, parts):
+    if parts <= 1:
+        return [df]
+    slots = np.fromiter((shard_of(s, parts) for s in df["SYMBOL"]), dtype=np.int64, count=len(df))
+    return [df[slots == p] for p in range(parts) if (slots == p).any()]
+
+
+# --- shared limiter server ---
+_shared_limiters = {}
+_order_queue = queue.Queue()
+
+
+def _shared_limiter(name):
+    # Runs in the manager process: one bucket per broker/Sheets quota for all workers.
+    if name not in _shared_limiters:
+        _shared_limiters[name] = {
+            "quote": lambda: TokenBucket(quote_fetcher.QUOTE_RATE_PER_SEC),
+            "history": lambda: MultiLimiter(TokenBucket(candle_fetcher.HIST_RATE_PER_MIN, per=60.0),
+                                            TokenBucket(candle_fetcher.HIST_RATE_PER_SEC)),
+            "sheets_read": lambda: TokenBucket(sheet_writer.SHEETS_READS_PER_MIN, per=60.0),
+            "sheets_write": lambda: TokenBucket(sheet_writer.SHEETS_WRITES_PER_MIN, per=60.0),
+        }[name]()
+    return _shared_limiters[name]
+
+
+def _get_order_queue():
+    return _order_queue
+
+
+class LimiterManager(BaseManager):
+    pass
+
+
+LimiterManager.register("limiter", callable=_shared_limiter)
+LimiterManager.register("order_queue", callable=_get_order_queue)
+
+
+def attach_limiters(manager):
+    """Points this process's module-level limiters at the manager's shared buckets."""
+    for name, local in (("quote", quote_fetcher._quote_limiter), ("history", candle_fetcher._hist_limiter),
+                        ("sheets_read", sheet_writer.sheets_read_limiter),
+                        ("sheets_write", sheet_writer.sheets_write_limiter)):
+        local.attach(manager.limiter(name))
+
+
+# --- worker side ---
+_app = None  # the main module, inherited by forked workers
+_worker = {}
+
+
+def _init_worker(address, authkey):
+    manager = LimiterManager(address=address, authkey=authkey)
+    manager.connect()
+    attach_limiters(manager)
+    session_manager._http = None  # never share the parent's pooled sockets
+    _worker.update(api=None, queue=manager.order_queue())
+
+
+def _worker_api(tokens):
+    # Workers use the coordinator's session tokens; they never log in themselves.
+    if tokens is None:
+        return None
+    api = _worker["api"]
+    if api is None:
+        api = _worker["api"] = session_manager.smart_connect_class()(api_key=_app.ANGEL_API_KEY)
+    jwt, refresh, feed = tokens
+    api.setAccessToken(jwt)
+    api.setRefreshToken(refresh)
+    api.setFeedToken(feed)
+    return api
+
+
+def run_shard(task):
+    """LTP, history, indicators and signals for one shard; order intents go straight to the shared queue."""
+    source, part, rows, session = task
+    started = time.perf_counter()
+    api = _worker_api(session)
+    store = _app.get_tokens()
+    if api is not None:
+        prices = quote_fetcher.fetch_ltp_series(api, rows)
+    else:
+        prices = pd.Series(np.nan, index=rows.index)
+    _, messages, intents, failure = _app.compute_signals(api, rows, store, source.sheet_id, source.sheet_name)
+    for intent in intents:
+        _worker["queue"].put(intent)
+    return ShardResult(source.key, part, len(rows), prices, messages, len(intents), failure,
+                       time.perf_counter() - started)
+
+
+class ShardRunner:
+    """
+    Splits the symbol universe (one or more sheets, filtered by exchange)
+    into shards by a stable hash of the symbol and runs the per-symbol
+    stages on a pool of worker processes. Workers draw on broker and Sheets
+    quotas through shared token buckets in a manager process, and push
+    their order intents into one queue that the coordinator drains while
+    the other shards are still computing. Sheet reads/writes, the option
+    chain, positions and orders stay in the coordinator.
+    """
+
+    def __init__(self, app, sources=None, workers=SHARD_WORKERS, parts=SHARD_PARTS):
+        self.app = app
+        self.workers = workers
+        self.sources = sources or load_sources(app.GSHEET_ID, app.SHEET_NAME, parts or workers)
+        self.manager = None
+        self.pool = None
+
+    def start(self):
+        global _app
+        _app = self.app
+        ctx = mp.get_context("fork")
+        self.manager = LimiterManager(ctx=ctx)
+        self.manager.start()
+        attach_limiters(self.manager)
+        self.orders = self.manager.order_queue()
+        self.pool = ctx.Pool(self.workers, initializer=_init_worker,
+                             initargs=(self.manager.address, bytes(mp.current_process().authkey)))
+        logging.info(f"Shard runner started: {self.workers} workers, sheets: "
+                     f"{', '.join(f'{s.sheet_name} x{s.parts}' for s in self.sources)}.")
+        return self
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        if self.manager is not None:
+            self.manager.shutdown()
+        self.pool = self.manager = None
+
+    def _consume_orders(self, api, gs_client, done, placed):
+        # The merged order queue: intents from all shards, placed as they arrive.
+        while True:
+            try:
+                batch = [self.orders.get(timeout=0.2)]
+            except queue.Empty:
+                if done.is_set():
+                    return
+                continue
+            deadline = time.monotonic() + ORDER_BATCH_WAIT
+            while time.monotonic() < deadline:
+                try:
+                    batch.append(self.orders.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            placed.extend(self.app.place_orders(api, batch, gs_client) or [])
+
+    def run_cycle(self, gs_client):
+        app = self.app
+        if self.pool is None:
+            self.start()
+        app.greeks_cache.clear()
+        api = app.angel_login()
+        if api and not app.current_positions.reconciled:
+            app.current_positions.reconcile(api)
+        store = app.get_tokens()
+        if not store:
+            app.update_google_sheet_cell(gs_client, app.GSHEET_ID, app.SHEET_NAME, "G2", "⚠️ Token data not fetched from API")
+            return
+
+        pcr = pd.DataFrame()
+        if api:
+            try:
+                pcr = option_chain_pcr(api, store)
+            except Exception as e:
+                logging.error(f"Option chain PCR failed: {e}")
+
+        session = (api.access_token, api.refresh_token, api.feed_token) if api else None
+        tasks, snapshots = [], {}
+        for source in self.sources:
+            snapshot = app.load_sheet(gs_client, source.sheet_id, source.sheet_name)
+            if snapshot is None:
+                continue
+            app.apply_option_chain_pcr(pcr, gs_client, snapshot)
+            df = app.sheet_symbols(snapshot, store)
+            if source.exchanges and not df.empty:
+                df = df[df["exch_seg"].isin(source.exchanges)]
+            if df.empty:
+                app.update_google_sheet_cell(gs_client, source.sheet_id, source.sheet_name, "G2",
+                                             "No valid symbols found after filtering.")
+                continue
+            snapshots[source.key] = (source, snapshot)
+            tasks += [(source, part, rows, session) for part, rows in enumerate(split_rows(df, source.parts))]
+        if not tasks:
+            return
+
+        done, placed = threading.Event(), []
+        consumer = threading.Thread(target=self._consume_orders, args=(api, gs_client, done, placed),
+                                    name="shard-orders", daemon=True)
+        consumer.start()
+        started = time.perf_counter()
+        results = {}
+        try:
+            for result in self.pool.imap_unordered(run_shard, tasks):
+                results.setdefault(result.sheet, []).append(result)
+        finally:
+            done.set()
+            consumer.join()
+        wall = time.perf_counter() - started
+
+        for key, (source, snapshot) in snapshots.items():
+            parts = results.get(key, [])
+            if api and parts:
+                prices = pd.concat([r.prices for r in parts]).reindex(snapshot.frame.index)
+                snapshot.set_column(gs_client, "CLOSE", prices.astype(float), fallback_letter="B")
+            messages = [m for r in sorted(parts, key=lambda r: r.part) for m in r.messages]
+            failures = [r.failure for r in parts if r.failure]
+            failure = failures[0] if failures and len(failures) == len(parts) else None
+            app.report_signals(gs_client, messages, failure, source.sheet_id, source.sheet_name)
+
+        busy = sum(r.seconds for parts in results.values() for r in parts)
+        symbols = sum(r.symbols for parts in results.values() for r in parts)
+        logging.info(f"Sharded run: {symbols} symbols in {len(tasks)} shards on {self.workers} workers, "
+                     f"{wall:.2f}s wall / {busy:.2f}s shard time ({busy / wall if wall else 0:.1f}x), "
+                     f"{len(placed)} orders placed.")
+        logging.info("Bot run completed.")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import logging
+import re
+
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from sheet_writer import sheet_writer_for, sheets_read_limiter
+
+_snapshots = {}
+
+
+def column_letter(col):
+    return re.sub(r"\d", "", rowcol_to_a1(1, col))
+
+
+class SheetSnapshot:
+    """
+    In-memory copy of a worksheet's data rows (row 2 == index 0) with
+    upper-cased headers. Local writes update the frame and are queued on the
+    client's SheetWriter, so the sheet never has to be read back. The
+    spreadsheet's last-modified time is remembered after every read or flush;
+    a newer time means someone else edited it and the data is re-fetched.
+    """
+
+    def __init__(self, sheet_id, sheet_name, columns=None):
+        self.sheet_id = sheet_id
+        self.sheet_name = sheet_name
+        self.columns = [c.upper() for c in columns] if columns else None
+        self.header = []
+        self.frame = pd.DataFrame()
+        self.last_update = None
+
+    def _remote_update_time(self, writer):
+        try:
+            sheets_read_limiter.acquire()
+            writer.requests += 1
+            return writer.spreadsheet(self.sheet_id).get_lastUpdateTime()
+        except Exception as e:
+            logging.warning(f"Could not read last update time of '{self.sheet_name}': {e}")
+            return None
+
+    def is_current(self, client):
+        if self.last_update is None:
+            return False
+        return self._remote_update_time(sheet_writer_for(client)) == self.last_update
+
+    def load(self, client):
+        writer = sheet_writer_for(client)
+        ws = writer.worksheet(self.sheet_id, self.sheet_name)
+        self.last_update = self._remote_update_time(writer)
+
+        if self.columns is None:
+            sheets_read_limiter.acquire()
+            writer.requests += 1
+            records = ws.get_all_records()
+            self.header = [str(h).strip().upper() for h in records[0]] if records else []
+            frame = pd.DataFrame(records)
+        else:
+            frame = self._load_columns(ws, writer)
+        frame.columns = frame.columns.astype(str).str.upper()
+        self.frame = frame
+        logging.info(f"Sheet snapshot of '{self.sheet_name}' loaded: {len(frame)} rows, {len(frame.columns)} columns.")
+        return self
+
+    def _load_columns(self, ws, writer):
+        # Header row, then only the wanted columns in a single batch_get.
+        sheets_read_limiter.acquire()
+        writer.requests += 1
+        self.header = [str(h).strip().upper() for h in ws.row_values(1)]
+        wanted = [c for c in self.columns if c in self.header]
+        if not wanted:
+            return pd.DataFrame()
+        ranges = [f"{column_letter(self.header.index(c) + 1)}2:{column_letter(self.header.index(c) + 1)}" for c in wanted]
+        sheets_read_limiter.acquire()
+        writer.requests += 1
+        value_ranges = ws.batch_get(ranges, value_render_option="UNFORMATTED_VALUE")
+        cols = {c: [row[0] if row else "" for row in vr] for c, vr in zip(wanted, value_ranges)}
+        n = max((len(v) for v in cols.values()), default=0)
+        return pd.DataFrame({c: v + [""] * (n - len(v)) for c, v in cols.items()})
+
+    def set_column(self, client, name, values, fallback_letter=None):
+        """
+        Writes `values` (aligned to the frame index; NaN -> blank) into the
+        column headed `name`, locally and via the SheetWriter queue.
+        """
+        name = name.upper()
+        values = values.reindex(range(len(self.frame))) if len(self.frame) else values
+        cells = ["" if pd.isna(v) else v for v in values]
+        self.frame[name] = cells
+
+        if name in self.header:
+            letter = column_letter(self.header.index(name) + 1)
+        elif fallback_letter:
+            letter = fallback_letter
+        else:
+            logging.error(f"Column '{name}' not found in '{self.sheet_name}'; kept locally only.")
+            return
+        sheet_writer_for(client).queue(
+            self.sheet_id, self.sheet_name, f"{letter}2:{letter}{1 + len(cells)}", [[c] for c in cells]
+        )
+
+    def check_remote_edits(self, client):
+        """
+        Call before flushing our writes: if someone else edited the sheet
+        since our read, the snapshot is invalidated (re-read next time)
+        instead of that edit being taken for ours by mark_synced.
+        """
+        if self.last_update is None:
+            return
+        if self._remote_update_time(sheet_writer_for(client)) != self.last_update:
+            logging.info(f"Sheet '{self.sheet_name}' was edited during the cycle; it is re-read next time.")
+            self.last_update = None
+
+    def mark_synced(self, client):
+        """Call after our own writes were flushed so they don't count as remote edits."""
+        self.last_update = self._remote_update_time(sheet_writer_for(client))
+
+
+def get_snapshot(client, sheet_id, sheet_name, columns=None):
+    """
+    Returns the cached snapshot for the worksheet, re-reading it only when the
+    spreadsheet was modified since our last read or flush.
+    """
+    key = (sheet_id, sheet_name, tuple(c.upper() for c in columns) if columns else None)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None and snapshot.is_current(client):
+        logging.info(f"Sheet '{sheet_name}' unchanged since last read; using cached snapshot.")
+        return snapshot
+    snapshot = snapshot or SheetSnapshot(sheet_id, sheet_name, columns)
+    _snapshots[key] = snapshot
+    return snapshot.load(client)
+
+
+def mark_snapshots_synced(client):
+    for snapshot in _snapshots.values():
+        if snapshot.last_update is not None:
+            snapshot.mark_synced(client)
+
+
+def check_snapshots_for_edits(client):
+    for snapshot in _snapshots.values():
+        snapshot.check_remote_edits(client)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import logging
+import os
+import weakref
+
+from rate_limiter import TokenBucket
+
+# Google Sheets API default quota: 60 read and 60 write requests per minute per user.
+SHEETS_READS_PER_MIN = float(os.getenv("SHEETS_READS_PER_MIN", "60"))
+SHEETS_WRITES_PER_MIN = float(os.getenv("SHEETS_WRITES_PER_MIN", "60"))
+
+sheets_read_limiter = TokenBucket(SHEETS_READS_PER_MIN, per=60.0)
+sheets_write_limiter = TokenBucket(SHEETS_WRITES_PER_MIN, per=60.0)
+
+
+def a1_range(sheet_name, range_name):
+    escaped = sheet_name.replace("'", "''")
+    return f"'{escaped}'!{range_name}"
+
+
+class SheetWriter:
+    """
+    Caches spreadsheet/worksheet handles for one gspread client and collects
+    cell/range writes, sending them as a single values_batch_update per
+    spreadsheet on flush(). A later write to the same range replaces an
+    earlier queued one.
+    """
+
+    def __init__(self, client, value_input_option="RAW"):
+        self.client = client
+        self.value_input_option = value_input_option
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._pending = {}
+        self.requests = 0
+
+    def adopt(self, spreadsheet):
+        """Registers an already opened spreadsheet so it is not fetched again."""
+        self._spreadsheets[spreadsheet.id] = spreadsheet
+        return spreadsheet
+
+    def spreadsheet(self, sheet_id):
+        if sheet_id not in self._spreadsheets:
+            sheets_read_limiter.acquire()
+            self.requests += 1
+            self._spreadsheets[sheet_id] = self.client.open_by_key(sheet_id)
+        return self._spreadsheets[sheet_id]
+
+    def worksheet(self, sheet_id, sheet_name):
+        key = (sheet_id, sheet_name)
+        if key not in self._worksheets:
+            spreadsheet = self.spreadsheet(sheet_id)
+            sheets_read_limiter.acquire()
+            self.requests += 1
+            self._worksheets[key] = spreadsheet.worksheet(sheet_name)
+        return self._worksheets[key]
+
+    def forget_worksheet(self, sheet_id, sheet_name):
+        self._worksheets.pop((sheet_id, sheet_name), None)
+
+    def queue(self, sheet_id, sheet_name, range_name, values):
+        """Queues a write; scalars become a single cell."""
+        if not isinstance(values, list):
+            values = [[values]]
+        pending = self._pending.setdefault(sheet_id, {})
+        key = (sheet_name, range_name)
+        pending.pop(key, None)  # re-insert so the latest write keeps its order
+        pending[key] = values
+
+    @property
+    def pending(self):
+        return sum(len(p) for p in self._pending.values())
+
+    def flush(self):
+        """Sends every queued write. Returns True if all batches succeeded."""
+        ok = True
+        pending, self._pending = self._pending, {}
+        for sheet_id, writes in pending.items():
+            body = {
+                "valueInputOption": self.value_input_option,
+                "data": [{"range": a1_range(name, rng), "values": values} for (name, rng), values in writes.items()],
+            }
+            try:
+                spreadsheet = self.spreadsheet(sheet_id)
+                sheets_write_limiter.acquire()
+                self.requests += 1
+                spreadsheet.values_batch_update(body)
+                logging.info(f"Sheet batch update sent: {len(writes)} ranges in 1 request.")
+            except Exception as e:
+                ok = False
+                logging.error(f"Sheet batch update failed for {len(writes)} ranges: {e}")
+        return ok
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def sheet_writer_for(client):
+    """The shared SheetWriter for a gspread client (one per client object)."""
+    writer = _writers.get(client)
+    if writer is None:
+        writer = _writers[client] = SheetWriter(client)
+    return writer
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+import logging
+
+import pandas as pd
+
+from strategy import DEFAULT_STRATEGY, MCX_STRATEGY, column_arrays, compile_strategy, evaluate_strategies
+
+SIGNAL_COLUMNS = ["SYMBOL", "SIDE", "REASON"]
+
+
+def evaluate_signals(latest, strategies=None):
+    """
+    BUY/SELL rules over one row per symbol, evaluated as boolean masks.
+    Only strategies marked for trading contribute; a symbol/side pair fired
+    by several strategies is kept once. A symbol with both a BUY and a SELL
+    (strategies disagreeing) gets no signal, so opposite orders never race.
+    Returns SIGNAL_COLUMNS (+ STRATEGY).
+    """
+    strategies = [s for s in (strategies or [DEFAULT_STRATEGY]) if compile_strategy(s).trade]
+    result = evaluate_strategies(latest, strategies)
+    result = result.drop_duplicates(subset=["SYMBOL", "SIDE"])
+    conflicted = result["SYMBOL"].duplicated(keep=False)
+    if conflicted.any():
+        details = [f"{symbol} ({', '.join(group['SIDE'] + ': ' + group['STRATEGY'].astype(str))})"
+                   for symbol, group in result[conflicted].groupby("SYMBOL", sort=False)]
+        logging.warning(f"Conflicting strategy signals, no order for: {'; '.join(details)}")
+        result = result[~conflicted]
+    return result.reset_index(drop=True)[SIGNAL_COLUMNS + ["STRATEGY"]]
+
+
+def evaluate_mcx_signals(df):
+    """RSI/EMA/VWAP rule from indicator.py for every row: 'BUY', 'SELL' or 'HOLD'."""
+    strat = compile_strategy(MCX_STRATEGY)
+    return pd.Series(strat.sides(column_arrays(df, strat.columns), len(df)), index=df.index)
+
+
+def format_signals(signals):
+    """Human-readable lines for the sheet and Telegram, e.g. 'BUY SBIN-EQ (Multi-Indicator)'."""
+    return (signals["SIDE"] + " " + signals["SYMBOL"].astype(str) + " (" + signals["REASON"] + ")").tolist()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+import ast
+import json
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:  # optional accelerator
+    numexpr = None
+
+STRATEGY_FILE = os.getenv("STRATEGY_FILE", "")
+STRATEGY_COLUMNS = ["STRATEGY", "SYMBOL", "SIDE", "REASON"]
+
+# Rules are AND-ed conditions over indicator columns. A symbol only gets a
+# signal when every `require` column is present (not NaN).
+DEFAULT_STRATEGY = {
+    "name": "multi_indicator",
+    "reason": "Multi-Indicator",
+    "require": ["SMA_5", "SMA_20", "MACD", "SIGNAL_LINE", "RSI"],
+    "buy": ["SMA_5 > SMA_20", "MACD > SIGNAL_LINE", "RSI > 60", "isnan(PCR) or PCR < 0.75"],
+    "sell": ["SMA_5 < SMA_20", "MACD < SIGNAL_LINE", "RSI < 40", "isnan(PCR) or PCR > 1.10"],
+}
+
+# indicator.py (MCX, 15-minute bars)
+MCX_STRATEGY = {
+    "name": "mcx_rsi_ema_vwap",
+    "reason": "RSI/EMA/VWAP",
+    "require": ["RSI", "EMA", "VWAP"],
+    "buy": ["RSI > 60", "close > EMA", "close > VWAP"],
+    "sell": ["RSI < 40", "close < EMA", "close < VWAP"],
+}
+
+# angel.py (sheet-driven LTP/EMA/RSI)
+LTP_EMA_STRATEGY = {
+    "name": "ltp_ema_rsi",
+    "reason": "LTP/EMA/RSI",
+    "require": ["LTP", "EMA", "RSI"],
+    "buy": ["LTP > EMA", "RSI > 60"],
+    "sell": ["LTP < EMA", "RSI < 40"],
+}
+
+_COMPARE_OPS = {
+    ast.Gt: ">", ast.GtE: ">=", ast.Lt: "<", ast.LtE: "<=", ast.Eq: "==", ast.NotEq: "!=",
+}
+
+
+def _translate(node, columns):
+    """Turns a whitelisted rule AST into an array expression string."""
+    if isinstance(node, ast.BoolOp):
+        joiner = " & " if isinstance(node.op, ast.And) else " | "
+        return "(" + joiner.join(_translate(v, columns) for v in node.values) + ")"
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return f"(~{_translate(node.operand, columns)})"
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+        return f"(-{_translate(node.operand, columns)})"
+    if isinstance(node, ast.Compare):
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPS:
+                raise ValueError(f"Unsupported comparison: {ast.dump(op)}")
+            parts.append(f"({_translate(left, columns)} {_COMPARE_OPS[type(op)]} {_translate(right, columns)})")
+            left = right
+        return parts[0] if len(parts) == 1 else "(" + " & ".join(parts) + ")"
+    if isinstance(node, ast.Name):
+        columns.add(node.id)
+        return node.id
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return repr(float(node.value))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "isnan"
+            and len(node.args) == 1 and isinstance(node.args[0], ast.Name) and not node.keywords):
+        name = _translate(node.args[0], columns)
+        return f"({name} != {name})"
+    raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def _compile_rules(rules, columns):
+    if not rules:
+        return None
+    if isinstance(rules, str):
+        rules = [rules]
+    parts = [_translate(ast.parse(rule, mode="eval").body, columns) for rule in rules]
+    return " & ".join(parts)
+
+
+class CompiledStrategy:
+    """A strategy definition compiled once into vectorized mask expressions."""
+
+    def __init__(self, definition):
+        self.definition = definition
+        self.name = definition.get("name", "strategy")
+        self.reason = definition.get("reason", self.name)
+        self.trade = bool(definition.get("trade", True))
+        self.require = list(definition.get("require", []))
+
+        columns = set(self.require)
+        self.buy_expr = _compile_rules(definition.get("buy"), columns)
+        self.sell_expr = _compile_rules(definition.get("sell"), columns)
+        self.columns = sorted(columns)
+        self._buy_code = compile(self.buy_expr, f"<{self.name}:buy>", "eval") if self.buy_expr else None
+        self._sell_code = compile(self.sell_expr, f"<{self.name}:sell>", "eval") if self.sell_expr else None
+
+    def _mask(self, expr, code, arrays, n):
+        if expr is None:
+            return np.zeros(n, dtype=bool)
+        if numexpr is not None:
+            result = numexpr.evaluate(expr, local_dict=arrays)
+        else:
+            result = eval(code, {"__builtins__": {}}, arrays)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (n,))
+
+    def masks(self, arrays, n):
+        """(buy, sell) boolean arrays for column arrays of length n."""
+        valid = np.ones(n, dtype=bool)
+        for col in self.require:
+            valid &= ~np.isnan(arrays[col])
+        buy = valid & self._mask(self.buy_expr, self._buy_code, arrays, n)
+        sell = valid & ~buy & self._mask(self.sell_expr, self._sell_code, arrays, n)
+        return buy, sell
+
+    def sides(self, arrays, n, hold="HOLD"):
+        buy, sell = self.masks(arrays, n)
+        return np.select([buy, sell], ["BUY", "SELL"], default=hold)
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(canonical):
+    return CompiledStrategy(json.loads(canonical))
+
+
+def compile_strategy(definition):
+    """Compiles (and caches by content) a strategy dict."""
+    if isinstance(definition, CompiledStrategy):
+        return definition
+    return _compile_cached(json.dumps(definition, sort_keys=True))
+
+
+def column_arrays(df, columns):
+    """Float64 arrays for the requested columns; missing columns become NaN."""
+    arrays = {}
+    for col in columns:
+        if col in df.columns:
+            arrays[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            arrays[col] = np.full(len(df), np.nan)
+    return arrays
+
+
+def evaluate_strategies(latest, strategies):
+    """
+    Evaluates several strategies over one shared indicator frame (one row per
+    symbol). Column arrays are extracted once. Returns STRATEGY_COLUMNS.
+    """
+    compiled = [compile_strategy(s) for s in strategies]
+    if latest.empty or not compiled:
+        return pd.DataFrame(columns=STRATEGY_COLUMNS)
+
+    n = len(latest)
+    arrays = column_arrays(latest, sorted({c for s in compiled for c in s.columns}))
+    symbols = latest["SYMBOL"].to_numpy()
+
+    frames = []
+    for strat in compiled:
+        buy, sell = strat.masks(arrays, n)
+        hit = buy | sell
+        if hit.any():
+            frames.append(pd.DataFrame({
+                "STRATEGY": strat.name,
+                "SYMBOL": symbols[hit],
+                "SIDE": np.where(buy[hit], "BUY", "SELL"),
+                "REASON": strat.reason,
+            }, columns=STRATEGY_COLUMNS))
+    if not frames:
+        return pd.DataFrame(columns=STRATEGY_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def evaluate_row(strategy, values, hold="HOLD"):
+    """Side for a single row of scalar indicator values (dict)."""
+    strat = compile_strategy(strategy)
+    arrays = {c: np.array([np.nan if values.get(c) is None else float(values[c])]) for c in strat.columns}
+    return str(strat.sides(arrays, 1, hold)[0])
+
+
+def load_strategies(path=STRATEGY_FILE):
+    """
+    Reads a JSON (or YAML, if PyYAML is installed) file holding a strategy or
+    a list of strategies. Falls back to DEFAULT_STRATEGY.
+    """
+    if not path:
+        return [DEFAULT_STRATEGY]
+    try:
+        with open(path) as f:
+            if path.endswith((".yaml", ".yml")):
+                import yaml
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        strategies = data if isinstance(data, list) else [data]
+        for s in strategies:
+            compile_strategy(s)
+        logging.info(f"Loaded {len(strategies)} strategies from {path}.")
+        return strategies
+    except Exception as e:
+        logging.error(f"❌ Failed to load strategies from {path}, using the default: {e}")
+        return [DEFAULT_STRATEGY]
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from gspread.exceptions import WorksheetNotFound
+
+from sheet_writer import sheet_writer_for, sheets_read_limiter, sheets_write_limiter
+
+JOURNAL_DB = os.getenv("JOURNAL_DB", "data/journal.sqlite")
+JOURNAL_SHEET = "TRADE JOURNAL"
+JOURNAL_HEADER = ['TIMESTAMP', 'SYMBOL', 'ACTION', 'QUANTITY', 'PRICE', 'ORDER_ID', 'ENTRY_ID']
+JOURNAL_BATCH = int(os.getenv("JOURNAL_BATCH", "200"))
+JOURNAL_MAX_BACKOFF = float(os.getenv("JOURNAL_MAX_BACKOFF", "60"))
+JOURNAL_DRAIN_TIMEOUT = float(os.getenv("JOURNAL_DRAIN_TIMEOUT", "30"))
+HELD = -1  # journal.synced of rows waiting for release(); 0 is pending, 1 is on the sheet
+
+
+class TradeJournal:
+    """
+    Trade journal with a local write-ahead log. append() only inserts into
+    SQLite (WAL mode) and returns; a background thread, woken by start() or
+    drain() once the cycle's other sheet writes are done, bulk-appends
+    pending rows to the TRADE JOURNAL sheet with append_rows, retrying with
+    backoff.
+
+    A row appended with held=True (an order acked before its fill price is
+    known) is not uploaded until release() fills in the price; held rows
+    left by a process that died first are uploaded as they are on the next
+    start.
+
+    Every row carries an ENTRY_ID. After a restart, or after an append whose
+    outcome is unknown, the sheet's ENTRY_ID column is read once and rows
+    already present are marked as synced instead of being appended again.
+    """
+
+    def __init__(self, sheet_id, path=JOURNAL_DB, sheet_name=JOURNAL_SHEET):
+        self.sheet_id = sheet_id
+        self.sheet_name = sheet_name
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " entry_id TEXT UNIQUE NOT NULL,"
+            " row TEXT NOT NULL,"
+            " synced INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS journal_pending ON journal (synced, seq)")
+        self._db.execute("UPDATE journal SET synced = 0 WHERE synced = ?", (HELD,))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._client = None
+        self._worksheet = None
+        self._verify = True  # Startup replay: check the sheet before appending.
+        self._thread = None
+
+    def append(self, trade_record, held=False):
+        """Durably records one journal row and returns its ENTRY_ID."""
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("INSERT INTO journal (entry_id, row, synced) VALUES (?, ?, ?)",
+                             (entry_id, json.dumps(list(trade_record)), HELD if held else 0))
+        return entry_id
+
+    def release(self, entry_id, price=None):
+        """Sets the PRICE of a held row (if given) and lets the worker upload it."""
+        with self._lock:
+            found = self._db.execute("SELECT row FROM journal WHERE entry_id = ? AND synced = ?",
+                                     (entry_id, HELD)).fetchone()
+            if found is None:
+                return False
+            row = json.loads(found[0])
+            if price is not None:
+                row[JOURNAL_HEADER.index('PRICE')] = price
+            self._db.execute("UPDATE journal SET row = ?, synced = 0 WHERE entry_id = ?", (json.dumps(row), entry_id))
+        return True
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM journal WHERE synced = 0").fetchone()[0]
+
+    def start(self, client):
+        """Points the worker at the current gspread client, starting it if needed."""
+        if client is not self._client:
+            self._client = client
+            self._worksheet = None
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def drain(self, timeout=JOURNAL_DRAIN_TIMEOUT):
+        """Waits until every row is on the sheet. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.pending():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._thread is None:
+                return False
+            self._idle.clear()
+            self._wake.set()
+            self._idle.wait(min(remaining, 1.0))
+        return True
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                while self._sync_batch():
+                    pass
+                backoff = 1.0
+                self._idle.set()
+            except Exception as e:
+                self._verify = True
+                self._worksheet = None
+                logging.error(f"Trade journal sync failed, retrying in {backoff:.0f}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, JOURNAL_MAX_BACKOFF)
+                self._wake.set()
+
+    def _sheet(self):
+        if self._worksheet is not None:
+            return self._worksheet
+        writer = sheet_writer_for(self._client)
+        try:
+            ws = writer.worksheet(self.sheet_id, self.sheet_name)
+            sheets_read_limiter.acquire()
+            header = ws.row_values(1)
+            if 'ENTRY_ID' not in [h.strip().upper() for h in header]:
+                sheets_write_limiter.acquire()
+                ws.update(values=[JOURNAL_HEADER], range_name="A1")
+        except WorksheetNotFound:
+            logging.info(f"Creating new worksheet '{self.sheet_name}'.")
+            ws = writer.spreadsheet(self.sheet_id).add_worksheet(title=self.sheet_name, rows="100", cols=str(len(JOURNAL_HEADER)))
+            sheets_write_limiter.acquire()
+            ws.append_row(JOURNAL_HEADER)
+        self._worksheet = ws
+        return ws
+
+    def _sync_batch(self):
+        """Appends one batch of pending rows. Returns True if more may remain."""
+        if self._client is None:
+            return False
+        with self._lock:
+            pending = self._db.execute(
+                "SELECT seq, entry_id, row FROM journal WHERE synced = 0 ORDER BY seq LIMIT ?", (JOURNAL_BATCH,)
+            ).fetchall()
+        if not pending:
+            return False
+
+        ws = self._sheet()
+        if self._verify:
+            sheets_read_limiter.acquire()
+            on_sheet = set(ws.col_values(JOURNAL_HEADER.index('ENTRY_ID') + 1))
+            done = [seq for seq, entry_id, _ in pending if entry_id in on_sheet]
+            self._mark_synced(done)
+            pending = [p for p in pending if p[1] not in on_sheet]
+            if done:
+                logging.info(f"Trade journal replay: {len(done)} rows already on the sheet, skipped.")
+            self._verify = False
+
+        if pending:
+            rows = [json.loads(row) + [entry_id] for _, entry_id, row in pending]
+            sheets_write_limiter.acquire()
+            ws.append_rows(rows)
+            self._mark_synced([seq for seq, _, _ in pending])
+            logging.info(f"Trade journal: {len(rows)} rows appended to '{self.sheet_name}'.")
+        return True
+
+    def _mark_synced(self, seqs):
+        if not seqs:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE journal SET synced = 1 WHERE seq = ?", [(s,) for s in seqs])
+            self._db.execute("COMMIT")